@@ -9,6 +9,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from config import config_by_name
 from firebase_db import initialize_firebase
 from errors import register_error_handlers
+from services.job_service import job_queue
+from services.realtime import hub
+from services.scheduler import scheduler
+from services.catalog_service import CATALOG_RERANK_INTERVAL, catalog_service
+from services.program_service import WEEKLY_ARCHIVE_INTERVAL, program_service
 
 # Routers
 from routes.auth import auth_router
@@ -20,6 +25,8 @@ from routes.institution import institution_router
 from routes.analiz import analiz_router
 from routes.friends import friends_router
 from routes.flashcards import flashcards_router
+from routes.stream import stream_router
+from routes.messages import messages_router
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -35,9 +42,16 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error("Firebase baslatma hatasi: %s", e)
         raise
+    job_queue.start()
+    await hub.start()
+    scheduler.every("catalog_rerank", CATALOG_RERANK_INTERVAL, catalog_service.rerank)
+    scheduler.every("weekly_archive", WEEKLY_ARCHIVE_INTERVAL, program_service.run_weekly_archive)
+    scheduler.start()
     yield
     # Shutdown
-    pass
+    scheduler.shutdown()
+    await hub.stop()
+    job_queue.shutdown()
 
 
 def create_app(config_name: str = None) -> FastAPI:
@@ -69,7 +83,7 @@ def create_app(config_name: str = None) -> FastAPI:
         CORSMiddleware,
         allow_origins=allowed_origins,
         allow_credentials=True,
-        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         allow_headers=["Content-Type", "Authorization", "ngrok-skip-browser-warning"],
     )
 
@@ -84,6 +98,8 @@ def create_app(config_name: str = None) -> FastAPI:
     app.include_router(analiz_router, prefix="", tags=["Analiz"])
     app.include_router(friends_router, prefix="/friends", tags=["Friends"])
     app.include_router(flashcards_router, prefix="/flashcards", tags=["Flashcards"])
+    app.include_router(stream_router, prefix="", tags=["Stream"])
+    app.include_router(messages_router, prefix="/messages", tags=["Messages"])
     
     register_error_handlers(app)
     
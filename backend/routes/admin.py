@@ -2,10 +2,14 @@
 from fastapi import APIRouter, Request, Depends
 from fastapi.templating import Jinja2Templates
 from utils.responses import success_response, error_response
+from utils.export import export_response
 from services.admin_service import (
     admin_service, get_dashboard_stats, get_teacher_detail,
     get_notifications, update_settings, get_performance_report,
+    iter_performance_rows, iter_exam_history, student_in_institution,
+    PERFORMANCE_EXPORT_FIELDS, EXAM_HISTORY_EXPORT_FIELDS,
 )
+from services.job_service import job_queue, job_to_response
 from middleware.auth import create_token, require_admin, require_staff
 from schemas import (
     AdminLoginRequest,
@@ -141,3 +145,41 @@ def performance_report(admin_id: str, auth: dict = Depends(require_staff)):
     """Kurum geneli performans raporu."""
     report = get_performance_report(admin_id)
     return success_response(report)
+
+
+@admin_router.post("/reports/performance")
+def submit_performance_report(admin_id: str, auth: dict = Depends(require_staff)):
+    """Performans raporunu arka planda hesaplatır, iş ID'si döner."""
+    job, err = job_queue.submit("performance_report", {"admin_id": admin_id})
+    if err:
+        return error_response(err, 503)
+    return success_response(job_to_response(job), status_code=202)
+
+
+@admin_router.get("/jobs/{job_id}")
+def get_job(job_id: str, auth: dict = Depends(require_staff)):
+    """Arka plan işinin durumunu, tamamlandıysa sonucunu döner."""
+    job = job_queue.get(job_id)
+    if not job:
+        return error_response("İş bulunamadı veya süresi doldu.", 404)
+    return success_response(job_to_response(job))
+
+
+@admin_router.get("/performance/export")
+def performance_export(admin_id: str, format: str = "csv", auth: dict = Depends(require_staff)):
+    """Kurumdaki tüm öğrencilerin performans satırlarını CSV/NDJSON olarak akıtır."""
+    return export_response(
+        iter_performance_rows(admin_id), PERFORMANCE_EXPORT_FIELDS, format, "performans"
+    )
+
+
+@admin_router.get("/students/{student_id}/exams/export")
+def student_exams_export(
+    student_id: str, admin_id: str, format: str = "csv", auth: dict = Depends(require_staff)
+):
+    """Öğrencinin tüm deneme geçmişini CSV/NDJSON olarak akıtır."""
+    if not student_in_institution(admin_id, student_id):
+        return error_response("Öğrenci bu kuruma ait değil.", 403)
+    return export_response(
+        iter_exam_history(student_id), EXAM_HISTORY_EXPORT_FIELDS, format, f"denemeler_{student_id}"
+    )
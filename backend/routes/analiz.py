@@ -1,6 +1,6 @@
 """Deneme analizi ve AI yorum rotaları (FastAPI)."""
 from typing import List, Dict, Any
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from utils.responses import success_response, error_response
 from services.analiz_service import analiz_service
 from schemas import AddAnalizRequest
@@ -33,6 +33,19 @@ def analiz_sil(analiz_id: str, user_id: str):
     return success_response()
 
 
+@analiz_router.get("/analiz-trend/{user_id}")
+def analiz_trend(
+    user_id: str,
+    weeks: int = Query(12, ge=1, le=104),
+    window: int = Query(4, ge=1, le=12),
+):
+    """Deneme türü başına haftalık trend serileri (haftalık özetlerden)."""
+    trends, err = analiz_service.get_trends(user_id, weeks, window)
+    if err:
+        return error_response(err, 500)
+    return success_response(trends)
+
+
 @analiz_router.get("/ai-yorumla/{user_id}")
 def ai_yorumla(user_id: str) -> Dict[str, Any]:
     """AI ile deneme yorumu üretir (frontend uyumluluk için ham object)."""
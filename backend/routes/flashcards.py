@@ -1,10 +1,21 @@
 """Flashcard multiplayer rotaları."""
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from services.catalog_service import catalog_service
 from services.flashcard_service import flashcard_service
+from services.matchmaking import matchmaker
+from services.rating_service import rating_service
+from services.review_service import review_service
+from services.realtime import hub
 from schemas import (
     CreateDeckRequest,
     DuelChallengeRequest,
-    DuelSubmissionRequest
+    DuelSubmissionRequest,
+    MatchmakingRequest,
+    ReviewEnrollRequest,
+    ReviewGradeRequest
 )
 
 flashcards_router = APIRouter()
@@ -18,6 +29,18 @@ async def create_shared_deck(req: CreateDeckRequest):
         raise HTTPException(status_code=500, detail=error)
     return {"deck_id": deck_id}
 
+@flashcards_router.get("/catalog")
+async def get_catalog(
+    subject: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+):
+    """Herkese açık desteler, popülerliğe göre (konu filtreli, sayfalı)."""
+    page, error = await run_in_threadpool(catalog_service.get_catalog, subject, limit, cursor)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    return page
+
 @flashcards_router.get("/deck/{deck_id}")
 async def get_deck(deck_id: str):
     deck, error = flashcard_service.get_deck(deck_id)
@@ -25,6 +48,42 @@ async def get_deck(deck_id: str):
         raise HTTPException(status_code=404, detail=error)
     return deck
 
+@flashcards_router.get("/deck/{deck_id}/cards")
+async def get_deck_cards(
+    deck_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+):
+    """Deste kartlarını aralık halinde getirir (istemciler kademeli yükler)."""
+    page, error = await run_in_threadpool(flashcard_service.get_deck_cards, deck_id, offset, limit)
+    if error:
+        raise HTTPException(status_code=404, detail=error)
+    return page
+
+@flashcards_router.post("/review/enroll")
+async def enroll_deck(req: ReviewEnrollRequest):
+    """Desteyi kullanıcının tekrar planına ekler."""
+    result, error = await run_in_threadpool(review_service.enroll_deck, req.user_id, req.deck_id)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    return result
+
+@flashcards_router.get("/review/{user_id}/session")
+async def get_review_session(user_id: str, size: int = Query(20, ge=1, le=100)):
+    """Zamanı gelmiş kartlardan tekrar oturumu oluşturur."""
+    session, error = await run_in_threadpool(review_service.build_session, user_id, size)
+    if error:
+        raise HTTPException(status_code=500, detail=error)
+    return session
+
+@flashcards_router.post("/review/grade")
+async def grade_card(req: ReviewGradeRequest):
+    """Kartı derecelendirir (0-5) ve sonraki tekrar tarihini döndürür."""
+    result, error = await run_in_threadpool(review_service.grade_card, req.user_id, req.card_id, req.quality)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    return result
+
 @flashcards_router.post("/duel/challenge")
 async def challenge_friend(req: DuelChallengeRequest):
     duel_id, error = flashcard_service.create_duel(
@@ -34,6 +93,19 @@ async def challenge_friend(req: DuelChallengeRequest):
         raise HTTPException(status_code=500, detail=error)
     return {"duel_id": duel_id}
 
+@flashcards_router.post("/duel/matchmaking")
+async def find_random_opponent(req: MatchmakingRequest):
+    """Rastgele rakip arar; eşleşme olana ya da süre dolana kadar bekler (long-poll)."""
+    result = await matchmaker.find_match(req.user_id, req.deck_id)
+    if result["status"] == "error":
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@flashcards_router.delete("/duel/matchmaking/{user_id}")
+async def cancel_matchmaking(user_id: str):
+    """Kullanıcının bekleyen eşleştirme isteğini iptal eder."""
+    return {"cancelled": await matchmaker.cancel(user_id)}
+
 @flashcards_router.get("/duels/{user_id}")
 async def get_user_duels(user_id: str):
     duels, error = flashcard_service.get_user_duels(user_id)
@@ -41,16 +113,103 @@ async def get_user_duels(user_id: str):
         raise HTTPException(status_code=500, detail=error)
     return {"duels": duels}
 
+@flashcards_router.get("/leaderboard")
+async def get_leaderboard(subject: str | None = None):
+    """Düello sıralaması: ilk 100 (global veya konu bazlı)."""
+    board, error = await run_in_threadpool(rating_service.get_leaderboard, subject)
+    if error:
+        raise HTTPException(status_code=500, detail=error)
+    return board
+
+@flashcards_router.get("/leaderboard/{user_id}/rank")
+async def get_user_rank(user_id: str, subject: str | None = None):
+    """Kullanıcının ELO puanı ve sırası."""
+    rank, error = await run_in_threadpool(rating_service.get_user_rank, user_id, subject)
+    if error:
+        raise HTTPException(status_code=500, detail=error)
+    return rank
+
+def _duel_channel(duel_id: str) -> str:
+    return f"duel:{duel_id}"
+
+async def _submit_and_broadcast(req: DuelSubmissionRequest):
+    """Sonucu kaydeder ve düello kanalına yayınlar (tamamlandıysa final olayı da)."""
+    result = {
+        "score": req.score,
+        "correct_count": req.correct_count,
+        "total_count": req.total_count,
+        "time_spent": req.time_spent
+    }
+    success, error = await run_in_threadpool(
+        flashcard_service.submit_duel_result, req.duel_id, req.user_id, result
+    )
+    if not success:
+        return False, error
+    channel = _duel_channel(req.duel_id)
+    await hub.publish(channel, {"type": "result", "user_id": req.user_id, **result})
+    duel, _ = await run_in_threadpool(flashcard_service.get_duel, req.duel_id)
+    if duel and duel.get("status") == "completed":
+        await hub.publish(channel, {
+            "type": "final",
+            "winner_id": duel.get("winner_id"),
+            "results": duel.get("results"),
+            "rating_changes": duel.get("rating_changes"),
+        })
+    return True, None
+
 @flashcards_router.post("/duel/complete")
 async def complete_duel(req: DuelSubmissionRequest):
-    success, error = flashcard_service.submit_duel_result(
-        req.duel_id, req.user_id, {
-            "score": req.score,
-            "correct_count": req.correct_count,
-            "total_count": req.total_count,
-            "time_spent": req.time_spent
-        }
-    )
+    success, error = await _submit_and_broadcast(req)
     if not success:
         raise HTTPException(status_code=400, detail=error)
     return {"message": "Sonuç kaydedildi."}
+
+@flashcards_router.websocket("/duel/{duel_id}/ws")
+async def duel_socket(websocket: WebSocket, duel_id: str, user_id: str):
+    """Canlı düello kanalı.
+
+    İstemci mesajları: {"type": "progress", ...}, {"type": "answer", ...},
+    {"type": "result", "score", "correct_count", "total_count", "time_spent"}.
+    Sunucu her iki katılımcıya join / leave / progress / answer / result / final yayınlar.
+    """
+    duel, error = await run_in_threadpool(flashcard_service.get_duel, duel_id)
+    if error or user_id not in (duel["challenger_id"], duel["opponent_id"]):
+        await websocket.close(code=4403)
+        return
+
+    await websocket.accept()
+    channel = _duel_channel(duel_id)
+    queue = hub.subscribe(channel)
+
+    async def forward():
+        while True:
+            await websocket.send_json(await queue.get())
+
+    sender = asyncio.create_task(forward())
+    await hub.publish(channel, {"type": "join", "user_id": user_id})
+    try:
+        while True:
+            data = await websocket.receive_json()
+            if not isinstance(data, dict):
+                await websocket.send_json({"type": "error", "message": "Mesaj bir JSON nesnesi olmalı."})
+                continue
+            msg_type = data.get("type")
+            if msg_type in ("progress", "answer"):
+                await hub.publish(channel, {**data, "type": msg_type, "user_id": user_id})
+            elif msg_type == "result":
+                try:
+                    req = DuelSubmissionRequest(**{**data, "duel_id": duel_id, "user_id": user_id})
+                except ValidationError as e:
+                    await websocket.send_json({"type": "error", "message": str(e)})
+                    continue
+                success, error = await _submit_and_broadcast(req)
+                if not success:
+                    await websocket.send_json({"type": "error", "message": error})
+            else:
+                await websocket.send_json({"type": "error", "message": "Bilinmeyen mesaj tipi."})
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(channel, queue)
+        await hub.publish(channel, {"type": "leave", "user_id": user_id})
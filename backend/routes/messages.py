@@ -0,0 +1,43 @@
+"""Mesajlaşma (gelen kutusu ve konuşmalar) rotaları (FastAPI)."""
+from fastapi import APIRouter
+from utils.responses import success_response, error_response
+from services.message_service import message_service
+from schemas import CreateMessageRequest, MarkConversationReadRequest
+
+messages_router = APIRouter()
+
+
+@messages_router.post("/send")
+def send_message(req: CreateMessageRequest):
+    """Mesaj gönderir."""
+    conversation_id, err = message_service.send(req.sender_id, req.receiver_id, req.content)
+    if err:
+        return error_response(err, 400)
+    return success_response({"conversation_id": conversation_id}, status_code=201)
+
+
+@messages_router.get("/inbox/{user_id}")
+def get_inbox(user_id: str):
+    """Kullanıcının konuşma listesi (son mesaj + okunmamış sayısı)."""
+    inbox, err = message_service.get_inbox(user_id)
+    if err:
+        return error_response(err, 500)
+    return success_response({"conversations": inbox})
+
+
+@messages_router.get("/{conversation_id}")
+def get_thread(conversation_id: str, user_id: str, limit: int = 30, before: str | None = None):
+    """Konuşmanın mesajlarını sayfalı getirir."""
+    thread, err = message_service.get_thread(conversation_id, user_id, min(max(limit, 1), 100), before)
+    if err:
+        return error_response(err, 404)
+    return success_response(thread)
+
+
+@messages_router.post("/{conversation_id}/read")
+def mark_read(conversation_id: str, req: MarkConversationReadRequest):
+    """Konuşmayı okundu olarak işaretler."""
+    ok, err = message_service.mark_read(conversation_id, req.user_id)
+    if not ok:
+        return error_response(err, 404)
+    return success_response(message="Okundu olarak işaretlendi.")
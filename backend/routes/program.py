@@ -3,7 +3,7 @@ from typing import List, Dict, Any
 from fastapi import APIRouter
 from utils.responses import success_response, error_response
 from services.program_service import program_service
-from schemas import SaveProgramRequest, ArchiveProgramRequest
+from schemas import SaveProgramRequest, ArchiveProgramRequest, UpdateProgramItemRequest
 
 program_router = APIRouter()
 
@@ -24,6 +24,18 @@ def save_program(req: SaveProgramRequest):
     return success_response(message="Kaydedildi")
 
 
+@program_router.patch("/program-item/{item_id}")
+def update_program_item(item_id: str, req: UpdateProgramItemRequest):
+    """Tek bir program maddesini günceller (ör. tamamlandı işareti); sadece o maddeyi döndürür."""
+    changes = req.model_dump(exclude={"user_id"}, exclude_none=True)
+    if not changes:
+        return error_response("Güncellenecek alan yok.", 400)
+    item, err = program_service.update_item(req.user_id, item_id, changes)
+    if err:
+        return error_response(err, 400)
+    return success_response({"item": item})
+
+
 @program_router.post("/archive-program")
 def archive_program(req: ArchiveProgramRequest):
     """Programı geçmişe arşivler."""
@@ -43,6 +55,24 @@ def get_history(user_id: str) -> List[Dict[str, Any]]:
     return rows
 
 
+@program_router.get("/history-summary/{user_id}")
+def get_history_summary(user_id: str):
+    """Geçmiş listesi için özetler (tarih, tamamlanma oranı, soru sayısı)."""
+    rows, err = program_service.get_history_summary(user_id)
+    if err:
+        return error_response(err, 500)
+    return success_response({"history": rows})
+
+
+@program_router.get("/history/{history_id}")
+def get_history_entry(history_id: str):
+    """Tek bir geçmiş haftasının maddeleri."""
+    entry, err = program_service.get_history_entry(history_id)
+    if err:
+        return error_response(err, 404)
+    return success_response({"entry": entry})
+
+
 @program_router.delete("/delete-history/{history_id}")
 def delete_history(history_id: str):
     """Geçmiş kaydını siler."""
@@ -33,6 +33,10 @@ def add_question(
     if err:
         return error_response(err, 500)
     
+    if result.get("image_reused"):
+        return success_response(result, message="Aynı görsel zaten havuzda, mevcut görsel kullanıldı.", status_code=201)
+    if result.get("duplicate"):
+        return success_response(result, message="Soru havuza eklendi; benzer bir soru zaten havuzda.", status_code=201)
     return success_response(result, message="Soru havuza eklendi!", status_code=201)
 
 @questions_router.get("/{user_id}")
@@ -0,0 +1,74 @@
+"""Öğrenci paneli için Server-Sent Events akışı (duyuru, etkinlik, mesaj)."""
+import asyncio
+import json
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from utils.responses import error_response
+from firebase_db import get_firestore
+from services.realtime import hub, SUBSCRIBER_QUEUE_SIZE
+from services.stream_service import (
+    institution_watches, message_watch, MESSAGE_WATCH_KEY,
+    institution_channel, user_channel,
+)
+
+stream_router = APIRouter()
+
+KEEPALIVE_SECONDS = 15
+
+
+def _load_user(user_id: str) -> dict | None:
+    snap = get_firestore().collection("users").document(user_id).get()
+    return snap.to_dict() if snap.exists else None
+
+
+def _visible(event: dict, class_id: str | None) -> bool:
+    """Sınıfa özel duyuru/etkinlikler sadece o sınıftaki öğrenciye gider."""
+    target = (event.get("data") or {}).get("class_id")
+    return not target or target == class_id
+
+
+@stream_router.get("/stream/{user_id}")
+async def user_event_stream(user_id: str, request: Request):
+    """Kullanıcıya yeni duyuru, takvim etkinliği ve mesajları SSE ile iletir."""
+    # Note: /announcements ve /events gibi herkese açık; öğrenci tarafında JWT yok.
+    user = await run_in_threadpool(_load_user, user_id)
+    if user is None:
+        return error_response("Kullanıcı bulunamadı.", 404)
+    institution_id = user.get("institution_id")
+    class_id = user.get("class_id")
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    channels = [user_channel(user_id)]
+    await run_in_threadpool(message_watch.acquire, MESSAGE_WATCH_KEY)
+    if institution_id and user.get("status") != "pending":
+        channels.append(institution_channel(institution_id))
+        await run_in_threadpool(institution_watches.acquire, institution_id)
+    for channel in channels:
+        hub.subscribe(channel, queue)
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event["type"] != "message" and not _visible(event, class_id):
+                    continue
+                data = json.dumps(event.get("data"), ensure_ascii=False, default=str)
+                yield f"event: {event['type']}\nid: {event['data'].get('id', '')}\ndata: {data}\n\n"
+        finally:
+            for channel in channels:
+                hub.unsubscribe(channel, queue)
+            message_watch.release(MESSAGE_WATCH_KEY)
+            if len(channels) > 1:
+                institution_watches.release(institution_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,15 +1,20 @@
 """Öğretmen paneli rotaları (FastAPI)."""
 from typing import List, Dict, Any
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, UploadFile, File, Form
 from utils.responses import success_response, error_response
+from utils.spreadsheet import read_rows
 from services.teacher_service import teacher_service
+from services.analiz_service import analiz_service
 from middleware.auth import create_token, require_teacher
 from schemas import (
     TeacherLoginRequest,
     AssignProgramRequest,
+    BulkAssignProgramRequest,
     ApproveStudentRequest,
+    BulkApproveStudentsRequest,
     CreateClassRequest,
     AssignClassRequest,
+    BulkAssignClassRequest,
     DeleteClassRequest,
     CreateAssignmentTemplateRequest,
     DeleteAssignmentTemplateRequest,
@@ -22,6 +27,14 @@ from schemas import (
 teacher_router = APIRouter()
 
 
+def _teacher_scope(auth: dict, institution_id: str) -> dict | None:
+    """Token sahibinin kayıtlı kapsamı; istenen kurum bu öğretmene ait değilse None."""
+    scope = teacher_service.get_scope(auth["sub"])
+    if scope is None or institution_id not in scope["institution_ids"]:
+        return None
+    return scope
+
+
 @teacher_router.post("/login")
 def teacher_login(req: TeacherLoginRequest):
     """Öğretmen girişi."""
@@ -53,6 +66,59 @@ def assign_program(req: AssignProgramRequest, auth: dict = Depends(require_teach
     return success_response(message="Haftalık program başarıyla atandı!", status_code=201)
 
 
+@teacher_router.post("/assign-program-bulk")
+def assign_program_bulk(req: BulkAssignProgramRequest, auth: dict = Depends(require_teacher)):
+    """Programı veya şablonu sınıfa / öğrenci listesine toplu atama."""
+    if req.teacher_id != auth["sub"]:
+        return error_response("Bu işlem için yetkiniz yok.", 403)
+    if not req.template_id and not req.program:
+        return error_response("template_id veya program gerekli.", 400)
+    if not req.class_id and not req.student_ids:
+        return error_response("class_id veya student_ids gerekli.", 400)
+    results, err = teacher_service.assign_program_bulk(
+        req.teacher_id, req.program, req.template_id, req.class_id, req.student_ids
+    )
+    if err:
+        return error_response(err, 400)
+    assigned = sum(1 for r in results if r["status"] == "ok")
+    return success_response({
+        "assigned": assigned,
+        "failed": len(results) - assigned,
+        "results": results,
+    }, status_code=201)
+
+
+@teacher_router.post("/import-exam-results")
+def import_exam_results(
+    file: UploadFile = File(...),
+    institution_id: str = Form(...),
+    auth: dict = Depends(require_teacher),
+):
+    """Deneme sonuçlarını CSV/XLSX dosyasından toplu içe aktarır.
+
+    Sütunlar: student_id (veya email), ad, type, net, date.
+    Öğrenci listesi token sahibinin kayıtlı türü ve admin'i üzerinden çözülür.
+    """
+    scope = _teacher_scope(auth, institution_id)
+    if scope is None:
+        return error_response("Bu kurum için yetkiniz yok.", 403)
+    rows = read_rows(file.filename, file.file.read())
+    if not rows:
+        return error_response("Dosyada veri satırı bulunamadı.", 400)
+    roster = teacher_service.get_students(
+        institution_id, teacher_type=scope["teacher_type"], admin_id=scope["admin_id"]
+    )
+    report, err = analiz_service.import_rows(roster, rows)
+    if err:
+        return error_response(err, 500)
+    imported = sum(1 for r in report if r["status"] == "ok")
+    return success_response({
+        "imported": imported,
+        "failed": len(report) - imported,
+        "report": report,
+    })
+
+
 @teacher_router.post("/approve-student")
 def approve_student(req: ApproveStudentRequest, auth: dict = Depends(require_teacher)):
     """Öğrenci onaylama."""
@@ -62,6 +128,21 @@ def approve_student(req: ApproveStudentRequest, auth: dict = Depends(require_tea
     return success_response(message="Öğrenci onaylandı.")
 
 
+@teacher_router.post("/approve-students")
+def approve_students(req: BulkApproveStudentsRequest, auth: dict = Depends(require_teacher)):
+    """Birden çok öğrenciyi onaylama (kurum, tür ve admin token sahibinin kaydından alınır)."""
+    scope = _teacher_scope(auth, req.institution_id)
+    if scope is None:
+        return error_response("Bu kurum için yetkiniz yok.", 403)
+    results, err = teacher_service.approve_students(
+        req.student_ids, req.institution_id, scope["teacher_type"], scope["admin_id"]
+    )
+    if err:
+        return error_response(err, 500)
+    approved = sum(1 for r in results if r["status"] == "ok")
+    return success_response({"approved": approved, "failed": len(results) - approved, "results": results})
+
+
 @teacher_router.post("/create-class")
 def create_class(req: CreateClassRequest, auth: dict = Depends(require_teacher)):
     """Yeni sınıf oluşturma (sadece rehber öğretmen)."""
@@ -93,6 +174,23 @@ def assign_class(req: AssignClassRequest, auth: dict = Depends(require_teacher))
     return success_response(message="Öğrenci sınıfı güncellendi.")
 
 
+@teacher_router.post("/assign-class-bulk")
+def assign_class_bulk(req: BulkAssignClassRequest, auth: dict = Depends(require_teacher)):
+    """Birden çok öğrenciyi sınıfa atama (sadece rehber öğretmen)."""
+    scope = _teacher_scope(auth, req.institution_id)
+    if scope is None:
+        return error_response("Bu kurum için yetkiniz yok.", 403)
+    if scope["teacher_type"] != "rehber":
+        return error_response("Sadece rehber öğretmenler öğrenciyi sınıfa atayabilir.", 403)
+    results, err = teacher_service.update_students_class(
+        req.student_ids, req.class_id, req.institution_id, scope["teacher_type"], scope["admin_id"]
+    )
+    if err:
+        return error_response(err, 500)
+    updated = sum(1 for r in results if r["status"] == "ok")
+    return success_response({"updated": updated, "failed": len(results) - updated, "results": results})
+
+
 @teacher_router.post("/delete-class")
 def delete_class(req: DeleteClassRequest, auth: dict = Depends(require_teacher)):
     """Sınıf silme (sadece rehber öğretmen)."""
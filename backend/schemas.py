@@ -62,9 +62,20 @@ class AssignProgramRequest(BaseModel):
     student_id: str
     program: List[Any]  # Complex nested structure, keeping as Any or list for now
 
+class BulkAssignProgramRequest(BaseModel):
+    teacher_id: str
+    template_id: Optional[str] = None  # Şablon verilirse program yerine onun maddeleri kullanılır
+    program: Optional[List[Any]] = None
+    class_id: Optional[str] = None
+    student_ids: List[str] = []
+
 class ApproveStudentRequest(BaseModel):
     student_id: str
 
+class BulkApproveStudentsRequest(BaseModel):
+    institution_id: str
+    student_ids: List[str] = Field(..., min_length=1)
+
 class CreateClassRequest(BaseModel):
     institution_id: str
     name: str
@@ -80,6 +91,11 @@ class AssignClassRequest(BaseModel):
     class_id: Optional[str] = None
     teacher_type: str = "teacher"
 
+class BulkAssignClassRequest(BaseModel):
+    institution_id: str
+    student_ids: List[str] = Field(..., min_length=1)
+    class_id: Optional[str] = None
+
 # --- Assignment Template Schemas ---
 
 class CreateAssignmentTemplateRequest(BaseModel):
@@ -103,6 +119,14 @@ class SaveProgramRequest(BaseModel):
     user_id: str
     program: List[Any]
 
+class UpdateProgramItemRequest(BaseModel):
+    user_id: str
+    completed: Optional[bool] = None
+    task: Optional[str] = None
+    duration: Optional[str] = None
+    gun: Optional[str] = None
+    questions: Optional[int] = Field(None, ge=0)
+
 class ArchiveProgramRequest(BaseModel):
     user_id: str
     type: str = "manual"
@@ -155,9 +179,12 @@ class CreateAnnouncementRequest(BaseModel):
 class CreateMessageRequest(BaseModel):
     sender_id: str
     receiver_id: str
-    content: str
+    content: str = Field(..., min_length=1, max_length=4000)
     # metadata for push notifications etc.
 
+class MarkConversationReadRequest(BaseModel):
+    user_id: str
+
 class CreateMaterialRequest(BaseModel):
     institution_id: str
     teacher_id: str
@@ -200,13 +227,26 @@ class CreateDeckRequest(BaseModel):
     creator_id: str
     title: str
     subject: str
-    cards: List[FlashcardItem]
+    cards: List[FlashcardItem] = Field(..., min_length=1)
 
 class DuelChallengeRequest(BaseModel):
     challenger_id: str
     opponent_id: str
     deck_id: str
 
+class ReviewEnrollRequest(BaseModel):
+    user_id: str
+    deck_id: str
+
+class ReviewGradeRequest(BaseModel):
+    user_id: str
+    card_id: str
+    quality: int = Field(..., ge=0, le=5)
+
+class MatchmakingRequest(BaseModel):
+    user_id: str
+    deck_id: str
+
 class DuelSubmissionRequest(BaseModel):
     duel_id: str
     user_id: str
@@ -0,0 +1,21 @@
+"""popularity alanı olmayan eski destelere sıfır değerli katalog alanlarını ekler.
+
+Alan olmadan deste katalog sorgusunda (order_by popularity) görünmez.
+"""
+from migration_runner import Migration, update_doc, run_cli
+from services.catalog_service import COLLECTION_DECKS
+
+
+class DeckPopularityFields(Migration):
+    name = "deck_popularity_fields_v1"
+    collection = COLLECTION_DECKS
+
+    def transform(self, doc):
+        data = doc.to_dict() or {}
+        if "popularity" in data:
+            return None
+        return [update_doc(doc.reference, {"popularity": 0, "duel_count": 0, "use_count": 0})]
+
+
+if __name__ == "__main__":
+    run_cli(DeckPopularityFields)
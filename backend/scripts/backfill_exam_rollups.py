@@ -0,0 +1,57 @@
+"""users/{uid}/exam_results kayıtlarından haftalık exam_rollups kovalarını yeniden hesaplar.
+
+Her kullanıcının kovaları sonuçlardan mutlak değerlerle yazılır; taşıma
+(--reset dahil) tekrar çalıştırılabilir. Kovalar okundukları haliyle güncellenir
+(update_time ön koşulu / create): arada canlı bir ekleme/silme kovayı yazarsa yazma
+başarısız olur ve sayfa tekrar çalıştırmada yeniden hesaplanır.
+"""
+from collections import defaultdict
+from migration_runner import Migration, create_doc, delete_doc, update_doc, run_cli
+from firebase_db import get_firestore
+from services.analiz_service import (
+    COLLECTION_EXAM_RESULTS,
+    SUBCOLLECTION_EXAM_ROLLUPS,
+    _rollup_ref,
+    _rollup_values,
+    _week_start,
+)
+
+
+class ExamRollupsFromResults(Migration):
+    name = "exam_rollups_from_results_v2"
+    collection = "users"
+    page_size = 100
+
+    def transform(self, doc):
+        db = get_firestore()
+        buckets: dict[str, dict] = defaultdict(lambda: {"nets": []})
+        for result in doc.reference.collection(COLLECTION_EXAM_RESULTS).stream():
+            data = result.to_dict() or {}
+            if data.get("net") is None or not hasattr(data.get("date"), "isoformat"):
+                continue
+            exam_type = data.get("type") or "Diğer"
+            ref = _rollup_ref(db, doc.id, exam_type, data["date"])
+            bucket = buckets[ref.id]
+            bucket.setdefault("ref", ref)
+            bucket.setdefault("type", exam_type)
+            bucket.setdefault("start", _week_start(data["date"]))
+            bucket["nets"].append(data["net"])
+
+        existing = {snap.id: snap for snap in doc.reference.collection(SUBCOLLECTION_EXAM_ROLLUPS).stream()}
+        steps = []
+        for rollup_id, bucket in buckets.items():
+            values = _rollup_values(bucket["type"], bucket["start"], bucket["nets"])
+            snap = existing.pop(rollup_id, None)
+            if snap is None:
+                steps.append(create_doc(bucket["ref"], values))
+            else:
+                steps.append(update_doc(bucket["ref"], values,
+                                        option=db.write_option(last_update_time=snap.update_time)))
+        # Sonucu kalmamış kovalar
+        for snap in existing.values():
+            steps.append(delete_doc(snap.reference, option=db.write_option(last_update_time=snap.update_time)))
+        return steps
+
+
+if __name__ == "__main__":
+    run_cli(ExamRollupsFromResults)
@@ -0,0 +1,37 @@
+"""friends koleksiyonundan kullanıcı başına `user_friends` listelerini oluşturur."""
+from migration_runner import Migration, set_doc, run_cli
+from firebase_db import get_firestore
+from services.friends_service import COLLECTION_USER_FRIENDS, COLLECTION_USERS, friend_summary
+
+
+class BackfillFriendLists(Migration):
+    """Her arkadaşlık için iki tarafın user_friends dokümanına karşı tarafı ekler."""
+    name = "backfill_friend_lists_v1"
+    collection = "friends"
+    page_size = 200
+
+    def transform(self, doc):
+        data = doc.to_dict() or {}
+        users = data.get("users") or []
+        if len(users) != 2:
+            return None
+        db = get_firestore()
+        snaps = db.get_all([db.collection(COLLECTION_USERS).document(uid) for uid in users])
+        profiles = {s.id: s.to_dict() for s in snaps if s.exists}
+        a, b = users
+        lists = db.collection(COLLECTION_USER_FRIENDS)
+
+        def entry(uid):
+            summary = friend_summary(profiles.get(uid))
+            if data.get("created_at"):
+                summary["since"] = data["created_at"]
+            return summary
+
+        return [
+            set_doc(lists.document(a), {"friends": {b: entry(b)}}, merge=True),
+            set_doc(lists.document(b), {"friends": {a: entry(a)}}, merge=True),
+        ]
+
+
+if __name__ == "__main__":
+    run_cli(BackfillFriendLists)
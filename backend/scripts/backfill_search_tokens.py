@@ -0,0 +1,20 @@
+"""Mevcut kullanıcılar için `search_tokens` alanını (yeniden) hesaplar."""
+from migration_runner import Migration, update_doc, run_cli
+from utils.text_search import build_search_tokens
+
+
+class BackfillSearchTokens(Migration):
+    """users dokümanlarına Türkçe katlanmış edge n-gram arama token'larını yazar."""
+    name = "backfill_search_tokens_v1"
+    collection = "users"
+
+    def transform(self, doc):
+        data = doc.to_dict() or {}
+        tokens = build_search_tokens(data.get("name"), data.get("email"))
+        if data.get("search_tokens") == tokens:
+            return None
+        return [update_doc(doc.reference, {"search_tokens": tokens})]
+
+
+if __name__ == "__main__":
+    run_cli(BackfillSearchTokens)
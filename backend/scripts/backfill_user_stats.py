@@ -0,0 +1,54 @@
+"""user_stats özetlerini (süre, görev, arşiv sayısı) program_history ve aktif programdan yeniden hesaplar.
+
+Toplamlar kullanıcının tüm geçmiş kayıtlarındaki ve aktif programındaki
+tamamlanmış maddelerden mutlak değer olarak yazılır; taşıma (--reset dahil)
+tekrar çalıştırılabilir. Özet okunduğu haliyle güncellenir (update_time ön
+koşulu / create): arada canlı bir tamamlanma işlenirse yazma başarısız olur ve
+sayfa tekrar çalıştırmada yeniden hesaplanır.
+Seri (streak) alanları geçmişten çıkarılamaz, yeni etkinlikle oluşur.
+"""
+from firebase_admin import firestore
+from migration_runner import Migration, create_doc, update_doc, run_cli
+from firebase_db import get_firestore
+from services.program_service import (
+    COLLECTION_PROGRAM_HISTORY,
+    COLLECTION_PROGRAMS,
+    COLLECTION_USER_STATS,
+    _history_items,
+)
+from utils.duration import parse_duration_minutes
+
+
+class UserStatsFromHistory(Migration):
+    name = "user_stats_from_history_v2"
+    collection = "users"
+    page_size = 100
+
+    def transform(self, doc):
+        db = get_firestore()
+        history = list(
+            db.collection(COLLECTION_PROGRAM_HISTORY).where("user_id", "==", doc.id).stream()
+        )
+        program = db.collection(COLLECTION_PROGRAMS).document(doc.id).get()
+        items = [it for h in history for it in _history_items(h.to_dict() or {})]
+        if program.exists:
+            items += (program.to_dict() or {}).get("items") or []
+        if not history and not items:
+            return None
+
+        done = [it for it in items if it.get("completed")]
+        values = {
+            "total_minutes": sum(parse_duration_minutes(it.get("duration")) for it in done),
+            "tasks_completed": len(done),
+            "weeks_archived": len(history),
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }
+        stats_ref = db.collection(COLLECTION_USER_STATS).document(doc.id)
+        stats = stats_ref.get()
+        if not stats.exists:
+            return [create_doc(stats_ref, values)]
+        return [update_doc(stats_ref, values, option=db.write_option(last_update_time=stats.update_time))]
+
+
+if __name__ == "__main__":
+    run_cli(UserStatsFromHistory)
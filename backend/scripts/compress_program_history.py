@@ -0,0 +1,32 @@
+"""program_history kayıtlarındaki JSON string `program_data` alanını
+sıkıştırılmış `program_blob` + özet alanlarına çevirir."""
+from firebase_admin import firestore
+from migration_runner import Migration, update_doc, run_cli
+from services.program_service import (
+    COLLECTION_PROGRAM_HISTORY,
+    HISTORY_ENCODING,
+    _history_items,
+    _history_summary,
+    _pack_items,
+)
+
+
+class CompressProgramHistory(Migration):
+    name = "compress_program_history_v1"
+    collection = COLLECTION_PROGRAM_HISTORY
+
+    def transform(self, doc):
+        data = doc.to_dict() or {}
+        if "program_data" not in data:
+            return None
+        items = _history_items(data)
+        return [update_doc(doc.reference, {
+            **_history_summary(items),
+            "program_blob": _pack_items(items),
+            "encoding": HISTORY_ENCODING,
+            "program_data": firestore.DELETE_FIELD,
+        })]
+
+
+if __name__ == "__main__":
+    run_cli(CompressProgramHistory)
@@ -0,0 +1,47 @@
+"""Satır içi `cards` dizisi olan eski desteleri parçalı (card_chunks) formata taşır.
+
+Bir destenin parça yazmaları ve `cards` alanının silinmesi tek batch'te yapılır;
+deste okunduktan sonra değiştiyse (update_time ön koşulu) batch uygulanmaz ve
+sayfa tekrar çalıştırmada yeniden işlenir.
+"""
+from firebase_admin import firestore
+from migration_runner import Migration, atomic, set_doc, update_doc, run_cli
+from firebase_db import get_firestore
+from services.flashcard_service import (
+    CARD_CHUNK_SIZE,
+    COLLECTION_DECKS,
+    SUBCOLLECTION_CARD_CHUNKS,
+    _cards_hash,
+    _chunk_id,
+)
+
+
+class DeckCardChunks(Migration):
+    """Kartları CARD_CHUNK_SIZE'lık parçalara böler, deste dokümanını manifeste çevirir."""
+    name = "deck_card_chunks_v1"
+    collection = COLLECTION_DECKS
+
+    def transform(self, doc):
+        data = doc.to_dict() or {}
+        cards = data.get("cards")
+        if cards is None:
+            return None
+        chunks = [cards[i:i + CARD_CHUNK_SIZE] for i in range(0, len(cards), CARD_CHUNK_SIZE)]
+        chunk_ids = [_chunk_id(i) for i in range(len(chunks))]
+        chunks_ref = doc.reference.collection(SUBCOLLECTION_CARD_CHUNKS)
+        steps = [
+            set_doc(chunks_ref.document(chunk_id), {"index": index, "cards": chunk})
+            for index, (chunk_id, chunk) in enumerate(zip(chunk_ids, chunks))
+        ]
+        steps.append(update_doc(doc.reference, {
+            "card_count": len(cards),
+            "chunk_size": CARD_CHUNK_SIZE,
+            "chunk_ids": chunk_ids,
+            "content_hash": _cards_hash(cards),
+            "cards": firestore.DELETE_FIELD,
+        }, option=get_firestore().write_option(last_update_time=doc.update_time)))
+        return [atomic(*steps)]
+
+
+if __name__ == "__main__":
+    run_cli(DeckCardChunks)
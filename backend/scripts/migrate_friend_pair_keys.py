@@ -0,0 +1,52 @@
+"""Arkadaşlık ve istek dokümanlarını min(uid)_max(uid) anahtarlı ID'lere taşır.
+
+Yeni dokümanın yazılması ve eskisinin silinmesi tek batch'te yapılır; eski
+doküman okunduktan sonra değiştiyse (update_time ön koşulu) hiçbiri uygulanmaz.
+"""
+from migration_runner import Migration, atomic, set_doc, delete_doc, run_cli
+from firebase_db import get_firestore
+from utils.ids import pair_key
+
+
+def _delete_read(doc):
+    """Dokümanı sadece okunduğu haliyle duruyorsa siler."""
+    return delete_doc(doc.reference, option=get_firestore().write_option(last_update_time=doc.update_time))
+
+
+class FriendshipPairKeys(Migration):
+    """friends dokümanlarını çift anahtarlı ID'lere taşır (mükerrerler birleşir)."""
+    name = "friend_pair_keys_friends_v1"
+    collection = "friends"
+
+    def transform(self, doc):
+        data = doc.to_dict() or {}
+        users = data.get("users") or []
+        if len(users) != 2:
+            return [delete_doc(doc.reference)]
+        key = pair_key(*users)
+        if doc.id == key:
+            return None
+        target = doc.reference.parent.document(key)
+        return [atomic(set_doc(target, data), _delete_read(doc))]
+
+
+class FriendRequestPairKeys(Migration):
+    """Bekleyen istekleri çift anahtarlı ID'lere taşır, işlenmiş eski istekleri siler."""
+    name = "friend_pair_keys_requests_v1"
+    collection = "friend_requests"
+
+    def transform(self, doc):
+        data = doc.to_dict() or {}
+        if not data.get("from") or not data.get("to"):
+            return [delete_doc(doc.reference)]
+        key = pair_key(data["from"], data["to"])
+        if doc.id == key:
+            return None
+        # Kabul edilenler friends'te zaten var, reddedilenler artık kullanılmıyor
+        if data.get("status") == "pending":
+            return [atomic(set_doc(doc.reference.parent.document(key), data), _delete_read(doc))]
+        return [_delete_read(doc)]
+
+
+if __name__ == "__main__":
+    run_cli(FriendshipPairKeys, FriendRequestPairKeys)
@@ -0,0 +1,306 @@
+"""Firestore veri taşıma (migration) çatısı.
+
+Bir taşıma, `Migration` sınıfından türetilip hangi dokümanları gezeceğini
+(`collection` / `query`) ve her doküman için hangi yazma adımlarını üreteceğini
+(`transform`) tanımlar:
+
+    class RenameField(Migration):
+        name = "rename_field_v1"
+        collection = "users"
+
+        def transform(self, doc):
+            data = doc.to_dict()
+            if "old" in data:
+                yield update_doc(doc.reference, {"new": data["old"], "old": firestore.DELETE_FIELD})
+
+    if __name__ == "__main__":
+        run_cli(RenameField)
+
+Yazmalar BulkWriter ile paralel commit edilir. Her sayfa tamamlandığında son
+işlenen dokümanın yolu `_migrations/{name}` dokümanına yazılır; yarıda kalan
+çalıştırma oradan devam eder. `--dry-run` hiçbir şey yazmadan adım sayılarını verir.
+
+Bir sayfada kalıcı olarak başarısız olan yazma varsa checkpoint ilerletilmez:
+başarısız doküman yolları `failed_paths` alanına kaydedilir ve çalıştırma
+`MigrationError` ile durur; tekrar çalıştırıldığında aynı sayfa yeniden işlenir.
+
+Adımlar idempotent olmalıdır: sayfa ortasında kesilen ya da hata nedeniyle
+tekrarlanan bir sayfanın yazmaları ikinci kez uygulanır. Bu yüzden
+`firestore.Increment` gibi tekrarında sonucu değiştiren değerler reddedilir;
+sayaçlar kaynaktan hesaplanıp mutlak değer olarak yazılmalıdır. Yarış ihtimali
+olan yazmalar `option` ön koşuluyla (ör. okunan `update_time`), birbirinden
+ayrılmaması gereken yazmalar `atomic(...)` ile tek batch'te gönderilir.
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Iterable, NamedTuple
+
+from google.api_core import exceptions as gexc
+
+# Add the parent directory to sys.path to allow importing from backend modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from firebase_admin import firestore
+from firebase_db import initialize_firebase, get_firestore
+from utils.batch import PERMANENT_ERROR_CODES
+
+COLLECTION_MIGRATIONS = "_migrations"
+MAX_FAILED_PATHS = 100  # checkpoint'e yazılan başarısız doküman yolu sayısı
+
+
+class MigrationError(RuntimeError):
+    """Sayfa yazmaları başarısız oldu; checkpoint ilerletilmedi."""
+
+
+class Step(NamedTuple):
+    """Bir dokümana uygulanacak tek yazma adımı."""
+    action: str  # "set" | "create" | "update" | "delete" | "atomic"
+    ref: Any
+    data: dict | None = None
+    merge: bool = False
+    option: Any = None  # db.write_option(...) ön koşulu (update / delete)
+    steps: tuple = ()  # "atomic" için tek batch'te yazılacak adımlar
+
+
+def set_doc(ref, data: dict, merge: bool = False) -> Step:
+    return Step("set", ref, data, merge)
+
+
+def create_doc(ref, data: dict) -> Step:
+    """Doküman zaten varsa başarısız olur."""
+    return Step("create", ref, data)
+
+
+def update_doc(ref, data: dict, option=None) -> Step:
+    return Step("update", ref, data, option=option)
+
+
+def delete_doc(ref, option=None) -> Step:
+    return Step("delete", ref, option=option)
+
+
+def atomic(*steps: Step) -> Step:
+    """Adımları tek WriteBatch'te, ya hep ya hiç uygular (en fazla 500 yazma)."""
+    return Step("atomic", steps[0].ref if steps else None, steps=tuple(steps))
+
+
+def _has_increment(value) -> bool:
+    if isinstance(value, firestore.Increment):
+        return True
+    if isinstance(value, dict):
+        return any(_has_increment(v) for v in value.values())
+    return False
+
+
+def _check_idempotent(step: Step) -> None:
+    """Tekrar uygulandığında sonucu değişecek adımları reddeder."""
+    for inner in step.steps or (step,):
+        if inner.action == "atomic":
+            _check_idempotent(inner)
+        elif _has_increment(inner.data):
+            raise ValueError(
+                f"Migration adimlari idempotent olmali; Increment kullanilamaz ({inner.ref.path})"
+            )
+
+
+class Migration:
+    """Taşıma tanımı. Alt sınıflar `name`, `collection` ve `transform` belirler."""
+    name: str = ""
+    collection: str = ""
+    collection_group: bool = False
+    page_size: int = 500
+
+    def query(self, db):
+        """Gezilecek dokümanların sorgusu (sıralama ve sayfalama runner'a aittir)."""
+        if self.collection_group:
+            return db.collection_group(self.collection)
+        return db.collection(self.collection)
+
+    def transform(self, doc) -> Iterable[Step] | None:
+        """Doküman için yazma adımlarını döndürür; None/boş ise doküman atlanır."""
+        raise NotImplementedError
+
+
+class MigrationRunner:
+    """Taşımayı sayfa sayfa, checkpoint'li ve paralel yazmalarla çalıştırır."""
+
+    def __init__(self, migration: Migration, db=None, dry_run: bool = False, reset: bool = False):
+        if not migration.name or not migration.collection:
+            raise ValueError("Migration icin name ve collection zorunlu.")
+        self.migration = migration
+        self.db = db or get_firestore()
+        self.dry_run = dry_run
+        self.reset = reset
+        self.state_ref = self.db.collection(COLLECTION_MIGRATIONS).document(migration.name)
+        self.counts: Counter = Counter()
+        self._page_failures: list[str] = []
+
+    def _load_checkpoint(self) -> dict:
+        if self.reset:
+            return {}
+        snap = self.state_ref.get()
+        return (snap.to_dict() or {}) if snap.exists else {}
+
+    def _save_checkpoint(self, last_path: str | None, done: bool = False,
+                         failed_paths: list[str] | None = None) -> None:
+        self.state_ref.set({
+            "last_path": last_path,
+            "processed": self.counts["docs"],
+            "writes": self.counts["writes"],
+            "failed": self.counts["failed"],
+            "failed_paths": (failed_paths or [])[:MAX_FAILED_PATHS],
+            "done": done,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+
+    def _record_failure(self, path: str, message: str) -> None:
+        self.counts["failed"] += 1
+        self._page_failures.append(path)
+        print(f"  ! Yazma hatasi ({path}): {message}")
+
+    def _make_writer(self):
+        writer = self.db.bulk_writer()
+
+        def on_error(failure, bulk_writer) -> bool:
+            # Geçici hatalar BulkWriter tarafından tekrar denenir; ön koşul/veri hataları denenmez
+            if failure.code in PERMANENT_ERROR_CODES or failure.attempts >= 5:
+                self._record_failure(failure.operation.reference.path, failure.message)
+                return False
+            return True
+
+        writer.on_write_error(on_error)
+        return writer
+
+    def _commit_atomic(self, step: Step) -> None:
+        batch = self.db.batch()
+        for inner in step.steps:
+            if inner.action == "set":
+                batch.set(inner.ref, inner.data, merge=inner.merge)
+            elif inner.action == "create":
+                batch.create(inner.ref, inner.data)
+            elif inner.action == "update":
+                batch.update(inner.ref, inner.data, option=inner.option)
+            elif inner.action == "delete":
+                batch.delete(inner.ref, option=inner.option)
+            else:
+                raise ValueError(f"Atomic icinde desteklenmeyen adim: {inner.action}")
+        try:
+            batch.commit()
+        except gexc.GoogleAPICallError as e:
+            self._record_failure(step.ref.path, str(e))
+
+    def _apply(self, writer, step: Step) -> None:
+        if step.action == "set":
+            writer.set(step.ref, step.data, merge=step.merge)
+        elif step.action == "create":
+            writer.create(step.ref, step.data)
+        elif step.action == "update":
+            writer.update(step.ref, step.data, option=step.option)
+        elif step.action == "delete":
+            writer.delete(step.ref, option=step.option)
+        elif step.action == "atomic":
+            self._commit_atomic(step)
+        else:
+            raise ValueError(f"Bilinmeyen adim: {step.action}")
+
+    def run(self) -> Counter:
+        state = self._load_checkpoint()
+        if state.get("done") and not self.dry_run:
+            print(f"'{self.migration.name}' zaten tamamlanmis. Yeniden calistirmak icin --reset kullanin.")
+            return self.counts
+        last_path = None if self.dry_run else state.get("last_path")
+        if last_path:
+            self.counts["docs"] = state.get("processed", 0)
+            self.counts["writes"] = state.get("writes", 0)
+            print(f"Checkpoint bulundu, {last_path} sonrasindan devam ediliyor...")
+
+        writer = None if self.dry_run else self._make_writer()
+        started = time.monotonic()
+        session_docs = 0
+        try:
+            while True:
+                query = (
+                    self.migration.query(self.db)
+                    .order_by("__name__")
+                    .limit(self.migration.page_size)
+                )
+                if last_path:
+                    query = query.start_after({"__name__": self.db.document(last_path)})
+                page = list(query.stream())
+                if not page:
+                    break
+
+                self._page_failures = []
+                page_counts: Counter = Counter(docs=len(page))
+                for doc in page:
+                    for step in self.migration.transform(doc) or ():
+                        _check_idempotent(step)
+                        for inner in step.steps or (step,):
+                            page_counts[inner.action] += 1
+                            page_counts["writes"] += 1
+                        if writer is not None:
+                            self._apply(writer, step)
+
+                if writer is not None:
+                    # Sayfanın yazmaları bitmeden ve hepsi başarılı olmadan checkpoint ilerletilmez
+                    writer.flush()
+                    if self._page_failures:
+                        self._save_checkpoint(last_path, failed_paths=self._page_failures)
+                        raise MigrationError(
+                            f"{len(self._page_failures)} yazma basarisiz; checkpoint {last_path or 'bas'} "
+                            f"noktasinda birakildi, tekrar calistirildiginda sayfa yeniden islenecek."
+                        )
+                self.counts.update(page_counts)
+                if writer is not None:
+                    self._save_checkpoint(page[-1].reference.path)
+                session_docs += len(page)
+                last_path = page[-1].reference.path
+
+                elapsed = max(time.monotonic() - started, 1e-6)
+                print(
+                    f"  {self.counts['docs']} dokuman islendi, {self.counts['writes']} yazma "
+                    f"({session_docs / elapsed:.0f} dok/sn)"
+                )
+                if len(page) < self.migration.page_size:
+                    break
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is not None:
+            self._save_checkpoint(last_path, done=True)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        mode = "Deneme (dry-run)" if self.dry_run else "Tamamlandi"
+        detail = ", ".join(f"{k}={self.counts[k]}" for k in ("set", "create", "update", "delete", "failed") if self.counts[k])
+        print(
+            f"{mode}: {self.counts['docs']} dokuman, {self.counts['writes']} yazma"
+            f"{f' ({detail})' if detail else ''}, {elapsed:.1f} sn, {session_docs / elapsed:.0f} dok/sn"
+        )
+        return self.counts
+
+
+def run_cli(*migration_classes: type[Migration]) -> list[Counter]:
+    """Taşımaları sırayla komut satırı argümanlarıyla çalıştırır (--dry-run, --reset, --page-size)."""
+    parser = argparse.ArgumentParser(description=migration_classes[0].__doc__)
+    parser.add_argument("--dry-run", action="store_true", help="Yazmadan sadece say")
+    parser.add_argument("--reset", action="store_true", help="Checkpoint'i yok say, bastan basla")
+    parser.add_argument("--page-size", type=int, default=None)
+    args = parser.parse_args()
+
+    print("Firebase başlatılıyor...")
+    initialize_firebase()
+    results = []
+    for migration_cls in migration_classes:
+        migration = migration_cls()
+        if args.page_size:
+            migration.page_size = args.page_size
+        print(f"Migration: {migration.name} ({migration.collection})")
+        results.append(MigrationRunner(migration, dry_run=args.dry_run, reset=args.reset).run())
+    return results
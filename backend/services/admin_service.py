@@ -439,102 +439,193 @@ def update_settings(admin_id: str, settings: dict) -> tuple[bool, str | None]:
 
 EXAM_TYPES = ["TYT", "AYT", "YDT", "LGS"]
 
+
+def _student_performance_row(student: dict, exam_list: list[dict]) -> tuple[dict, dict]:
+    """Öğrencinin deneme sonuçlarından rapor satırını hesaplar.
+    Returns: (satır, tür -> net listesi)
+    """
+    # Tür bazlı ayrım
+    by_type = {}
+    for ed in exam_list:
+        etype = ed.get("type", "Diğer")
+        by_type.setdefault(etype, []).append(ed.get("net", 0))
+
+    # Öğrenci satırı
+    row = {
+        "id": student["id"],
+        "name": student["name"],
+        "exam_count": len(exam_list),
+    }
+
+    # Her tür için avg ve best
+    all_nets = []
+    for etype in EXAM_TYPES + ["Diğer"]:
+        nets = by_type.get(etype, [])
+        if nets:
+            row[f"{etype.lower()}_avg"] = round(sum(nets) / len(nets), 2)
+            row[f"{etype.lower()}_best"] = round(max(nets), 2)
+            row[f"{etype.lower()}_count"] = len(nets)
+            all_nets.extend(nets)
+
+    row["overall_avg"] = round(sum(all_nets) / len(all_nets), 2) if all_nets else 0
+    return row, by_type
+
+
 def get_performance_report(admin_id: str) -> dict:
-    """Kurum geneli performans raporu — TYT/AYT/YDT/LGS ayrımı ile."""
+    """Kurum geneli performans raporu — TYT/AYT/YDT/LGS ayrımı ile (hata olursa boş sözlük)."""
     try:
-        db = get_firestore()
+        return compute_performance_report(admin_id)
+    except Exception as e:
+        logger.exception("Performans raporu hatasi")
+        return {}
 
-        # Tüm öğretmen ID'leri
-        teacher_snap = (
-            db.collection(COLLECTION_INSTITUTIONS)
-            .where("admin_id", "==", admin_id)
-            .get()
-        )
-        all_inst_ids = [admin_id] + [d.id for d in teacher_snap]
 
-        # Tüm öğrencileri bul
-        all_students = []
-        for inst_id in all_inst_ids:
-            snap = (
-                db.collection("users")
-                .where("institution_id", "==", inst_id)
-                .get()
-            )
-            for doc in snap:
-                sd = doc.to_dict()
-                if sd.get("status") != "pending":
-                    all_students.append({"id": doc.id, "name": sd.get("name", "")})
+def compute_performance_report(admin_id: str) -> dict:
+    """Performans raporunu hesaplar; hatalar çağırana (ör. iş kuyruğu) yükseltilir."""
+    db = get_firestore()
 
-        # Her öğrencinin deneme sonuçlarını al
-        student_results = []
-        total_exam_count = 0
-        exam_type_stats = {}
+    # Tüm öğretmen ID'leri
+    teacher_snap = (
+        db.collection(COLLECTION_INSTITUTIONS)
+        .where("admin_id", "==", admin_id)
+        .get()
+    )
+    all_inst_ids = [admin_id] + [d.id for d in teacher_snap]
 
-        for student in all_students:
-            exams = (
-                db.collection("users")
-                .document(student["id"])
-                .collection("exam_results")
-                .get()
-            )
-            exam_list = list(exams)
-            if not exam_list:
-                continue
+    # Tüm öğrencileri bul
+    all_students = []
+    for inst_id in all_inst_ids:
+        snap = (
+            db.collection("users")
+            .where("institution_id", "==", inst_id)
+            .get()
+        )
+        for doc in snap:
+            sd = doc.to_dict()
+            if sd.get("status") != "pending":
+                all_students.append({"id": doc.id, "name": sd.get("name", "")})
 
-            # Tür bazlı ayrım
-            by_type = {}
-            for e in exam_list:
-                ed = e.to_dict()
-                etype = ed.get("type", "Diğer")
-                net = ed.get("net", 0)
-                if etype not in by_type:
-                    by_type[etype] = []
-                by_type[etype].append(net)
-
-                # Genel istatistik
-                if etype not in exam_type_stats:
-                    exam_type_stats[etype] = {"count": 0, "total_net": 0}
-                exam_type_stats[etype]["count"] += 1
-                exam_type_stats[etype]["total_net"] += net
-
-            total_exam_count += len(exam_list)
-
-            # Öğrenci satırı
-            row = {
-                "id": student["id"],
-                "name": student["name"],
-                "exam_count": len(exam_list),
-            }
-
-            # Her tür için avg ve best
-            all_nets = []
-            for etype in EXAM_TYPES + ["Diğer"]:
-                nets = by_type.get(etype, [])
-                if nets:
-                    row[f"{etype.lower()}_avg"] = round(sum(nets) / len(nets), 2)
-                    row[f"{etype.lower()}_best"] = round(max(nets), 2)
-                    row[f"{etype.lower()}_count"] = len(nets)
-                    all_nets.extend(nets)
-
-            row["overall_avg"] = round(sum(all_nets) / len(all_nets), 2) if all_nets else 0
-            student_results.append(row)
-
-        # Türlerin ortalamalarını hesapla
-        for etype in exam_type_stats:
-            stats = exam_type_stats[etype]
-            stats["avg_net"] = round(stats["total_net"] / stats["count"], 2) if stats["count"] > 0 else 0
-
-        # Genel ortalamaya göre sırala
-        student_results.sort(key=lambda s: s.get("overall_avg", 0), reverse=True)
+    # Her öğrencinin deneme sonuçlarını al
+    student_results = []
+    total_exam_count = 0
+    exam_type_stats = {}
 
-        return {
-            "total_students": len(all_students),
-            "students_with_exams": len(student_results),
-            "total_exams": total_exam_count,
-            "exam_types": list(exam_type_stats.keys()),
-            "student_rankings": student_results[:30],
-            "exam_type_stats": exam_type_stats,
+    for student in all_students:
+        exams = (
+            db.collection("users")
+            .document(student["id"])
+            .collection("exam_results")
+            .get()
+        )
+        exam_list = [e.to_dict() for e in exams]
+        if not exam_list:
+            continue
+
+        row, by_type = _student_performance_row(student, exam_list)
+
+        # Genel istatistik
+        for etype, nets in by_type.items():
+            if etype not in exam_type_stats:
+                exam_type_stats[etype] = {"count": 0, "total_net": 0}
+            exam_type_stats[etype]["count"] += len(nets)
+            exam_type_stats[etype]["total_net"] += sum(nets)
+
+        total_exam_count += len(exam_list)
+        student_results.append(row)
+
+    # Türlerin ortalamalarını hesapla
+    for etype in exam_type_stats:
+        stats = exam_type_stats[etype]
+        stats["avg_net"] = round(stats["total_net"] / stats["count"], 2) if stats["count"] > 0 else 0
+
+    # Genel ortalamaya göre sırala
+    student_results.sort(key=lambda s: s.get("overall_avg", 0), reverse=True)
+
+    return {
+        "total_students": len(all_students),
+        "students_with_exams": len(student_results),
+        "total_exams": total_exam_count,
+        "exam_types": list(exam_type_stats.keys()),
+        "student_rankings": student_results[:30],
+        "exam_type_stats": exam_type_stats,
+    }
+
+
+# ─── Dışa Aktarma (Streaming) ─────────────────────────────
+
+EXPORT_PAGE_SIZE = 200
+
+PERFORMANCE_EXPORT_FIELDS = ["id", "name", "exam_count", "overall_avg"] + [
+    f"{etype.lower()}_{stat}"
+    for etype in EXAM_TYPES + ["Diğer"]
+    for stat in ("avg", "best", "count")
+]
+
+EXAM_HISTORY_EXPORT_FIELDS = ["id", "ad", "type", "net", "date"]
+
+
+def _institution_ids(db, admin_id: str) -> list[str]:
+    """Kurum sahibi ve ona bağlı tüm öğretmen kurumlarının ID'leri."""
+    teacher_snap = (
+        db.collection(COLLECTION_INSTITUTIONS)
+        .where("admin_id", "==", admin_id)
+        .select(["__name__"])
+        .get()
+    )
+    return [admin_id] + [d.id for d in teacher_snap]
+
+
+def _paged(query, order_by: str = "__name__", page_size: int = EXPORT_PAGE_SIZE):
+    """Sorguyu `order_by` sırasıyla sayfa sayfa okuyup dokümanları tek tek verir."""
+    query = query.order_by(order_by)
+    last = None
+    while True:
+        page_query = query.limit(page_size)
+        if last is not None:
+            page_query = page_query.start_after(last)
+        page = list(page_query.stream())
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+def iter_performance_rows(admin_id: str):
+    """Kurumdaki her öğrencinin performans satırını okundukça üretir (liste tutmaz)."""
+    db = get_firestore()
+    for inst_id in _institution_ids(db, admin_id):
+        students = db.collection("users").where("institution_id", "==", inst_id)
+        for doc in _paged(students):
+            sd = doc.to_dict()
+            if sd.get("status") == "pending":
+                continue
+            exams = doc.reference.collection("exam_results").select(["type", "net"]).stream()
+            row, _ = _student_performance_row(
+                {"id": doc.id, "name": sd.get("name", "")}, [e.to_dict() for e in exams]
+            )
+            yield row
+
+
+def student_in_institution(admin_id: str, student_id: str) -> bool:
+    """Öğrencinin kurum sahibine (veya ona bağlı bir öğretmene) ait olup olmadığını kontrol eder."""
+    db = get_firestore()
+    snap = db.collection("users").document(student_id).get()
+    if not snap.exists:
+        return False
+    return (snap.to_dict() or {}).get("institution_id") in _institution_ids(db, admin_id)
+
+
+def iter_exam_history(student_id: str):
+    """Öğrencinin tüm deneme sonuçlarını sayfa sayfa, tarih sırasıyla üretir."""
+    db = get_firestore()
+    exams = db.collection("users").document(student_id).collection("exam_results")
+    for doc in _paged(exams, order_by="date"):
+        ed = doc.to_dict()
+        date = ed.get("date")
+        yield {
+            "id": doc.id,
+            "ad": ed.get("lesson_name", ""),
+            "type": ed.get("type", "Diğer"),
+            "net": ed.get("net", 0),
+            "date": date.isoformat() if hasattr(date, "isoformat") else date,
         }
-    except Exception as e:
-        logger.exception("Performans raporu hatasi")
-        return {}
@@ -1,15 +1,38 @@
 """Deneme analizi ve AI yorum servisi (Firestore)."""
 from __future__ import annotations
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from firebase_admin import firestore
+from pydantic import ValidationError as PydanticValidationError
 from firebase_db import get_firestore
+from schemas import AddAnalizRequest
+from utils.batch import DEFAULT_WORKERS, WriteOp, commit_in_batches
+from utils.text_search import words
 
 logger = logging.getLogger(__name__)
 
 COLLECTION_EXAM_RESULTS = "exam_results"
+SUBCOLLECTION_EXAM_ROLLUPS = "exam_rollups"
 
+# Haftalık özetler Türkiye saatine göre Pazartesi başlar
+ROLLUP_TZ = timezone(timedelta(hours=3))
+TREND_WEEKS = 12
+MOVING_AVERAGE_WINDOW = 4
 
-
+# Toplu içe aktarmada kabul edilen sütun adları -> AddAnalizRequest alanları
+IMPORT_COLUMN_ALIASES = {
+    "student_id": "user_id",
+    "ogrenci_id": "user_id",
+    "deneme": "ad",
+    "sinav": "ad",
+    "exam": "ad",
+    "tur": "type",
+    "tür": "type",
+    "exam_type": "type",
+    "tarih": "date",
+}
 
 
 def _doc_to_dict(doc) -> dict:
@@ -24,6 +47,85 @@ def _doc_to_dict(doc) -> dict:
     return d
 
 
+def _type_key(exam_type: str) -> str:
+    return "-".join(words(exam_type or "")) or "diger"
+
+
+def _week_start(value) -> datetime:
+    """Sınav tarihinin haftasının başlangıcı (saat dilimi yoksa Türkiye saati kabul edilir)."""
+    if not isinstance(value, datetime):
+        value = datetime.now(timezone.utc)
+    local = value.replace(tzinfo=ROLLUP_TZ) if value.tzinfo is None else value.astimezone(ROLLUP_TZ)
+    return (local - timedelta(days=local.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _rollup_ref(db, user_id: str, exam_type: str, date):
+    year, week, _ = _week_start(date).isocalendar()
+    doc_id = f"{_type_key(exam_type)}_{year}-W{week:02d}"
+    return (
+        db.collection("users").document(user_id)
+        .collection(SUBCOLLECTION_EXAM_ROLLUPS).document(doc_id)
+    )
+
+
+def _rollup_values(exam_type: str, start: datetime, nets: list[float]) -> dict:
+    """Haftalık özet kovasının sonuçlardan hesaplanmış mutlak değerleri."""
+    year, week, _ = start.isocalendar()
+    return {
+        "type": exam_type,
+        "week": f"{year}-W{week:02d}",
+        "week_start": start,
+        "count": len(nets),
+        "net_sum": sum(nets),
+        "best": max(nets),
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+
+
+def _write_rollup(transaction, db, user_id: str, exam_type: str, date,
+                  exclude_id: str | None = None, added_net: float | None = None) -> None:
+    """Kovayı transaction içinde haftanın sonuçlarından hesaplayıp yazar.
+
+    Ekleme, silme ve içe aktarma aynı hesabı kullanır: tür `_type_key` ile
+    karşılaştırılır, net'i olmayan sonuçlar atlanır, kalan sonuç yoksa kova
+    silinir. `exclude_id` aynı transaction'da silinen sonucu, `added_net`
+    aynı transaction'da eklenen (sorguda henüz görünmeyen) sonucu temsil eder.
+    Okumalar burada yapıldığından çağıran yazmalarını bundan sonra eklemelidir.
+    """
+    results = db.collection("users").document(user_id).collection(COLLECTION_EXAM_RESULTS)
+    rollup_ref = _rollup_ref(db, user_id, exam_type, date)
+    start = _week_start(date)
+    type_key = _type_key(exam_type)
+    # Kova önce okunur; aynı kovaya yazan eşzamanlı transaction'lar birbirine sıralanır
+    rollup_ref.get(transaction=transaction)
+    week_results = (
+        results.where("date", ">=", start)
+        .where("date", "<", start + timedelta(days=7))
+        .get(transaction=transaction)
+    )
+    nets = [
+        d["net"] for snap, d in ((snap, snap.to_dict() or {}) for snap in week_results)
+        if snap.id != exclude_id and d.get("net") is not None
+        and _type_key(d.get("type") or "Diğer") == type_key
+    ]
+    if added_net is not None:
+        nets.append(added_net)
+    if nets:
+        transaction.set(rollup_ref, _rollup_values(exam_type, start, nets))
+    else:
+        transaction.delete(rollup_ref)
+
+
+def _rebuild_rollup(db, user_id: str, exam_type: str, date) -> None:
+    """Kovayı haftanın sonuçlarından yeniden hesaplar; tekrar çalıştırmak sonucu değiştirmez."""
+
+    @firestore.transactional
+    def rebuild(transaction):
+        _write_rollup(transaction, db, user_id, exam_type, date)
+
+    rebuild(db.transaction())
+
+
 def get_analizler(user_id: str) -> list[dict]:
     """Kullanıcının deneme sonuçlarını getirir (users/{uid}/exam_results)."""
     try:
@@ -41,55 +143,225 @@ def get_analizler(user_id: str) -> list[dict]:
         return []
 
 
+def _parse_exam_date(date: any):
+    """Frontend'den gelen tarihi Firestore değerine çevirir (yoksa sunucu zamanı).
+
+    Saat dilimi olmayan tarihler Türkiye saati kabul edilip ROLLUP_TZ ile
+    işaretlenir; Firestore naive değerleri UTC sakladığından aksi halde kayıt
+    ile haftalık kovası farklı haftalara düşebilirdi.
+    """
+    if not date:
+        return firestore.SERVER_TIMESTAMP
+    # Eğer string gelirse (frontend'den ISO format gelebilir)
+    if isinstance(date, str):
+        try:
+            # Sadece YYYY-MM-DD gelirse
+            if len(date) == 10:
+                date = datetime.strptime(date, "%Y-%m-%d")
+            else:
+                date = datetime.fromisoformat(date.replace('Z', '+00:00'))
+        except ValueError:
+            return firestore.SERVER_TIMESTAMP
+    if isinstance(date, datetime):
+        return date.replace(tzinfo=ROLLUP_TZ) if date.tzinfo is None else date.astimezone(ROLLUP_TZ)
+    return date
+
+
+def _exam_result_data(user_id: str, ad: str, net: float, exam_type: str, date: any) -> dict:
+    return {
+        "lesson_name": ad,
+        "net": net,
+        "type": exam_type,
+        "date": _parse_exam_date(date),
+        "user_id": user_id
+    }
+
+
 def add_analiz(user_id: str, ad: str, net: float, exam_type: str = "Diğer", date: any = None) -> tuple[bool, str | None]:
-    """Yeni analiz ekler (users/{uid}/exam_results)."""
+    """Yeni analiz ekler (users/{uid}/exam_results); haftalık özet aynı transaction'da güncellenir."""
     try:
         db = get_firestore()
-        
-        # Tarih kontrolü
-        if date:
-            # Eğer string gelirse (frontend'den ISO format gelebilir)
-            if isinstance(date, str):
-                try:
-                    from datetime import datetime
-                    # Sadece YYYY-MM-DD gelirse
-                    if len(date) == 10: 
-                        date_obj = datetime.strptime(date, "%Y-%m-%d")
-                    else:
-                        date_obj = datetime.fromisoformat(date.replace('Z', '+00:00'))
-                    firestore_date = date_obj
-                except:
-                    firestore_date = firestore.SERVER_TIMESTAMP
-            else:
-                firestore_date = date
-        else:
-            firestore_date = firestore.SERVER_TIMESTAMP
-
-        db.collection("users").document(user_id).collection("exam_results").add({
-            "lesson_name": ad,
-            "net": net,
-            "type": exam_type,
-            "date": firestore_date,
-            "user_id": user_id
-        })
+        data = _exam_result_data(user_id, ad, net, exam_type, date)
+        result_ref = db.collection("users").document(user_id).collection(COLLECTION_EXAM_RESULTS).document()
+
+        @firestore.transactional
+        def add(transaction):
+            _write_rollup(transaction, db, user_id, exam_type, data["date"], added_net=net)
+            transaction.set(result_ref, data)
+
+        add(db.transaction())
         return True, None
     except Exception as e:
         logger.exception("Analiz ekleme hatasi")
         return False, str(e)
 
 
+def _import_row_payload(row: dict, email_to_id: dict) -> dict:
+    """Tablo satırını AddAnalizRequest alanlarına eşler."""
+    payload = {}
+    for key, value in row.items():
+        field = IMPORT_COLUMN_ALIASES.get(key, key)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        payload[field] = value.strip() if isinstance(value, str) else value
+
+    if "user_id" not in payload and payload.get("email"):
+        payload["user_id"] = email_to_id.get(str(payload["email"]).lower(), "")
+    payload["user_id"] = str(payload.get("user_id", ""))
+    if "ad" in payload:
+        payload["ad"] = str(payload["ad"])
+    # Türkçe tablolarda ondalık ayraç virgül olabilir (örn. "45,5")
+    if isinstance(payload.get("net"), str):
+        payload["net"] = payload["net"].replace(",", ".")
+    if hasattr(payload.get("date"), "isoformat"):
+        payload["date"] = payload["date"].isoformat()
+    elif "date" in payload:
+        payload["date"] = str(payload["date"])
+    return payload
+
+
+def import_analizler(roster: list[dict], rows: list[tuple[int, dict]]) -> tuple[list[dict] | None, str | None]:
+    """Sınıf/kurum için deneme sonuçlarını toplu ekler.
+
+    Satırlar AddAnalizRequest kurallarıyla doğrulanır, öğrenciler tek seferde
+    okunmuş `roster` üzerinden kontrol edilir ve yazmalar batch'ler halinde yapılır.
+    Batch'ler yeniden denenebildiği için haftalık özetler Increment ile değil,
+    etkilenen her kova sonuçlardan yeniden hesaplanarak güncellenir.
+    Returns: (satır bazlı rapor, error_message)
+    """
+    try:
+        db = get_firestore()
+        roster_ids = {s["id"] for s in roster}
+        email_to_id = {str(s.get("email", "")).lower(): s["id"] for s in roster if s.get("email")}
+
+        report: list[dict] = []
+        ops: list[WriteOp] = []
+        op_rows: list[tuple[dict, AddAnalizRequest, any]] = []
+        for row_number, row in rows:
+            entry = {"row": row_number, "status": "error"}
+            report.append(entry)
+            payload = _import_row_payload(row, email_to_id)
+            entry["user_id"] = payload.get("user_id") or None
+            try:
+                req = AddAnalizRequest(**payload)
+            except PydanticValidationError as e:
+                entry["message"] = "; ".join(
+                    f"{err['loc'][-1] if err['loc'] else 'satir'}: {err['msg']}" for err in e.errors()
+                )
+                continue
+            if req.user_id not in roster_ids:
+                entry["message"] = "Öğrenci bu kuruma kayıtlı değil."
+                continue
+
+            ref = db.collection("users").document(req.user_id).collection("exam_results").document()
+            data = _exam_result_data(req.user_id, req.ad, req.net, req.type, req.date)
+            ops.append(WriteOp("set", ref, data))
+            op_rows.append((entry, req, data["date"]))
+
+        errors = commit_in_batches(db, ops)
+        buckets: dict[str, tuple[str, str, any]] = {}
+        for (entry, req, date), err in zip(op_rows, errors):
+            if err:
+                entry["message"] = err
+                continue
+            entry["status"] = "ok"
+            buckets.setdefault(_rollup_ref(db, req.user_id, req.type, date).path, (req.user_id, req.type, date))
+
+        def rebuild(bucket):
+            try:
+                _rebuild_rollup(db, *bucket)
+            except Exception as e:
+                logger.warning("Haftalik ozet guncellenemedi (%s): %s", bucket[0], e)
+
+        if buckets:
+            with ThreadPoolExecutor(max_workers=min(DEFAULT_WORKERS, len(buckets))) as pool:
+                list(pool.map(rebuild, buckets.values()))
+        return report, None
+    except Exception as e:
+        logger.exception("Toplu analiz ekleme hatasi")
+        return None, str(e)
+
+
 def delete_analiz(user_id: str, analiz_id: str) -> tuple[bool, str | None]:
     """Analizi siler (users/{uid}/exam_results/{doc_id})."""
     try:
         db = get_firestore()
         # User ID artik zorunlu cunku sub-collection
-        db.collection("users").document(user_id).collection("exam_results").document(analiz_id).delete()
+        results = db.collection("users").document(user_id).collection("exam_results")
+        result_ref = results.document(analiz_id)
+
+        @firestore.transactional
+        def delete(transaction):
+            snap = result_ref.get(transaction=transaction)
+            if not snap.exists:
+                return
+            data = snap.to_dict()
+            _write_rollup(transaction, db, user_id, data.get("type") or "Diğer", data.get("date"),
+                          exclude_id=analiz_id)
+            transaction.delete(result_ref)
+
+        delete(db.transaction())
         return True, None
     except Exception as e:
         logger.exception("Analiz silme hatasi")
         return False, str(e)
 
 
+def get_exam_trends(
+    user_id: str, weeks: int = TREND_WEEKS, window: int = MOVING_AVERAGE_WINDOW
+) -> tuple[dict | None, str | None]:
+    """Deneme türü başına haftalık zaman serisi (ortalama, hareketli ortalama, en iyi, değişim).
+
+    Yalnızca `exam_rollups` kovaları okunur (son `weeks` hafta, tek sorgu).
+    """
+    try:
+        db = get_firestore()
+        since = _week_start(datetime.now(timezone.utc)) - timedelta(weeks=weeks - 1)
+        snap = (
+            db.collection("users").document(user_id).collection(SUBCOLLECTION_EXAM_ROLLUPS)
+            .where("week_start", ">=", since)
+            .order_by("week_start")
+            .get()
+        )
+        by_type: dict[str, list[dict]] = defaultdict(list)
+        for doc in snap:
+            d = doc.to_dict()
+            if not d.get("count"):
+                continue
+            by_type[d.get("type") or "Diğer"].append(d)
+
+        trends = {}
+        for exam_type, buckets in by_type.items():
+            series = []
+            for i, b in enumerate(buckets):
+                mean = b["net_sum"] / b["count"]
+                recent = [s["mean"] for s in series[-(window - 1):]] + [mean] if window > 1 else [mean]
+                series.append({
+                    "week": b["week"],
+                    "week_start": b["week_start"].date().isoformat() if hasattr(b["week_start"], "date") else b["week_start"],
+                    "count": b["count"],
+                    "mean": round(mean, 2),
+                    "moving_average": round(sum(recent) / len(recent), 2),
+                    "best": b.get("best", 0),
+                    "delta": round(mean - series[-1]["mean"], 2) if series else None,
+                })
+            # Dönem karşılaştırması: son `window` haftanın ortalaması, önceki `window` haftaya göre
+            current = series[-window:]
+            previous = series[-2 * window:-window]
+            current_mean = sum(s["mean"] for s in current) / len(current)
+            previous_mean = sum(s["mean"] for s in previous) / len(previous) if previous else None
+            trends[exam_type] = {
+                "series": series,
+                "best": max(s["best"] for s in series),
+                "period_mean": round(current_mean, 2),
+                "period_delta": round(current_mean - previous_mean, 2) if previous_mean is not None else None,
+            }
+        return {"weeks": weeks, "window": window, "trends": trends}, None
+    except Exception as e:
+        logger.exception("Deneme trend hatasi")
+        return None, str(e)
+
+
 def get_ai_yorum(user_id: str) -> str:
     """AI ile deneme yorumu üretir (DEVRE DISI)."""
     return "Yapay zeka yorum özelliği şu anda devre dışıdır."
@@ -99,6 +371,8 @@ class AnalizService:
     get_all = staticmethod(get_analizler)
     add = staticmethod(add_analiz)
     delete = staticmethod(delete_analiz)
+    import_rows = staticmethod(import_analizler)
+    get_trends = staticmethod(get_exam_trends)
     get_ai_yorum = staticmethod(get_ai_yorum)
 
 
@@ -0,0 +1,198 @@
+"""Herkese açık deste kataloğu ve popülerlik sıralaması (Firestore).
+
+Kullanım sayaçları deste başına NUM_SHARDS parçalı sayaçta tutulur
+(`flashcard_decks/{id}/deck_counters/{shard}`); yoğun bir destede bile tek
+dokümana saniyede bir yazma sınırına takılmaz. `rerank_catalog` zamanlayıcıda
+periyodik çalışır: son RECENT_DAYS + 1 günde sayacı değişen desteleri bulur,
+`popularity` alanını yeniden hesaplar ve `deck_catalog/{top_all | top_<konu>}`
+dokümanlarına hazır ilk sayfayı yazar.
+
+Gerekli indeksler: flashcard_decks (is_public, popularity desc) ve
+(is_public, subject, popularity desc); deck_counters collection group için
+updated_at tek alan indeksi.
+"""
+import logging
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from firebase_db import get_firestore
+from utils.batch import WriteOp, commit_in_batches
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_DECKS = "flashcard_decks"
+COLLECTION_CATALOG = "deck_catalog"
+SUBCOLLECTION_COUNTERS = "deck_counters"
+
+CATALOG_RERANK_INTERVAL = int(os.getenv("CATALOG_RERANK_INTERVAL", "900"))  # saniye
+NUM_SHARDS = 10
+RECENT_DAYS = 7
+TOP_LIST_SIZE = 50
+
+# popularity = duels * DUEL_WEIGHT + uses + son RECENT_DAYS gündeki etkinlik * RECENT_WEIGHT
+DUEL_WEIGHT = 3
+RECENT_WEIGHT = 2
+
+COUNTER_KINDS = ("duels", "uses")
+SUMMARY_FIELDS = ("title", "subject", "creator_id", "card_count", "popularity", "duel_count", "use_count")
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _top_list_id(subject: str | None) -> str:
+    return f"top_{subject}" if subject else "top_all"
+
+
+def _deck_summary(doc) -> dict:
+    data = doc.to_dict() or {}
+    summary = {key: data.get(key) for key in SUMMARY_FIELDS}
+    summary["id"] = doc.id
+    return summary
+
+
+def popularity_score(duels: int, uses: int, recent: int) -> int:
+    return duels * DUEL_WEIGHT + uses + recent * RECENT_WEIGHT
+
+
+def record_usage(deck_id: str, kind: str) -> None:
+    """Destenin kullanım sayacını rastgele bir parçada artırır.
+    Sayaç hatası çağıran işlemi bozmamalı; yalnızca loglanır.
+    """
+    if kind not in COUNTER_KINDS:
+        raise ValueError(f"Bilinmeyen sayac turu: {kind}")
+    try:
+        db = get_firestore()
+        shard_ref = (
+            db.collection(COLLECTION_DECKS).document(deck_id)
+            .collection(SUBCOLLECTION_COUNTERS).document(str(random.randrange(NUM_SHARDS)))
+        )
+        shard_ref.set({
+            "deck_id": deck_id,
+            kind: firestore.Increment(1),
+            "daily": {_today(): firestore.Increment(1)},
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+    except Exception:
+        logger.exception("Deste sayaci artirma hatasi: %s", deck_id)
+
+
+def _aggregate_shards(shards, cutoff: str) -> tuple[dict, list[WriteOp]]:
+    """Parçaları toplar; pencere dışına düşen günlük anahtarlar için silme işlemleri döndürür."""
+    totals = {"duels": 0, "uses": 0, "recent": 0}
+    prune = []
+    for shard in shards:
+        data = shard.to_dict() or {}
+        for kind in COUNTER_KINDS:
+            totals[kind] += data.get(kind, 0)
+        stale = {}
+        for day, count in (data.get("daily") or {}).items():
+            if day >= cutoff:
+                totals["recent"] += count
+            else:
+                stale[FieldPath("daily", day).to_api_repr()] = firestore.DELETE_FIELD
+        if stale:
+            prune.append(WriteOp("update", shard.reference, stale))
+    return totals, prune
+
+
+def _write_top_list(db, subject: str | None) -> None:
+    query = db.collection(COLLECTION_DECKS).where("is_public", "==", True)
+    if subject:
+        query = query.where("subject", "==", subject)
+    top = query.order_by("popularity", direction=firestore.Query.DESCENDING).limit(TOP_LIST_SIZE).get()
+    db.collection(COLLECTION_CATALOG).document(_top_list_id(subject)).set({
+        "subject": subject,
+        "decks": [_deck_summary(doc) for doc in top],
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    })
+
+
+def rerank_catalog() -> dict:
+    """Son dönemde etkinliği olan destelerin popülerliğini günceller ve ilk sayfaları yeniden yazar."""
+    db = get_firestore()
+    now = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=RECENT_DAYS)).strftime("%Y-%m-%d")
+    # Penceredeki son etkinliği bir gün önce dolmuş desteler de bir kez daha hesaplanır
+    since = now - timedelta(days=RECENT_DAYS + 1)
+
+    active = (
+        db.collection_group(SUBCOLLECTION_COUNTERS)
+        .where("updated_at", ">=", since)
+        .select(["__name__"])
+        .get()
+    )
+    deck_refs = {snap.reference.parent.parent.path: snap.reference.parent.parent for snap in active}
+
+    ops: list[WriteOp] = []
+    subjects: set[str] = set()
+    for deck in db.get_all(list(deck_refs.values())):
+        if not deck.exists:
+            continue
+        shards = deck.reference.collection(SUBCOLLECTION_COUNTERS).get()
+        totals, prune = _aggregate_shards(shards, cutoff)
+        ops.extend(prune)
+        ops.append(WriteOp("update", deck.reference, {
+            "duel_count": totals["duels"],
+            "use_count": totals["uses"],
+            "popularity": popularity_score(totals["duels"], totals["uses"], totals["recent"]),
+        }))
+        if deck.get("is_public") and deck.get("subject"):
+            subjects.add(deck.get("subject"))
+
+    failed = sum(1 for err in commit_in_batches(db, ops) if err)
+    if failed:
+        logger.warning("Katalog yeniden siralama: %d yazma basarisiz", failed)
+
+    for subject in [None, *sorted(subjects)]:
+        _write_top_list(db, subject)
+    return {"decks": len(deck_refs), "subjects": len(subjects), "failed": failed}
+
+
+def get_catalog(subject: str | None = None, limit: int = 20, cursor: str | None = None) -> tuple[dict | None, str | None]:
+    """Herkese açık desteleri popülerliğe göre sayfalı listeler.
+
+    İlk sayfa hazır `deck_catalog` dokümanından (tek okuma), sonraki sayfalar
+    `cursor` (son destenin ID'si) ile indeksli sorgudan gelir.
+    """
+    try:
+        db = get_firestore()
+        if cursor is None and limit <= TOP_LIST_SIZE:
+            top = db.collection(COLLECTION_CATALOG).document(_top_list_id(subject)).get()
+            if top.exists:
+                decks = (top.get("decks") or [])[:limit]
+                return {
+                    "decks": decks,
+                    "next_cursor": decks[-1]["id"] if len(decks) == limit else None,
+                }, None
+
+        decks_ref = db.collection(COLLECTION_DECKS)
+        query = decks_ref.where("is_public", "==", True)
+        if subject:
+            query = query.where("subject", "==", subject)
+        query = query.order_by("popularity", direction=firestore.Query.DESCENDING).limit(limit)
+        if cursor:
+            cursor_snap = decks_ref.document(cursor).get()
+            if not cursor_snap.exists:
+                return None, "Geçersiz sayfa imleci."
+            query = query.start_after(cursor_snap)
+        decks = [_deck_summary(doc) for doc in query.get()]
+        return {
+            "decks": decks,
+            "next_cursor": decks[-1]["id"] if len(decks) == limit else None,
+        }, None
+    except Exception as e:
+        logger.exception("Katalog listeleme hatasi")
+        return None, str(e)
+
+
+class CatalogService:
+    record_usage = staticmethod(record_usage)
+    rerank = staticmethod(rerank_catalog)
+    get_catalog = staticmethod(get_catalog)
+
+
+catalog_service = CatalogService()
@@ -1,14 +1,33 @@
-"""Flashcard sistemi servisi (Firestore)."""
+"""Flashcard sistemi servisi (Firestore).
+
+Deste kartları `flashcard_decks/{id}/card_chunks/{00000..}` altında
+CARD_CHUNK_SIZE'lık parçalar halinde saklanır; deste dokümanı yalnızca
+manifesti (card_count, chunk_size, chunk_ids, content_hash) tutar. Eski
+destelerdeki satır içi `cards` dizisi okunurken desteklenmeye devam eder.
+"""
+import hashlib
+import json
 import logging
 from datetime import datetime
 from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
 from firebase_db import get_firestore
+from services.catalog_service import catalog_service
+from services.rating_service import update_ratings_in_transaction
+from utils.batch import BATCH_LIMIT
 
 logger = logging.getLogger(__name__)
 
 COLLECTION_DECKS = "flashcard_decks"
 COLLECTION_DUELS = "flashcard_duels"
 COLLECTION_USERS = "users"
+SUBCOLLECTION_CARD_CHUNKS = "card_chunks"
+
+CARD_CHUNK_SIZE = 100
+# Deste + tüm parçalar tek batch'te (atomik) yazılır
+MAX_DECK_CARDS = CARD_CHUNK_SIZE * (BATCH_LIMIT - 1)
+
+DUEL_TXN_MAX_ATTEMPTS = 5
 
 def _doc_to_dict(doc) -> dict:
     data = doc.to_dict()
@@ -18,47 +37,150 @@ def _doc_to_dict(doc) -> dict:
             data[key] = val.isoformat()
     return data
 
+def _chunk_id(index: int) -> str:
+    return f"{index:05d}"
+
+
+def _cards_hash(cards: list) -> str:
+    payload = json.dumps(cards, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _deck_manifest(data: dict) -> dict:
+    """Deste dokümanını manifest olarak döndürür (eski satır içi kartlar çıkarılır)."""
+    inline = data.pop("cards", None)
+    if inline is not None:
+        data.setdefault("card_count", len(inline))
+        data.setdefault("chunk_ids", [])
+        data["legacy_inline"] = True
+    return data
+
+
+def _deck_cards(db, deck_ref, data: dict) -> list:
+    """Destenin tüm kartlarını döndürür (eski satır içi format dahil)."""
+    if "cards" in data:
+        return data["cards"]
+    chunks_ref = deck_ref.collection(SUBCOLLECTION_CARD_CHUNKS)
+    snaps = db.get_all([chunks_ref.document(cid) for cid in data.get("chunk_ids", [])])
+    ordered = sorted((s for s in snaps if s.exists), key=lambda s: s.get("index"))
+    return [card for snap in ordered for card in snap.get("cards") or []]
+
+
+def _decide_winner(results: dict) -> str:
+    """Kazananı belirler: yüksek skor, eşitse kısa süre, o da eşitse berabere."""
+    u1, u2 = results.keys()
+    res1, res2 = results[u1], results[u2]
+    if res1["score"] != res2["score"]:
+        return u1 if res1["score"] > res2["score"] else u2
+    if res1["time_spent"] != res2["time_spent"]:
+        return u1 if res1["time_spent"] < res2["time_spent"] else u2
+    return "draw"
+
+
 class FlashcardService:
     @staticmethod
     def create_shared_deck(creator_id: str, title: str, subject: str, cards: list):
-        """Yeni bir paylaşımlı deste oluşturur."""
+        """Yeni bir paylaşımlı deste oluşturur (manifest + kart parçaları tek batch'te)."""
         try:
+            if len(cards) > MAX_DECK_CARDS:
+                return None, f"Bir deste en fazla {MAX_DECK_CARDS} kart içerebilir."
             db = get_firestore()
-            deck_ref = db.collection(COLLECTION_DECKS).add({
+            deck_ref = db.collection(COLLECTION_DECKS).document()
+            chunks = [cards[i:i + CARD_CHUNK_SIZE] for i in range(0, len(cards), CARD_CHUNK_SIZE)]
+            chunk_ids = [_chunk_id(i) for i in range(len(chunks))]
+
+            batch = db.batch()
+            batch.set(deck_ref, {
                 "creator_id": creator_id,
                 "title": title,
                 "subject": subject,
-                "cards": cards,
+                "card_count": len(cards),
+                "chunk_size": CARD_CHUNK_SIZE,
+                "chunk_ids": chunk_ids,
+                "content_hash": _cards_hash(cards),
                 "created_at": firestore.SERVER_TIMESTAMP,
-                "is_public": True
+                "is_public": True,
+                "popularity": 0,
+                "duel_count": 0,
+                "use_count": 0
             })
-            return deck_ref[1].id, None
+            chunks_ref = deck_ref.collection(SUBCOLLECTION_CARD_CHUNKS)
+            for index, (chunk_id, chunk) in enumerate(zip(chunk_ids, chunks)):
+                batch.set(chunks_ref.document(chunk_id), {"index": index, "cards": chunk})
+            batch.commit()
+            return deck_ref.id, None
         except Exception as e:
             logger.exception("Create shared deck error")
             return None, str(e)
 
     @staticmethod
     def get_deck(deck_id: str):
-        """Deste içeriğini getirir."""
+        """Deste manifestini getirir (kartlar hariç)."""
         try:
             db = get_firestore()
             doc = db.collection(COLLECTION_DECKS).document(deck_id).get()
             if not doc.exists:
                 return None, "Deste bulunamadı."
-            return _doc_to_dict(doc), None
+            return _deck_manifest(_doc_to_dict(doc)), None
         except Exception as e:
             logger.exception("Get deck error")
             return None, str(e)
 
+    @staticmethod
+    def get_deck_cards(deck_id: str, offset: int = 0, limit: int = CARD_CHUNK_SIZE):
+        """Destenin [offset, offset + limit) aralığındaki kartlarını getirir.
+
+        Yalnızca aralığı kapsayan parçalar tek `get_all` çağrısıyla okunur.
+        """
+        try:
+            db = get_firestore()
+            deck_ref = db.collection(COLLECTION_DECKS).document(deck_id)
+            doc = deck_ref.get()
+            if not doc.exists:
+                return None, "Deste bulunamadı."
+            data = doc.to_dict()
+            end = offset + limit
+
+            if "cards" in data:
+                # Eski format: kartlar deste dokümanında
+                total = len(data["cards"])
+                cards = data["cards"][offset:end]
+            else:
+                total = data.get("card_count", 0)
+                chunk_size = data.get("chunk_size") or CARD_CHUNK_SIZE
+                chunk_ids = data.get("chunk_ids", [])
+                first, last = offset // chunk_size, min(end - 1, total - 1) // chunk_size
+                wanted = chunk_ids[first:last + 1] if offset < total else []
+                chunks_ref = deck_ref.collection(SUBCOLLECTION_CARD_CHUNKS)
+                snaps = db.get_all([chunks_ref.document(cid) for cid in wanted]) if wanted else []
+                by_index = {s.get("index"): s.get("cards") or [] for s in snaps if s.exists}
+                window = [card for i in range(first, last + 1) for card in by_index.get(i, [])]
+                start = offset - first * chunk_size
+                cards = window[start:start + limit]
+
+            return {
+                "cards": cards,
+                "offset": offset,
+                "total": total,
+                "next_offset": end if end < total else None,
+            }, None
+        except Exception as e:
+            logger.exception("Get deck cards error")
+            return None, str(e)
+
     @staticmethod
     def create_duel(challenger_id: str, opponent_id: str, deck_id: str):
         """Arkadaşa düello daveti gönderir."""
         try:
             db = get_firestore()
+            deck = db.collection(COLLECTION_DECKS).document(deck_id).get()
+            if not deck.exists:
+                return None, "Deste bulunamadı."
             duel_ref = db.collection(COLLECTION_DUELS).add({
                 "challenger_id": challenger_id,
                 "opponent_id": opponent_id,
                 "deck_id": deck_id,
+                "subject": deck.get("subject"),
                 "status": "pending", # pending, active, completed
                 "created_at": firestore.SERVER_TIMESTAMP,
                 "results": {
@@ -66,52 +188,80 @@ class FlashcardService:
                     opponent_id: None
                 }
             })
+            catalog_service.record_usage(deck_id, "duels")
             return duel_ref[1].id, None
         except Exception as e:
             logger.exception("Create duel error")
             return None, str(e)
 
+    @staticmethod
+    def get_duel(duel_id: str):
+        """Düello dokümanını getirir."""
+        try:
+            db = get_firestore()
+            doc = db.collection(COLLECTION_DUELS).document(duel_id).get()
+            if not doc.exists:
+                return None, "Düello bulunamadı."
+            return _doc_to_dict(doc), None
+        except Exception as e:
+            logger.exception("Get duel error")
+            return None, str(e)
+
     @staticmethod
     def submit_duel_result(duel_id: str, user_id: str, result_data: dict):
-        """Düello sonucunu kaydeder."""
+        """Düello sonucunu kaydeder.
+
+        Sadece `results.<uid>` alanı transaction içinde güncellenir; iki oyuncu
+        aynı anda bitirse de birbirinin sonucunu ezemez, bir oyuncu da kendi
+        gönderdiği sonucu tekrar gönderip değiştiremez. Kazanan ve iki
+        oyuncunun ELO puanları aynı transaction'da belirlenir.
+        """
         try:
             db = get_firestore()
             duel_ref = db.collection(COLLECTION_DUELS).document(duel_id)
-            duel_doc = duel_ref.get()
-            
-            if not duel_doc.exists:
-                return False, "Düello bulunamadı."
-            
-            duel_data = duel_doc.to_dict()
-            results = duel_data.get("results", {})
-            results[user_id] = {
-                **result_data,
-                "submitted_at": datetime.utcnow().isoformat()
-            }
-            
-            update_data = {"results": results}
-            
-            # Her iki taraf da tamamladıysa durumu güncelle
-            if all(results.values()):
-                update_data["status"] = "completed"
-                # Winner logic (higher score, then lower time)
-                u1, u2 = results.keys()
-                res1, res2 = results[u1], results[u2]
-                
-                if res1["score"] > res2["score"]:
-                    update_data["winner_id"] = u1
-                elif res2["score"] > res1["score"]:
-                    update_data["winner_id"] = u2
-                else:
-                    if res1["time_spent"] < res2["time_spent"]:
-                        update_data["winner_id"] = u1
-                    elif res2["time_spent"] < res1["time_spent"]:
-                        update_data["winner_id"] = u2
-                    else:
-                        update_data["winner_id"] = "draw"
-
-            duel_ref.update(update_data)
-            return True, None
+            attempts = 0
+
+            @firestore.transactional
+            def submit(transaction):
+                nonlocal attempts
+                attempts += 1
+                duel_doc = duel_ref.get(transaction=transaction)
+                if not duel_doc.exists:
+                    return False, "Düello bulunamadı."
+
+                duel_data = duel_doc.to_dict()
+                results = dict(duel_data.get("results") or {})
+                if user_id not in results:
+                    return False, "Bu düellonun katılımcısı değilsiniz."
+                if duel_data.get("status") == "completed":
+                    return False, "Düello zaten tamamlandı."
+                if results[user_id]:
+                    return False, "Bu düello için sonucunuz zaten kaydedildi."
+
+                entry = {
+                    **result_data,
+                    "submitted_at": datetime.utcnow().isoformat()
+                }
+                results[user_id] = entry
+                update_data = {FieldPath("results", user_id).to_api_repr(): entry}
+
+                # Her iki taraf da tamamladıysa durumu ve ELO puanlarını güncelle
+                if all(results.values()):
+                    winner_id = _decide_winner(results)
+                    update_data["status"] = "completed"
+                    update_data["winner_id"] = winner_id
+                    update_data["rating_changes"] = update_ratings_in_transaction(
+                        transaction, db, duel_data["challenger_id"], duel_data["opponent_id"],
+                        winner_id, duel_data.get("subject"),
+                    )
+
+                transaction.update(duel_ref, update_data)
+                return True, None
+
+            outcome = submit(db.transaction(max_attempts=DUEL_TXN_MAX_ATTEMPTS))
+            if attempts > 1:
+                logger.info("Duello sonucu transaction'i %d denemede tamamlandi", attempts)
+            return outcome
         except Exception as e:
             logger.exception("Submit duel result error")
             return False, str(e)
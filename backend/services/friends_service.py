@@ -3,12 +3,21 @@ import logging
 from datetime import datetime
 from firebase_admin import firestore
 from firebase_db import get_firestore
+from utils.text_search import query_words, match_score
+from utils.ids import pair_key
+from utils.batch import update_documents
 
 logger = logging.getLogger(__name__)
 
+# Her iki koleksiyonda da doküman ID'si pair_key(uid1, uid2) = min(uid)_max(uid)
 COLLECTION_FRIENDS = "friends"  # friendship documents {users: [uid1, uid2], created_at: ...}
 COLLECTION_REQUESTS = "friend_requests" # {from: uid1, to: uid2, status: 'pending', created_at: ...}
 COLLECTION_USERS = "users"
+# Kullanıcı başına tek doküman: {friends: {friend_uid: {name, email, avatar, since}}}
+COLLECTION_USER_FRIENDS = "user_friends"
+
+SEARCH_CANDIDATE_LIMIT = 50  # array_contains ile okunan en fazla aday
+SEARCH_RESULT_LIMIT = 20
 
 def _doc_to_dict(doc) -> dict:
     data = doc.to_dict()
@@ -18,73 +27,111 @@ def _doc_to_dict(doc) -> dict:
             data[key] = val.isoformat()
     return data
 
+def friend_summary(user_data: dict | None) -> dict:
+    """Arkadaş listesinde önbelleğe alınan görünen alanlar."""
+    user_data = user_data or {}
+    return {
+        "name": user_data.get("name") or "İsimsiz",
+        "email": user_data.get("email") or "",
+        "avatar": user_data.get("avatar"),
+        "since": firestore.SERVER_TIMESTAMP,
+    }
+
+
 class FriendsService:
     @staticmethod
     def search_users(query: str, current_user_id: str):
-        """Kullanıcıları isim veya e-posta ile arar."""
+        """Kullanıcıları isim veya e-posta ile arar (Türkçe harf duyarsız, önek eşleşmeli).
+
+        Sorguda '@' varsa token araması yerine `email` alanında önek (aralık)
+        sorgusu yapılır; tam eşleşen e-posta en üste gelir.
+        """
         try:
+            query = (query or "").strip()
             db = get_firestore()
-            # Firestore handles only prefix search easily. This is a simple implementation.
-            # In a real app, we might use Algolia or a more flexible search.
-            
-            # Search by name
-            users_ref = db.collection(COLLECTION_USERS)
-            
-            # Case sensitive startswith search
-            query_end = query + '\uf8ff'
-            
-            name_hits = users_ref.where("name", ">=", query).where("name", "<=", query_end).limit(20).get()
-            email_hits = users_ref.where("email", ">=", query).where("email", "<=", query_end).limit(20).get()
-            
-            results = {}
-            for doc in name_hits:
-                if doc.id != current_user_id:
-                    results[doc.id] = _doc_to_dict(doc)
-            
-            for doc in email_hits:
-                if doc.id != current_user_id:
-                    results[doc.id] = _doc_to_dict(doc)
-            
-            return list(results.values()), None
+            users = db.collection(COLLECTION_USERS)
+            ranked = []
+
+            if "@" in query:
+                seen = {current_user_id}
+                for prefix in dict.fromkeys([query, query.lower()]):
+                    docs = (
+                        users.where("email", ">=", prefix)
+                        .where("email", "<", prefix + "\uf8ff")
+                        .limit(SEARCH_RESULT_LIMIT)
+                        .get()
+                    )
+                    for doc in docs:
+                        if doc.id in seen:
+                            continue
+                        seen.add(doc.id)
+                        data = _doc_to_dict(doc)
+                        data.pop("search_tokens", None)
+                        exact = (data.get("email") or "").lower() == query.lower()
+                        ranked.append((1 if exact else 0, data.get("name") or "", data))
+                ranked.sort(key=lambda r: (-r[0], r[1]))
+                return [data for _, _, data in ranked[:SEARCH_RESULT_LIMIT]], None
+
+            terms = query_words(query)
+            if not terms:
+                return [], None
+
+            # En seçici (en uzun) kelime indeksten okunur, diğerleri puanlamada elenir
+            anchor = max(terms, key=len)
+            candidates = (
+                users.where("search_tokens", "array_contains", anchor)
+                .limit(SEARCH_CANDIDATE_LIMIT)
+                .get()
+            )
+
+            for doc in candidates:
+                if doc.id == current_user_id:
+                    continue
+                data = _doc_to_dict(doc)
+                score = match_score(terms, data.get("name"), data.get("email"))
+                if score is None:
+                    continue
+                data.pop("search_tokens", None)
+                ranked.append((score, data.get("name") or "", data))
+
+            ranked.sort(key=lambda r: (-r[0], r[1]))
+            return [data for _, _, data in ranked[:SEARCH_RESULT_LIMIT]], None
         except Exception as e:
             logger.exception("User search error")
             return None, str(e)
 
     @staticmethod
     def send_friend_request(sender_id: str, receiver_id: str):
-        """Arkadaşlık isteği gönderir."""
+        """Arkadaşlık isteği gönderir (tek transaction, çift anahtarlı dokümanlar)."""
+        if sender_id == receiver_id:
+            return False, "Kendinize istek gönderemezsiniz."
         try:
             db = get_firestore()
-            
-            # Check if already friends
-            friendship = db.collection(COLLECTION_FRIENDS).where("users", "array_contains", sender_id).get()
-            for f in friendship:
-                if receiver_id in f.to_dict()["users"]:
+            key = pair_key(sender_id, receiver_id)
+            friend_ref = db.collection(COLLECTION_FRIENDS).document(key)
+            req_ref = db.collection(COLLECTION_REQUESTS).document(key)
+
+            @firestore.transactional
+            def send(transaction):
+                if friend_ref.get(transaction=transaction).exists:
                     return False, "Zaten arkadaşsınız."
-            
-            # Check if request already pending
-            existing = db.collection(COLLECTION_REQUESTS)\
-                        .where("from", "==", sender_id)\
-                        .where("to", "==", receiver_id)\
-                        .where("status", "==", "pending").get()
-            if existing:
-                return False, "İstek zaten gönderilmiş."
-            
-            # Reverse request check
-            rev = db.collection(COLLECTION_REQUESTS)\
-                    .where("from", "==", receiver_id)\
-                    .where("to", "==", sender_id)\
-                    .where("status", "==", "pending").get()
-            if rev:
-                return False, "Karşı taraftan gelen bir istek zaten var."
-
-            db.collection(COLLECTION_REQUESTS).add({
-                "from": sender_id,
-                "to": receiver_id,
-                "status": "pending",
-                "created_at": firestore.SERVER_TIMESTAMP
-            })
-            return True, None
+                req_snap = req_ref.get(transaction=transaction)
+                if req_snap.exists:
+                    req_data = req_snap.to_dict()
+                    if req_data.get("status") == "pending":
+                        if req_data.get("from") == sender_id:
+                            return False, "İstek zaten gönderilmiş."
+                        return False, "Karşı taraftan gelen bir istek zaten var."
+                # Reddedilmiş / eski istek varsa üzerine yazılır
+                transaction.set(req_ref, {
+                    "from": sender_id,
+                    "to": receiver_id,
+                    "status": "pending",
+                    "created_at": firestore.SERVER_TIMESTAMP
+                })
+                return True, None
+
+            return send(db.transaction())
         except Exception as e:
             logger.exception("Send friend request error")
             return False, str(e)
@@ -117,67 +164,109 @@ class FriendsService:
         try:
             db = get_firestore()
             req_ref = db.collection(COLLECTION_REQUESTS).document(request_id)
-            req_doc = req_ref.get()
-            
-            if not req_doc.exists:
-                return False, "İstek bulunamadı."
-            
-            req_data = req_doc.to_dict()
-            if req_data["status"] != "pending":
-                return False, "İstek zaten işlenmiş."
-            
-            if action == "accept":
-                # Create friendship
-                db.collection(COLLECTION_FRIENDS).add({
-                    "users": [req_data["from"], req_data["to"]],
-                    "created_at": firestore.SERVER_TIMESTAMP
-                })
-                req_ref.update({"status": "accepted"})
-            else:
-                req_ref.update({"status": "declined"})
-            
-            return True, None
+
+            @firestore.transactional
+            def respond(transaction):
+                req_doc = req_ref.get(transaction=transaction)
+                if not req_doc.exists:
+                    return False, "İstek bulunamadı."
+
+                req_data = req_doc.to_dict()
+                if req_data["status"] != "pending":
+                    return False, "İstek zaten işlenmiş."
+
+                if action == "accept":
+                    from_uid, to_uid = req_data["from"], req_data["to"]
+                    users = db.collection(COLLECTION_USERS)
+                    from_user = users.document(from_uid).get(transaction=transaction)
+                    to_user = users.document(to_uid).get(transaction=transaction)
+
+                    # Her iki kullanıcının arkadaş listesi dokümanına karşı tarafı ekle
+                    lists = db.collection(COLLECTION_USER_FRIENDS)
+                    transaction.set(lists.document(from_uid), {
+                        "friends": {to_uid: friend_summary(to_user.to_dict())}
+                    }, merge=True)
+                    transaction.set(lists.document(to_uid), {
+                        "friends": {from_uid: friend_summary(from_user.to_dict())}
+                    }, merge=True)
+
+                    # Create friendship
+                    friend_ref = db.collection(COLLECTION_FRIENDS).document(pair_key(from_uid, to_uid))
+                    transaction.set(friend_ref, {
+                        "users": [req_data["from"], req_data["to"]],
+                        "created_at": firestore.SERVER_TIMESTAMP
+                    })
+                    transaction.update(req_ref, {"status": "accepted"})
+                else:
+                    transaction.update(req_ref, {"status": "declined"})
+                return True, None
+
+            return respond(db.transaction())
         except Exception as e:
             logger.exception("Respond to request error")
             return False, str(e)
 
     @staticmethod
     def get_friends(user_id: str):
-        """Arkadaş listesini getirir."""
+        """Arkadaş listesini getirir (tek doküman okuması)."""
         try:
             db = get_firestore()
-            friendships = db.collection(COLLECTION_FRIENDS).where("users", "array_contains", user_id).get()
-            
+            snap = db.collection(COLLECTION_USER_FRIENDS).document(user_id).get()
+            entries = (snap.to_dict() or {}).get("friends", {}) if snap.exists else {}
+
             friends = []
-            for f in friendships:
-                data = f.to_dict()
-                other_uid = [u for u in data["users"] if u != user_id][0]
-                
-                user_doc = db.collection(COLLECTION_USERS).document(other_uid).get()
-                if user_doc.exists:
-                    friends.append(_doc_to_dict(user_doc))
-            
+            for friend_id, info in entries.items():
+                since = info.get("since")
+                friends.append({
+                    **info,
+                    "id": friend_id,
+                    "since": since.isoformat() if hasattr(since, "isoformat") else since,
+                })
+            friends.sort(key=lambda f: f.get("name", ""))
             return friends, None
         except Exception as e:
             logger.exception("Get friends error")
             return None, str(e)
 
+    @staticmethod
+    def refresh_friend_name(user_id: str, name: str):
+        """İsim değişikliğini arkadaşların listelerindeki önbelleğe yansıtır."""
+        try:
+            db = get_firestore()
+            snap = db.collection(COLLECTION_USER_FRIENDS).document(user_id).get()
+            friend_ids = list(((snap.to_dict() or {}).get("friends") or {}).keys()) if snap.exists else []
+            refs = [db.collection(COLLECTION_USER_FRIENDS).document(fid) for fid in friend_ids]
+            errors = update_documents(db, refs, {f"friends.{user_id}.name": name})
+            failed = sum(1 for err in errors if err)
+            if failed:
+                return False, f"{failed} arkadaş listesi güncellenemedi."
+            return True, None
+        except Exception as e:
+            logger.exception("Refresh friend name error")
+            return False, str(e)
+
     @staticmethod
     def remove_friend(user_id: str, friend_uid: str):
         """Arkadaşı siler."""
         try:
             db = get_firestore()
-            friendships = db.collection(COLLECTION_FRIENDS).where("users", "array_contains", user_id).get()
-            
-            found = False
-            for f in friendships:
-                if friend_uid in f.to_dict()["users"]:
-                    f.reference.delete()
-                    found = True
-            
-            if found:
+            friend_ref = db.collection(COLLECTION_FRIENDS).document(pair_key(user_id, friend_uid))
+
+            @firestore.transactional
+            def remove(transaction):
+                if not friend_ref.get(transaction=transaction).exists:
+                    return False, "Arkadaşlık bulunamadı."
+                transaction.delete(friend_ref)
+                lists = db.collection(COLLECTION_USER_FRIENDS)
+                transaction.set(lists.document(user_id), {
+                    "friends": {friend_uid: firestore.DELETE_FIELD}
+                }, merge=True)
+                transaction.set(lists.document(friend_uid), {
+                    "friends": {user_id: firestore.DELETE_FIELD}
+                }, merge=True)
                 return True, None
-            return False, "Arkadaşlık bulunamadı."
+
+            return remove(db.transaction())
         except Exception as e:
             logger.exception("Remove friend error")
             return False, str(e)
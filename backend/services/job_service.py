@@ -0,0 +1,256 @@
+"""Arka plan rapor işleri (SQLite tabanlı iş kuyruğu).
+
+Ağır raporlar istek içinde değil, worker havuzunda hesaplanır. İş durumu ve
+sonuçları yerel bir SQLite dosyasında TTL ile saklanır; sunucu yeniden
+başladığında yarıda kalan işler tekrar kuyruğa alınır. Her iş çalıştırılmadan
+önce koşullu UPDATE ile tek bir worker'a atanır.
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from services.admin_service import compute_performance_report
+
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = os.getenv(
+    "JOB_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "jobs.sqlite3"),
+)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))  # saniye
+# Bu süreden uzun "running" kalan iş, çöken bir worker'dan kalmış sayılır ve yeniden alınabilir
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "900"))  # saniye
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# İş türü -> hesaplama fonksiyonu (parametreler keyword olarak geçilir).
+# Handler hata durumunda exception fırlatmalıdır; yutulan hata iş "done" olarak önbelleğe girer.
+JOB_HANDLERS: dict[str, Callable[..., Any]] = {
+    "performance_report": compute_performance_report,
+}
+
+
+class JobStore:
+    """İş kayıtlarını SQLite'ta tutar (thread-safe)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    cache_key TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL,
+                    expires_at REAL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_cache_key ON jobs (cache_key)")
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            # Eski dosyalar için sahiplik sütunları sonradan eklenir
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if "started_at" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN started_at REAL")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row | None) -> dict | None:
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create(self, kind: str, cache_key: str, params: dict) -> dict:
+        job_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, cache_key, params, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, cache_key, json.dumps(params), STATUS_QUEUED, time.time()),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (job_id, time.time()),
+            ).fetchone()
+        return self._to_dict(row)
+
+    def find_active(self, cache_key: str) -> dict | None:
+        """Aynı parametrelerle bekleyen, çalışan veya süresi dolmamış son işi bulur."""
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT * FROM jobs
+                   WHERE cache_key = ? AND status != ? AND (expires_at IS NULL OR expires_at > ?)
+                   ORDER BY created_at DESC LIMIT 1""",
+                (cache_key, STATUS_FAILED, time.time()),
+            ).fetchone()
+        return self._to_dict(row)
+
+    def claim(self, job_id: str, owner: str, stale_after: float) -> bool:
+        """İşi atomik olarak bu worker'a alır.
+
+        Sadece kuyrukta bekleyen ya da `stale_after` saniyedir sahibinden ses
+        çıkmayan çalışan iş alınabilir; aynı dosyayı paylaşan worker'lardan
+        yalnızca biri başarılı olur.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                """UPDATE jobs SET status = ?, owner = ?, started_at = ?
+                   WHERE id = ? AND (status = ? OR (status = ? AND started_at < ?))""",
+                (STATUS_RUNNING, owner, now, job_id, STATUS_QUEUED, STATUS_RUNNING, now - stale_after),
+            )
+        return cur.rowcount == 1
+
+    def finish(self, job_id: str, owner: str, status: str, result: Any = None,
+               error: str | None = None, ttl: int | None = None) -> bool:
+        """İşi sonuçlandırır; iş bu sırada başka worker'a geçtiyse yazmaz."""
+        now = time.time()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                """UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, expires_at = ?
+                   WHERE id = ? AND owner = ? AND status = ?""",
+                (
+                    status,
+                    json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                    error,
+                    now,
+                    now + ttl if ttl else None,
+                    job_id,
+                    owner,
+                    STATUS_RUNNING,
+                ),
+            )
+        return cur.rowcount == 1
+
+    def pending_ids(self, stale_after: float) -> list[str]:
+        """Yeniden başlatmada alınabilecek işler: kuyruktakiler ve sahipsiz kalan çalışanlar."""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT id FROM jobs
+                   WHERE status = ? OR (status = ? AND started_at < ?)
+                   ORDER BY created_at""",
+                (STATUS_QUEUED, STATUS_RUNNING, time.time() - stale_after),
+            ).fetchall()
+        return [r["id"] for r in rows]
+
+    def purge_expired(self) -> int:
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """İşleri worker havuzunda çalıştırır, durumlarını JobStore'da tutar."""
+
+    def __init__(self, db_path: str = JOB_DB_PATH, workers: int = JOB_WORKERS, ttl: int = JOB_RESULT_TTL,
+                 stale_after: int = JOB_STALE_AFTER):
+        self.db_path = db_path
+        self.workers = workers
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.store: JobStore | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    def start(self) -> None:
+        self.store = JobStore(self.db_path)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        purged = self.store.purge_expired()
+        # Her worker aynı listeyi görebilir; işi claim() ile yalnızca biri alır
+        resumed = self.store.pending_ids(self.stale_after)
+        for job_id in resumed:
+            self._executor.submit(self._run, job_id)
+        logger.info("Is kuyrugu basladi (%d worker, %d is devam ediyor, %d suresi dolan silindi).",
+                    self.workers, len(resumed), purged)
+
+    def shutdown(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.store:
+            self.store.close()
+            self.store = None
+
+    def submit(self, kind: str, params: dict) -> tuple[dict | None, str | None]:
+        """İşi kuyruğa alır; aynı parametreli güncel bir iş varsa onu döndürür."""
+        if kind not in JOB_HANDLERS:
+            return None, f"Bilinmeyen iş türü: {kind}"
+        if self.store is None or self._executor is None:
+            return None, "İş kuyruğu çalışmıyor."
+        cache_key = f"{kind}:{json.dumps(params, sort_keys=True)}"
+        existing = self.store.find_active(cache_key)
+        if existing:
+            return existing, None
+        job = self.store.create(kind, cache_key, params)
+        self._executor.submit(self._run, job["id"])
+        return job, None
+
+    def get(self, job_id: str) -> dict | None:
+        return self.store.get(job_id) if self.store else None
+
+    def _run(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None or not self.store.claim(job_id, self.owner, self.stale_after):
+            return
+        started = time.monotonic()
+        try:
+            result = JOB_HANDLERS[job["kind"]](**job["params"])
+            if not result:
+                raise RuntimeError("İş boş sonuç döndürdü.")
+            self.store.finish(job_id, self.owner, STATUS_DONE, result=result, ttl=self.ttl)
+            logger.info("Is tamamlandi: %s (%s, %.1f sn)", job_id, job["kind"], time.monotonic() - started)
+        except Exception as e:
+            logger.exception("Is hatasi: %s", job_id)
+            # Başarısız işler önbelleğe alınmaz (find_active FAILED'ı atlar), sadece durum için tutulur
+            self.store.finish(job_id, self.owner, STATUS_FAILED, error=str(e), ttl=self.ttl)
+
+
+def job_to_response(job: dict) -> dict:
+    """İş kaydını API yanıtına çevirir (sonuç sadece tamamlanınca eklenir)."""
+    out = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+        "expires_at": job["expires_at"],
+    }
+    if job["status"] == STATUS_DONE:
+        out["result"] = job["result"]
+    elif job["status"] == STATUS_FAILED:
+        out["error"] = job["error"]
+    return out
+
+
+job_queue = JobQueue()
@@ -0,0 +1,313 @@
+"""Rastgele rakip eşleştirme (düello matchmaking) kuyruğu.
+
+Bekleyen biletler konu kapsamı ve puan bandına göre kovalanır. Bir oyuncu
+gelince önce uygun bir bekleyen rakip aranır; yoksa kendisi kuyruğa girer
+ve `match:{ticket_id}` kanalından haber bekler. Beklerken puan bandı
+WIDEN_INTERVAL saniyede bir genişler, son aşamada puan farkı gözetilmez.
+
+Kuyruk bir backend arkasındadır: `MemoryBackend` tek süreç içindir;
+`SQLiteBackend` aynı makinedeki worker'ların kuyruğu paylaşmasını sağlar
+(eşleşme bildirimi `realtime.hub` üzerinden gider, worker'lar arası için
+PUBSUB_BACKEND=sqlite gerekir). `MATCHMAKING_BACKEND` ile seçilir. Backend
+çağrıları (SQLite kilidi bekleyebilir) event loop'u bloklamamak için thread
+havuzunda yapılır.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+
+from fastapi.concurrency import run_in_threadpool
+
+from services.flashcard_service import flashcard_service
+from services.rating_service import rating_service, subject_scope
+from services.realtime import hub
+
+logger = logging.getLogger(__name__)
+
+MATCHMAKING_BACKEND = os.getenv("MATCHMAKING_BACKEND", "memory")
+MATCHMAKING_DB_PATH = os.getenv(
+    "MATCHMAKING_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "matchmaking.sqlite3"),
+)
+MATCH_TIMEOUT = float(os.getenv("MATCH_TIMEOUT", "30"))  # saniye
+
+# Puan bandı aşamaları; None = puan farkı gözetilmez
+RATING_BANDS = (100, 200, 400, None)
+WIDEN_INTERVAL = 4.0  # saniye
+BUCKET_WIDTH = 100
+
+MATCHED = "matched"
+QUEUED = "queued"
+CLAIMED = "claimed"  # Bilet bu sırada başka bir oyuncu tarafından alındı
+
+
+@dataclass
+class Ticket:
+    user_id: str
+    deck_id: str
+    scope: str
+    rating: float
+    ticket_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    enqueued_at: float = field(default_factory=time.time)
+
+
+def match_channel(ticket_id: str) -> str:
+    return f"match:{ticket_id}"
+
+
+class MatchmakingBackend:
+    """Bekleyen biletleri tutan backend arayüzü. Tüm işlemler atomik olmalıdır."""
+
+    def match_or_enqueue(self, ticket: Ticket, band: float | None) -> tuple[str, Ticket | None]:
+        """Bilet kuyruktaysa çıkarıp `band` içinde rakip arar.
+        Rakip bulunursa ikisi de kuyruktan çıkar (MATCHED, rakip); bulunamazsa
+        bilet kuyruğa (yeniden) girer (QUEUED). Bilet kuyruktan başkası
+        tarafından alınmışsa (CLAIMED, None).
+        """
+        raise NotImplementedError
+
+    def remove(self, ticket_id: str) -> bool:
+        """Bileti kuyruktan çıkarır. Returns: bilet hâlâ kuyruktaydı mı."""
+        raise NotImplementedError
+
+    def remove_user(self, user_id: str) -> int:
+        """Kullanıcının tüm biletlerini çıkarır."""
+        raise NotImplementedError
+
+
+class MemoryBackend(MatchmakingBackend):
+    """Süreç içi kuyruk: kapsam -> puan kovası -> bekleme sırasına göre biletler."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: dict[str, dict[int, OrderedDict[str, Ticket]]] = defaultdict(dict)
+        self._tickets: dict[str, Ticket] = {}
+        self._claimed: set[str] = set()
+
+    def _bucket(self, ticket: Ticket) -> OrderedDict[str, Ticket]:
+        return self._buckets[ticket.scope].setdefault(int(ticket.rating // BUCKET_WIDTH), OrderedDict())
+
+    def _discard(self, ticket: Ticket) -> None:
+        self._tickets.pop(ticket.ticket_id, None)
+        self._bucket(ticket).pop(ticket.ticket_id, None)
+
+    def match_or_enqueue(self, ticket, band):
+        with self._lock:
+            if ticket.ticket_id in self._claimed:
+                self._claimed.discard(ticket.ticket_id)
+                return CLAIMED, None
+            self._discard(ticket)
+
+            buckets = self._buckets[ticket.scope]
+            center = int(ticket.rating // BUCKET_WIDTH)
+            if band is None:
+                keys = buckets.keys()
+            else:
+                reach = int(band // BUCKET_WIDTH) + 1
+                keys = [k for k in range(center - reach, center + reach + 1) if k in buckets]
+            best = None
+            for key in keys:
+                for candidate in buckets[key].values():
+                    if candidate.user_id == ticket.user_id:
+                        continue
+                    if band is not None and abs(candidate.rating - ticket.rating) > band:
+                        continue
+                    if best is None or candidate.enqueued_at < best.enqueued_at:
+                        best = candidate
+            if best is not None:
+                self._discard(best)
+                self._claimed.add(best.ticket_id)
+                return MATCHED, best
+
+            self._bucket(ticket)[ticket.ticket_id] = ticket
+            self._tickets[ticket.ticket_id] = ticket
+            return QUEUED, None
+
+    def remove(self, ticket_id):
+        with self._lock:
+            if ticket_id in self._claimed:
+                self._claimed.discard(ticket_id)
+                return False
+            ticket = self._tickets.get(ticket_id)
+            if ticket is None:
+                return False
+            self._discard(ticket)
+            return True
+
+    def remove_user(self, user_id):
+        with self._lock:
+            tickets = [t for t in self._tickets.values() if t.user_id == user_id]
+            for ticket in tickets:
+                self._discard(ticket)
+            return len(tickets)
+
+
+class SQLiteBackend(MatchmakingBackend):
+    """Aynı makinedeki worker'ların paylaştığı SQLite kuyruğu.
+
+    Her işlem `BEGIN IMMEDIATE` ile yazma kilidi alınarak yapılır; iki worker
+    aynı rakibi alamaz. Çöken worker'ların biletleri `expires_at` ile düşer.
+    """
+
+    def __init__(self, path: str = MATCHMAKING_DB_PATH, ttl: float = MATCH_TIMEOUT + 10):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS match_tickets (
+                ticket_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                deck_id TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                rating REAL NOT NULL,
+                enqueued_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                claimed INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_match_scope_rating ON match_tickets (scope, claimed, rating)"
+        )
+
+    def _transaction(self):
+        conn = self._conn
+
+        class _Txn:
+            def __enter__(self_inner):
+                self._lock.acquire()
+                conn.execute("BEGIN IMMEDIATE")
+                return conn
+
+            def __exit__(self_inner, exc_type, exc, tb):
+                try:
+                    conn.execute("ROLLBACK" if exc_type else "COMMIT")
+                finally:
+                    self._lock.release()
+
+        return _Txn()
+
+    def match_or_enqueue(self, ticket, band):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM match_tickets WHERE expires_at < ?", (now,))
+            row = conn.execute(
+                "SELECT claimed FROM match_tickets WHERE ticket_id = ?", (ticket.ticket_id,)
+            ).fetchone()
+            if row and row[0]:
+                conn.execute("DELETE FROM match_tickets WHERE ticket_id = ?", (ticket.ticket_id,))
+                return CLAIMED, None
+            conn.execute("DELETE FROM match_tickets WHERE ticket_id = ?", (ticket.ticket_id,))
+
+            low, high = (-1e9, 1e9) if band is None else (ticket.rating - band, ticket.rating + band)
+            candidate = conn.execute(
+                """SELECT ticket_id, user_id, deck_id, scope, rating, enqueued_at FROM match_tickets
+                   WHERE scope = ? AND claimed = 0 AND rating BETWEEN ? AND ? AND user_id != ?
+                   ORDER BY enqueued_at LIMIT 1""",
+                (ticket.scope, low, high, ticket.user_id),
+            ).fetchone()
+            if candidate:
+                # Rakibin bileti "alındı" olarak işaretlenir; sahibi bir sonraki adımda görür
+                conn.execute("UPDATE match_tickets SET claimed = 1 WHERE ticket_id = ?", (candidate[0],))
+                opponent = Ticket(
+                    ticket_id=candidate[0], user_id=candidate[1], deck_id=candidate[2],
+                    scope=candidate[3], rating=candidate[4], enqueued_at=candidate[5],
+                )
+                return MATCHED, opponent
+
+            conn.execute(
+                """INSERT INTO match_tickets
+                   (ticket_id, user_id, deck_id, scope, rating, enqueued_at, expires_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (ticket.ticket_id, ticket.user_id, ticket.deck_id, ticket.scope,
+                 ticket.rating, ticket.enqueued_at, now + self.ttl),
+            )
+            return QUEUED, None
+
+    def remove(self, ticket_id):
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT claimed FROM match_tickets WHERE ticket_id = ?", (ticket_id,)
+            ).fetchone()
+            conn.execute("DELETE FROM match_tickets WHERE ticket_id = ?", (ticket_id,))
+            return bool(row) and not row[0]
+
+    def remove_user(self, user_id):
+        with self._transaction() as conn:
+            return conn.execute(
+                "DELETE FROM match_tickets WHERE user_id = ? AND claimed = 0", (user_id,)
+            ).rowcount
+
+
+class Matchmaker:
+    def __init__(self, backend: MatchmakingBackend | None = None):
+        self.backend = backend or MemoryBackend()
+
+    async def _pair(self, ticket: Ticket, opponent: Ticket) -> dict:
+        """Bekleyen rakiple düelloyu oluşturur ve rakibe haber verir."""
+        duel_id, error = await run_in_threadpool(
+            flashcard_service.create_duel, opponent.user_id, ticket.user_id, opponent.deck_id
+        )
+        message = {"status": MATCHED, "duel_id": duel_id} if duel_id else {"status": "error", "error": error}
+        await hub.publish(match_channel(opponent.ticket_id), {**message, "opponent_id": ticket.user_id})
+        return {**message, "opponent_id": opponent.user_id}
+
+    async def find_match(self, user_id: str, deck_id: str, timeout: float = MATCH_TIMEOUT) -> dict:
+        """Rakip bulunana ya da süre dolana kadar bekler.
+        Returns: {"status": "matched", "duel_id", "opponent_id"} | {"status": "timeout"}
+        """
+        deck, error = await run_in_threadpool(flashcard_service.get_deck, deck_id)
+        if error:
+            return {"status": "error", "error": error}
+        scope = subject_scope(deck.get("subject"))
+        rating = await run_in_threadpool(rating_service.get_rating, user_id, deck.get("subject"))
+
+        # Aynı kullanıcının önceki (yarım kalmış) biletleri düşer
+        await run_in_threadpool(self.backend.remove_user, user_id)
+        ticket = Ticket(user_id=user_id, deck_id=deck_id, scope=scope, rating=rating)
+        queue = hub.subscribe(match_channel(ticket.ticket_id))
+        deadline = time.monotonic() + timeout
+        try:
+            for stage, band in enumerate(RATING_BANDS):
+                status, opponent = await run_in_threadpool(self.backend.match_or_enqueue, ticket, band)
+                if status == MATCHED:
+                    return await self._pair(ticket, opponent)
+                if status == CLAIMED:
+                    break
+                remaining = deadline - time.monotonic()
+                wait = remaining if stage == len(RATING_BANDS) - 1 else min(WIDEN_INTERVAL, remaining)
+                try:
+                    return await asyncio.wait_for(queue.get(), timeout=max(wait, 0))
+                except asyncio.TimeoutError:
+                    if time.monotonic() >= deadline:
+                        break
+
+            if status != CLAIMED and await run_in_threadpool(self.backend.remove, ticket.ticket_id):
+                return {"status": "timeout"}
+            # Bilet başka bir oyuncu tarafından alındı: düello bildirimi kısa sürede gelir
+            try:
+                return await asyncio.wait_for(queue.get(), timeout=WIDEN_INTERVAL)
+            except asyncio.TimeoutError:
+                return {"status": "timeout"}
+        finally:
+            await run_in_threadpool(self.backend.remove, ticket.ticket_id)
+            hub.unsubscribe(match_channel(ticket.ticket_id), queue)
+
+    async def cancel(self, user_id: str) -> int:
+        return await run_in_threadpool(self.backend.remove_user, user_id)
+
+
+def _make_backend() -> MatchmakingBackend:
+    if MATCHMAKING_BACKEND == "sqlite":
+        return SQLiteBackend()
+    return MemoryBackend()
+
+
+matchmaker = Matchmaker(_make_backend())
@@ -0,0 +1,168 @@
+"""Mesajlaşma servisi: çift anahtarlı konuşmalar, okunmamış sayaçları (Firestore).
+
+conversations/{pair_key}:
+    participants: [uid1, uid2], names: {uid: ad}, unread: {uid: n},
+    last_message: {content, sender_id, created_at}, updated_at
+conversations/{pair_key}/messages/{auto}:
+    sender_id, receiver_id, content, created_at
+"""
+from __future__ import annotations
+import logging
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from firebase_db import get_firestore
+from utils.ids import pair_key
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_CONVERSATIONS = "conversations"
+SUBCOLLECTION_MESSAGES = "messages"
+COLLECTION_USERS = "users"
+
+THREAD_PAGE_SIZE = 30
+INBOX_LIMIT = 50
+
+
+def _doc_to_dict(doc) -> dict:
+    d = doc.to_dict()
+    d["id"] = doc.id
+    for key in ("created_at", "updated_at"):
+        if key in d and hasattr(d[key], "isoformat"):
+            d[key] = d[key].isoformat()
+    last = d.get("last_message") or {}
+    if hasattr(last.get("created_at"), "isoformat"):
+        last["created_at"] = last["created_at"].isoformat()
+    return d
+
+
+def send_message(sender_id: str, receiver_id: str, content: str) -> tuple[str | None, str | None]:
+    """Mesajı konuşmaya ekler; özet ve alıcının okunmamış sayacı aynı batch'te güncellenir.
+    Returns: (conversation_id, error_message)
+    """
+    if sender_id == receiver_id:
+        return None, "Kendinize mesaj gönderemezsiniz."
+    try:
+        db = get_firestore()
+        conv_id = pair_key(sender_id, receiver_id)
+        conv_ref = db.collection(COLLECTION_CONVERSATIONS).document(conv_id)
+        msg_ref = conv_ref.collection(SUBCOLLECTION_MESSAGES).document()
+
+        users = db.collection(COLLECTION_USERS)
+        names = {
+            snap.id: (snap.to_dict() or {}).get("name", "")
+            for snap in db.get_all([users.document(sender_id), users.document(receiver_id)])
+            if snap.exists
+        }
+
+        batch = db.batch()
+        batch.set(msg_ref, {
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "content": content,
+            "created_at": firestore.SERVER_TIMESTAMP,
+        })
+        batch.set(conv_ref, {
+            "participants": sorted([sender_id, receiver_id]),
+            "names": names,
+            "last_message": {
+                "content": content[:200],
+                "sender_id": sender_id,
+                "created_at": firestore.SERVER_TIMESTAMP,
+            },
+            "unread": {receiver_id: firestore.Increment(1)},
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+        batch.commit()
+        return conv_id, None
+    except Exception as e:
+        logger.exception("Mesaj gonderme hatasi")
+        return None, str(e)
+
+
+def get_inbox(user_id: str, limit: int = INBOX_LIMIT) -> tuple[list[dict] | None, str | None]:
+    """Kullanıcının konuşmalarını son mesaja göre listeler (tek sorgu)."""
+    try:
+        db = get_firestore()
+        snap = (
+            db.collection(COLLECTION_CONVERSATIONS)
+            .where("participants", "array_contains", user_id)
+            .order_by("updated_at", direction=firestore.Query.DESCENDING)
+            .limit(limit)
+            .get()
+        )
+        inbox = []
+        for doc in snap:
+            conv = _doc_to_dict(doc)
+            other_id = next((p for p in conv.get("participants", []) if p != user_id), None)
+            inbox.append({
+                "id": conv["id"],
+                "other_user_id": other_id,
+                "other_user_name": (conv.get("names") or {}).get(other_id, ""),
+                "last_message": conv.get("last_message"),
+                "unread": (conv.get("unread") or {}).get(user_id, 0),
+                "updated_at": conv.get("updated_at"),
+            })
+        return inbox, None
+    except Exception as e:
+        logger.exception("Gelen kutusu hatasi")
+        return None, str(e)
+
+
+def get_thread(
+    conversation_id: str, user_id: str, limit: int = THREAD_PAGE_SIZE, before: str | None = None
+) -> tuple[dict | None, str | None]:
+    """Konuşmanın mesajlarını yeniden eskiye sayfalı getirir.
+    `before` bir önceki sayfanın `next_cursor` değeridir (mesaj ID'si).
+    """
+    try:
+        db = get_firestore()
+        conv_ref = db.collection(COLLECTION_CONVERSATIONS).document(conversation_id)
+        conv = conv_ref.get()
+        if not conv.exists or user_id not in (conv.to_dict() or {}).get("participants", []):
+            return None, "Konuşma bulunamadı."
+
+        messages = conv_ref.collection(SUBCOLLECTION_MESSAGES)
+        query = messages.order_by("created_at", direction=firestore.Query.DESCENDING).limit(limit)
+        if before:
+            cursor = messages.document(before).get()
+            if not cursor.exists:
+                return None, "Geçersiz sayfa imleci."
+            query = query.start_after(cursor)
+        page = [_doc_to_dict(d) for d in query.get()]
+        return {
+            "messages": page,
+            "next_cursor": page[-1]["id"] if len(page) == limit else None,
+        }, None
+    except Exception as e:
+        logger.exception("Mesaj listeleme hatasi")
+        return None, str(e)
+
+
+def mark_read(conversation_id: str, user_id: str) -> tuple[bool, str | None]:
+    """Kullanıcının bu konuşmadaki okunmamış sayacını sıfırlar."""
+    try:
+        db = get_firestore()
+        conv_ref = db.collection(COLLECTION_CONVERSATIONS).document(conversation_id)
+
+        @firestore.transactional
+        def read(transaction):
+            conv = conv_ref.get(transaction=transaction)
+            if not conv.exists or user_id not in (conv.to_dict() or {}).get("participants", []):
+                return False, "Konuşma bulunamadı."
+            transaction.update(conv_ref, {FieldPath("unread", user_id).to_api_repr(): 0})
+            return True, None
+
+        return read(db.transaction())
+    except Exception as e:
+        logger.exception("Okundu isaretleme hatasi")
+        return False, str(e)
+
+
+class MessageService:
+    send = staticmethod(send_message)
+    get_inbox = staticmethod(get_inbox)
+    get_thread = staticmethod(get_thread)
+    mark_read = staticmethod(mark_read)
+
+
+message_service = MessageService()
@@ -2,15 +2,56 @@
 from __future__ import annotations
 import json
 import logging
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from firebase_admin import firestore
+from google.api_core import exceptions as gexc
 from firebase_db import get_firestore
+from services.scheduler import COLLECTION_SCHEDULER
+from utils.batch import DEFAULT_WORKERS
+from utils.duration import parse_duration_minutes
+from utils.ids import new_item_id
 
 logger = logging.getLogger(__name__)
 
 COLLECTION_PROGRAMS = "programs"
 COLLECTION_PROGRAM_HISTORY = "program_history"
+COLLECTION_USER_STATS = "user_stats"
 
 GUN_ORDER = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"]
+EDITABLE_ITEM_FIELDS = ("gun", "task", "duration", "completed", "questions")
+
+# Geçmiş kayıtlarında maddeler zlib ile sıkıştırılmış JSON olarak `program_blob`
+# alanında tutulur; liste ekranı yalnızca özet alanlarını okur.
+HISTORY_ENCODING = "zlib-json"
+# Haftalık otomatik arşiv: hafta Pazartesi 00:00 Türkiye saatinde döner
+ARCHIVE_TZ = timezone(timedelta(hours=3))  # Türkiye'de yaz saati uygulaması yok
+WEEKLY_ARCHIVE_INTERVAL = int(os.getenv("WEEKLY_ARCHIVE_INTERVAL", "600"))  # saniye
+ARCHIVE_PAGE_SIZE = int(os.getenv("ARCHIVE_PAGE_SIZE", "200"))
+ARCHIVE_MAX_PAGES_PER_RUN = int(os.getenv("ARCHIVE_MAX_PAGES_PER_RUN", "20"))
+ARCHIVE_PAGE_DELAY = float(os.getenv("ARCHIVE_PAGE_DELAY", "1.0"))  # sayfalar arası bekleme, sn
+WEEKLY_ARCHIVE_STATE = "weekly_archive"
+
+HISTORY_SUMMARY_FIELDS = [
+    "user_id", "archive_date", "program_type", "completion_rate",
+    "item_count", "completed_count", "total_questions",
+]
+
+
+def _legacy_item_id(index: int) -> str:
+    """ID'siz eski maddeler için dokümandaki sırasından türetilen ID."""
+    return f"i{index}"
+
+
+def _ensure_item_ids(items: list[dict]) -> list[dict]:
+    """ID'si olmayan maddelere sıra tabanlı ID verir (dokümandaki sıra ile)."""
+    for i, it in enumerate(items):
+        if not it.get("id"):
+            it["id"] = _legacy_item_id(i)
+    return items
 
 
 def _sort_program_items(items: list[dict]) -> list[dict]:
@@ -21,6 +62,103 @@ def _sort_program_items(items: list[dict]) -> list[dict]:
     return sorted(items, key=key_fn)
 
 
+def _match_item_ids(old_items: list[dict], items: list[dict]) -> list[dict]:
+    """Kaydedilen maddelere kayıtlı ID'lerini geri verir.
+
+    İstemci ID göndermezse madde önce (gun, task) ile, sonra aynı sıradaki
+    kullanılmamış eski maddeyle eşleştirilir; eşleşmeyenler yeni ID alır.
+    Böylece tam kayıt sonrası da PATCH için alınan ID'ler geçerli kalır.
+    """
+    old_ids = {it["id"] for it in old_items}
+    used = {it["id"] for it in items if it.get("id") in old_ids}
+    by_key: dict[tuple, list[str]] = {}
+    for it in old_items:
+        if it["id"] not in used:
+            by_key.setdefault((it.get("gun"), it.get("task")), []).append(it["id"])
+
+    out = [dict(it) for it in items]
+    for it in out:
+        if it.get("id") in old_ids:
+            continue
+        it["id"] = None
+        for candidate in by_key.get((it.get("gun"), it.get("task")), []):
+            if candidate not in used:
+                it["id"] = candidate
+                used.add(candidate)
+                break
+    for i, it in enumerate(out):
+        if it["id"] is None and i < len(old_items) and old_items[i]["id"] not in used:
+            it["id"] = old_items[i]["id"]
+            used.add(it["id"])
+    for it in out:
+        if it["id"] is None:
+            it["id"] = new_item_id()
+    return out
+
+
+def _today_key(now: datetime | None = None) -> str:
+    """Seri (streak) hesabı için Türkiye saatine göre gün anahtarı."""
+    return (now or datetime.now(timezone.utc)).astimezone(ARCHIVE_TZ).date().isoformat()
+
+
+def _completion_delta(old_items: list[dict], new_items: list[dict]) -> tuple[int, int]:
+    """ID'ye göre tamamlanma değişimi: (dakika, görev).
+
+    Yalnızca kayıtlı bir maddeyle eşleşen maddelerdeki değişimler sayılır; yeni
+    eklenen (eşleşmeyen) maddeler tamamlanmış gelse de puanlanmaz. Listeden
+    çıkarılan maddeler düşülmez; tamamlanmış çalışma sayılmış olarak kalır.
+    İşareti kaldırılan madde daha önce sayılan (eski) süresi kadar düşülür;
+    tamamlanmış kalan maddenin süresi değişirse yalnızca fark eklenir."""
+    old = {it["id"]: it for it in old_items}
+    minutes = tasks = 0
+    for it in new_items:
+        prev = old.get(it["id"])
+        if prev is None:
+            continue
+        was_done, now_done = bool(prev.get("completed")), bool(it.get("completed"))
+        old_minutes = parse_duration_minutes(prev.get("duration"))
+        new_minutes = parse_duration_minutes(it.get("duration"))
+        if now_done and not was_done:
+            tasks += 1
+            minutes += new_minutes
+        elif was_done and not now_done:
+            tasks -= 1
+            minutes -= old_minutes
+        elif now_done:
+            minutes += new_minutes - old_minutes
+    return minutes, tasks
+
+
+def _stats_update(stats: dict, minutes: int, tasks: int, day: str) -> dict:
+    """user_stats dokümanının yeni alanları (transaction içinde okunmuş değerden)."""
+    update = {
+        "total_minutes": max(stats.get("total_minutes", 0) + minutes, 0),
+        "tasks_completed": max(stats.get("tasks_completed", 0) + tasks, 0),
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+    if tasks > 0:
+        last_day = stats.get("last_active_day")
+        if last_day != day:
+            yesterday = (datetime.fromisoformat(day) - timedelta(days=1)).date().isoformat()
+            current = stats.get("current_streak", 0) + 1 if last_day == yesterday else 1
+            update["current_streak"] = current
+            update["longest_streak"] = max(stats.get("longest_streak", 0), current)
+            update["last_active_day"] = day
+    return update
+
+
+def _apply_completion_stats(transaction, db, user_id: str, old_items: list[dict], new_items: list[dict]) -> None:
+    """Tamamlanma değişimini kullanıcının istatistik özetine işler.
+    Program okunduktan sonra, transaction'daki yazmalardan önce çağrılmalıdır."""
+    minutes, tasks = _completion_delta(old_items, new_items)
+    if not tasks and not minutes:
+        return
+    stats_ref = db.collection(COLLECTION_USER_STATS).document(user_id)
+    snap = stats_ref.get(transaction=transaction)
+    stats = (snap.to_dict() or {}) if snap.exists else {}
+    transaction.set(stats_ref, _stats_update(stats, minutes, tasks, _today_key()), merge=True)
+
+
 def get_program(user_id: str) -> list[dict]:
     """Kullanıcının aktif programını getirir."""
     try:
@@ -30,7 +168,7 @@ def get_program(user_id: str) -> list[dict]:
         if not snap.exists:
             return []
         data = snap.to_dict()
-        items = data.get("items") or []
+        items = _ensure_item_ids(data.get("items") or [])
         for i, it in enumerate(items):
             if isinstance(it.get("completed"), bool):
                 pass
@@ -50,19 +188,135 @@ def save_program(user_id: str, program: list[dict]) -> tuple[bool, str | None]:
         items = []
         for p in program:
             items.append({
+                "id": p.get("id"),
                 "gun": p.get("gun", "Pazartesi"),
                 "task": p.get("task") or f"{p.get('subject', '')} - {p.get('topic', '')}".strip() or "Ders",
                 "duration": p.get("duration", "1 Saat"),
                 "completed": bool(p.get("completed")),
                 "questions": int(p.get("questions") or p.get("questionCount") or 0),
             })
-        db.collection(COLLECTION_PROGRAMS).document(user_id).set({"items": items})
+        prog_ref = db.collection(COLLECTION_PROGRAMS).document(user_id)
+
+        @firestore.transactional
+        def save(transaction):
+            snap = prog_ref.get(transaction=transaction)
+            old_items = _ensure_item_ids((snap.to_dict() or {}).get("items") or []) if snap.exists else []
+            new_items = _match_item_ids(old_items, items)
+            _apply_completion_stats(transaction, db, user_id, old_items, new_items)
+            transaction.set(prog_ref, {
+                "items": new_items,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            })
+
+        save(db.transaction())
         return True, None
     except Exception as e:
         logger.exception("Program kaydetme hatasi")
         return False, str(e)
 
 
+def update_program_item(user_id: str, item_id: str, changes: dict) -> tuple[dict | None, str | None]:
+    """Tek bir program maddesini transaction içinde günceller.
+
+    Öğretmenin program ataması ile öğrencinin işaretlemesi çakışırsa
+    transaction yeniden denenir; hiçbir güncelleme kaybolmaz.
+    Returns: (güncellenen madde, error_message)
+    """
+    try:
+        changes = {k: v for k, v in changes.items() if k in EDITABLE_ITEM_FIELDS and v is not None}
+        if "completed" in changes:
+            changes["completed"] = bool(changes["completed"])
+        if "questions" in changes:
+            changes["questions"] = int(changes["questions"])
+        db = get_firestore()
+        prog_ref = db.collection(COLLECTION_PROGRAMS).document(user_id)
+
+        @firestore.transactional
+        def update(transaction):
+            snap = prog_ref.get(transaction=transaction)
+            if not snap.exists:
+                return None, "Program bulunamadı."
+            items = _ensure_item_ids((snap.to_dict() or {}).get("items") or [])
+            item = next((it for it in items if it["id"] == item_id), None)
+            if item is None:
+                return None, "Madde bulunamadı."
+            before = dict(item)
+            item.update(changes)
+            _apply_completion_stats(transaction, db, user_id, [before], [item])
+            transaction.update(prog_ref, {"items": items, "updated_at": firestore.SERVER_TIMESTAMP})
+            return item, None
+
+        return update(db.transaction())
+    except Exception as e:
+        logger.exception("Program maddesi guncelleme hatasi")
+        return None, str(e)
+
+
+def _history_summary(items: list[dict]) -> dict:
+    """Arşivlenecek maddelerin özet alanları (tamamlanma oranı, sayılar)."""
+    total = len(items)
+    completed = sum(1 for it in items if it.get("completed"))
+    return {
+        "completion_rate": round((completed / total) * 100) if total > 0 else 0,
+        "item_count": total,
+        "completed_count": completed,
+        "total_questions": sum(int(it.get("questions") or 0) for it in items),
+    }
+
+
+def _pack_items(items: list[dict]) -> bytes:
+    return zlib.compress(json.dumps(items, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _history_items(d: dict) -> list[dict]:
+    """Geçmiş kaydının maddelerini çözer (sıkıştırılmış ve eski JSON string formatı)."""
+    blob = d.get("program_blob")
+    if blob is not None:
+        try:
+            return json.loads(zlib.decompress(blob).decode("utf-8"))
+        except (zlib.error, ValueError):
+            logger.warning("Bozuk gecmis kaydi (program_blob)")
+            return []
+    data = d.get("program_data")
+    if isinstance(data, str):
+        try:
+            return json.loads(data)
+        except ValueError:
+            return []
+    return data or []
+
+
+def _history_entry(doc, with_items: bool) -> dict:
+    d = doc.to_dict()
+    d["id"] = doc.id
+    if "archive_date" in d and hasattr(d["archive_date"], "isoformat"):
+        d["archive_date"] = d["archive_date"].isoformat()
+    if with_items:
+        d["program_data"] = _history_items(d)
+    else:
+        d.pop("program_data", None)
+    d.pop("program_blob", None)
+    d.pop("encoding", None)
+    return d
+
+
+def _history_record(user_id: str, items: list[dict], program_type: str, archive_week: str | None = None) -> dict:
+    """program_history dokümanı: özet alanları + sıkıştırılmış maddeler."""
+    return {
+        "user_id": user_id,
+        **_history_summary(items),
+        "program_blob": _pack_items(items),
+        "encoding": HISTORY_ENCODING,
+        "program_type": program_type,
+        "archive_date": firestore.SERVER_TIMESTAMP,
+        **({"archive_week": archive_week} if archive_week else {}),
+    }
+
+
+def _archive_stats() -> dict:
+    return {"weeks_archived": firestore.Increment(1), "updated_at": firestore.SERVER_TIMESTAMP}
+
+
 def archive_program(
     user_id: str, program_type: str = "manual"
 ) -> tuple[bool, str | None]:
@@ -76,27 +330,120 @@ def archive_program(
         items = (snap.to_dict() or {}).get("items") or []
         if not items:
             return True, None
-        # Tamamlanma oranını hesapla
-        total = len(items)
-        completed = sum(1 for it in items if it.get("completed"))
-        completion_rate = round((completed / total) * 100) if total > 0 else 0
-        program_data = json.dumps(items, ensure_ascii=False)
-        db.collection(COLLECTION_PROGRAM_HISTORY).add({
-            "user_id": user_id,
-            "completion_rate": completion_rate,
-            "program_data": program_data,
-            "program_type": program_type,
-            "archive_date": firestore.SERVER_TIMESTAMP,
-        })
-        prog_ref.delete()
+        batch = db.batch()
+        batch.set(db.collection(COLLECTION_PROGRAM_HISTORY).document(), _history_record(user_id, items, program_type))
+        batch.set(db.collection(COLLECTION_USER_STATS).document(user_id), _archive_stats(), merge=True)
+        batch.delete(prog_ref)
+        batch.commit()
         return True, None
     except Exception as e:
         logger.exception("Arsiv hatasi")
         return False, str(e)
 
 
+def _archive_week(now: datetime) -> tuple[str, datetime]:
+    """Arşivlenecek (biten) haftanın anahtarı ve yeni haftanın başlangıcı.
+    Returns: ("2026-W42", yeni haftanın başlangıcı)
+    """
+    local = now.astimezone(ARCHIVE_TZ)
+    week_start = (local - timedelta(days=local.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    year, week, _ = (week_start - timedelta(days=1)).isocalendar()
+    return f"{year}-W{week:02d}", week_start
+
+
+def _archive_program_doc(db, doc, record: dict, week_key: str) -> str:
+    """Tek programı arşivler; geçmiş kaydı, sayaç ve silme aynı batch'tedir.
+
+    Silme, programın okunduğu andaki update_time ön koşuluyla yapılır: program
+    arada kaydedildiyse batch'in hiçbiri uygulanmaz ve program yerinde kalır.
+    Returns: "archived" | "changed" | "failed"
+    """
+    batch = db.batch()
+    batch.set(db.collection(COLLECTION_PROGRAM_HISTORY).document(f"{doc.id}_{week_key}"), record)
+    batch.set(db.collection(COLLECTION_USER_STATS).document(doc.id), _archive_stats(), merge=True)
+    batch.delete(doc.reference, option=db.write_option(last_update_time=doc.update_time))
+    try:
+        batch.commit()
+        return "archived"
+    except (gexc.FailedPrecondition, gexc.NotFound):
+        return "changed"
+    except Exception:
+        logger.exception("Haftalik arsiv yazma hatasi: %s", doc.id)
+        return "failed"
+
+
+def run_weekly_archive(now: datetime | None = None) -> dict:
+    """Biten haftanın tüm aktif programlarını geçmişe arşivler (zamanlanmış görev).
+
+    `programs` __name__ sırasıyla sayfalanır; her program kendi batch'inde
+    (geçmiş kaydı + weeks_archived + ön koşullu silme) paralel arşivlenir.
+    İlerleme `_scheduler/weekly_archive.checkpoint` alanında tutulur; bir
+    çalıştırma en fazla ARCHIVE_MAX_PAGES_PER_RUN sayfa işler ve sayfalar
+    arasında bekler, kalan kısım bir sonraki turda checkpoint'ten devam eder.
+    Arşivlenen program silindiğinden yarıda kalan sayfanın tekrarı aynı
+    programı (ve sayacı) ikinci kez işlemez. Yeni hafta başladıktan sonra
+    güncellenmiş programlar, okunduktan sonra kaydedilenler dahil, yeni
+    haftaya ait sayılıp atlanır.
+    """
+    db = get_firestore()
+    week_key, week_start = _archive_week(now or datetime.now(timezone.utc))
+    state_ref = db.collection(COLLECTION_SCHEDULER).document(WEEKLY_ARCHIVE_STATE)
+    state_snap = state_ref.get()
+    state = ((state_snap.to_dict() or {}).get("checkpoint") if state_snap.exists else None) or {}
+    if state.get("week") != week_key:
+        state = {"week": week_key, "last_doc_id": None, "archived": 0, "skipped": 0, "done": False}
+    if state["done"]:
+        return state
+
+    programs = db.collection(COLLECTION_PROGRAMS)
+    for page_no in range(ARCHIVE_MAX_PAGES_PER_RUN):
+        if page_no:
+            time.sleep(ARCHIVE_PAGE_DELAY)
+        query = programs.order_by("__name__").limit(ARCHIVE_PAGE_SIZE)
+        if state["last_doc_id"]:
+            query = query.start_after({"__name__": programs.document(state["last_doc_id"])})
+        page = list(query.stream())
+        if not page:
+            state["done"] = True
+            break
+
+        jobs = []
+        for doc in page:
+            data = doc.to_dict() or {}
+            items = data.get("items") or []
+            updated_at = data.get("updated_at")
+            if not items or (updated_at is not None and updated_at >= week_start):
+                state["skipped"] += 1
+                continue
+            jobs.append((doc, _history_record(doc.id, items, "auto", archive_week=week_key)))
+
+        results = []
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(DEFAULT_WORKERS, len(jobs))) as pool:
+                results = list(pool.map(lambda job: _archive_program_doc(db, *job, week_key), jobs))
+        state["archived"] += results.count("archived")
+        state["skipped"] += results.count("changed")
+        failed = results.count("failed")
+        if failed:
+            # Checkpoint ilerletilmez; arşivlenenler silindiği için sayfanın tekrarı sadece kalanları işler
+            logger.warning("Haftalik arsiv: %d program yazilamadi, sayfa tekrar denenecek", failed)
+            break
+        state["last_doc_id"] = page[-1].id
+        if len(page) < ARCHIVE_PAGE_SIZE:
+            state["done"] = True
+        state_ref.set({"checkpoint": state, "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+        if state["done"]:
+            break
+
+    state_ref.set({"checkpoint": state, "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+    if state["done"]:
+        logger.info("Haftalik arsiv tamamlandi: %s (%d arsiv, %d atlandi)",
+                    week_key, state["archived"], state["skipped"])
+    return state
+
+
 def get_history(user_id: str) -> list[dict]:
-    """Kullanıcının program geçmişini getirir."""
+    """Kullanıcının program geçmişini maddeleriyle birlikte getirir (eski uç nokta uyumluluğu)."""
     try:
         db = get_firestore()
         snap = (
@@ -104,18 +451,7 @@ def get_history(user_id: str) -> list[dict]:
             .where("user_id", "==", user_id)
             .get()
         )
-        out = []
-        for doc in snap:
-            d = doc.to_dict()
-            d["id"] = doc.id
-            if "archive_date" in d and hasattr(d["archive_date"], "isoformat"):
-                d["archive_date"] = d["archive_date"].isoformat()
-            if "program_data" in d and isinstance(d["program_data"], str):
-                try:
-                    d["program_data"] = json.loads(d["program_data"])
-                except:
-                    d["program_data"] = []
-            out.append(d)
+        out = [_history_entry(doc, with_items=True) for doc in snap]
         out.sort(key=lambda x: x.get("archive_date", ""), reverse=True)
         return out
     except Exception as e:
@@ -123,6 +459,36 @@ def get_history(user_id: str) -> list[dict]:
         return []
 
 
+def get_history_summary(user_id: str) -> tuple[list[dict] | None, str | None]:
+    """Geçmiş listesi: sadece özet alanları okunur, madde verisi indirilmez."""
+    try:
+        db = get_firestore()
+        snap = (
+            db.collection(COLLECTION_PROGRAM_HISTORY)
+            .where("user_id", "==", user_id)
+            .order_by("archive_date", direction=firestore.Query.DESCENDING)
+            .select(HISTORY_SUMMARY_FIELDS)
+            .get()
+        )
+        return [_history_entry(doc, with_items=False) for doc in snap], None
+    except Exception as e:
+        logger.exception("Gecmis ozeti hatasi")
+        return None, str(e)
+
+
+def get_history_entry(history_id: str) -> tuple[dict | None, str | None]:
+    """Tek bir geçmiş kaydını maddeleri çözülmüş olarak getirir."""
+    try:
+        db = get_firestore()
+        doc = db.collection(COLLECTION_PROGRAM_HISTORY).document(history_id).get()
+        if not doc.exists:
+            return None, "Kayıt bulunamadı."
+        return _history_entry(doc, with_items=True), None
+    except Exception as e:
+        logger.exception("Gecmis kaydi getirme hatasi")
+        return None, str(e)
+
+
 def delete_history(history_id: str) -> tuple[bool, str | None]:
     """Geçmiş kaydını siler (Firestore doc id string)."""
     try:
@@ -135,17 +501,17 @@ def delete_history(history_id: str) -> tuple[bool, str | None]:
 
 
 def get_user_stats(user_id: str) -> dict:
-    """Kullanıcı istatistiklerini ve kurum bilgisini getirir."""
+    """Kullanıcı istatistiklerini (user_stats özeti) ve kurum bilgisini getirir."""
     try:
         db = get_firestore()
-        
-        # 1. Tamamlanan görev sayısı (Geçmişten)
-        snap = (
-            db.collection(COLLECTION_PROGRAM_HISTORY)
-            .where("user_id", "==", user_id)
-            .get()
-        )
-        total_tasks = len(snap)
+
+        # 1. Çalışma özeti (tek doküman; kaydet / işaretle / arşivle sırasında güncellenir)
+        stats_snap = db.collection(COLLECTION_USER_STATS).document(user_id).get()
+        stats = (stats_snap.to_dict() or {}) if stats_snap.exists else {}
+        total_minutes = stats.get("total_minutes", 0)
+        # Dün ya da bugün etkinlik yoksa seri bozulmuştur
+        yesterday = (datetime.fromisoformat(_today_key()) - timedelta(days=1)).date().isoformat()
+        active = (stats.get("last_active_day") or "") >= yesterday
 
         # 2. Kurum bilgisi (Users koleksiyonundan)
         institution = None
@@ -168,8 +534,12 @@ def get_user_stats(user_id: str) -> dict:
                     }
 
         return {
-            "total_tasks": total_tasks,
-            "total_hours": 0,
+            "total_tasks": stats.get("tasks_completed", 0),
+            "total_hours": round(total_minutes / 60, 1),
+            "total_minutes": total_minutes,
+            "current_streak": stats.get("current_streak", 0) if active else 0,
+            "longest_streak": stats.get("longest_streak", 0),
+            "weeks_archived": stats.get("weeks_archived", 0),
             "institution": institution
         }
     except Exception as e:
@@ -180,8 +550,12 @@ def get_user_stats(user_id: str) -> dict:
 class ProgramService:
     get = staticmethod(get_program)
     save = staticmethod(save_program)
+    update_item = staticmethod(update_program_item)
     archive = staticmethod(archive_program)
+    run_weekly_archive = staticmethod(run_weekly_archive)
     get_history = staticmethod(get_history)
+    get_history_summary = staticmethod(get_history_summary)
+    get_history_entry = staticmethod(get_history_entry)
     delete_history = staticmethod(delete_history)
     get_stats = staticmethod(get_user_stats)
 
@@ -1,15 +1,22 @@
 """Soru havuzu servisi (Firestore + Storage)."""
 from __future__ import annotations
+import hashlib
 import logging
 import uuid
 from datetime import datetime
 from firebase_admin import firestore, storage
 from firebase_db import get_firestore
+from utils.image_hash import compute_dhash, hamming_distance
 
 logger = logging.getLogger(__name__)
 
 COLLECTION_USERS = "users"
 SUBCOLLECTION_QUESTIONS = "questions"
+# Kullanıcı başına görsel hash indeksi: users/{uid}/meta/question_hashes
+SUBCOLLECTION_META = "meta"
+DOC_QUESTION_HASHES = "question_hashes"
+# Bu kadar bit farkına kadar olan görseller benzer soru olarak işaretlenir (blob paylaşılmaz)
+DUPLICATE_MAX_DISTANCE = 6
 # Frontend config'den alinan bucket adi. 
 # Eger env'de varsa oradan al, yoksa hardcode fallback.
 BUCKET_NAME = "rcsinavim.appspot.com" 
@@ -22,33 +29,73 @@ def _doc_to_dict(doc) -> dict:
             d[key] = d[key].isoformat()
     return d
 
+def _find_similar_image(index: dict, image_hash: str) -> dict | None:
+    """Hash indeksinde en yakın (eşik altındaki) görsel kaydını bulur."""
+    best, best_distance = None, DUPLICATE_MAX_DISTANCE + 1
+    for known_hash, entry in index.items():
+        distance = hamming_distance(image_hash, known_hash)
+        if distance < best_distance:
+            best, best_distance = entry, distance
+    return best
+
+
 def add_question(user_id: str, image_file, lesson: str, topic: str = "", notes: str = "", content_type: str = None) -> tuple[dict | None, str | None]:
-    """Soru ekler (Resim yükler + Firestore kaydeder)."""
+    """Soru ekler (Resim yükler + Firestore kaydeder).
+
+    Bayt bayt aynı görsel (içerik hash'i) daha önce yüklendiyse mevcut blob
+    yeniden kullanılır. Perceptual hash'i yakın olan görseller aynı şablondaki
+    farklı sorular olabileceğinden yine yüklenir; yalnızca `duplicate` işaretlenir.
+    """
     try:
-        # 1. Upload Image
-        bucket = storage.bucket()
-        filename = f"questions/{user_id}/{uuid.uuid4()}.jpg"
-        blob = bucket.blob(filename)
-        
+        db = get_firestore()
+        user_ref = db.collection(COLLECTION_USERS).document(user_id)
+        index_ref = user_ref.collection(SUBCOLLECTION_META).document(DOC_QUESTION_HASHES)
+
         # image_file bir file-like object olmalidir (read() metodu olan)
-        # content_type parametresi opsiyonel, yoksa objeden okumaya calisir
-        final_content_type = content_type or getattr(image_file, "content_type", "image/jpeg")
-        
-        blob.upload_from_file(image_file, content_type=final_content_type)
-        
-        # Try to make public, but don't fail if it's restricted
-        try:
-            blob.make_public()
-        except Exception as bucket_err:
-            logger.warning(f"Could not make blob public: {bucket_err}")
-            
-        image_url = blob.public_url
+        data = image_file.read()
+        image_hash = compute_dhash(data)
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        index_snap = index_ref.get()
+        index = (index_snap.to_dict() or {}) if index_snap.exists else {}
+        existing = (index.get("blobs") or {}).get(content_hash)
+        similar = _find_similar_image(index.get("hashes") or {}, image_hash) if image_hash else None
+
+        if existing:
+            image_url = existing["image_url"]
+            storage_path = existing.get("storage_path")
+        else:
+            # 1. Upload Image
+            bucket = storage.bucket()
+            storage_path = f"questions/{user_id}/{uuid.uuid4()}.jpg"
+            blob = bucket.blob(storage_path)
+
+            # content_type parametresi opsiyonel, yoksa objeden okumaya calisir
+            final_content_type = content_type or getattr(image_file, "content_type", "image/jpeg")
+
+            blob.upload_from_string(data, content_type=final_content_type)
+
+            # Try to make public, but don't fail if it's restricted
+            try:
+                blob.make_public()
+            except Exception as bucket_err:
+                logger.warning(f"Could not make blob public: {bucket_err}")
+
+            image_url = blob.public_url
+
+            entry = {"image_url": image_url, "storage_path": storage_path}
+            index_ref.set({
+                "blobs": {content_hash: entry},
+                **({"hashes": {image_hash: entry}} if image_hash else {}),
+            }, merge=True)
 
         # 2. Save Metadata
-        db = get_firestore()
-        doc_ref = db.collection(COLLECTION_USERS).document(user_id).collection(SUBCOLLECTION_QUESTIONS).document()
+        doc_ref = user_ref.collection(SUBCOLLECTION_QUESTIONS).document()
         question_data = {
             "image_url": image_url,
+            "storage_path": storage_path,
+            "image_hash": image_hash,
+            "content_hash": content_hash,
             "lesson": lesson,
             "topic": topic,
             "notes": notes,
@@ -58,7 +105,14 @@ def add_question(user_id: str, image_file, lesson: str, topic: str = "", notes:
         doc_ref.set(question_data)
         
         # Return serializable data
-        return {"id": doc_ref.id, "image_url": image_url, "lesson": lesson, "solved": False}, None
+        return {
+            "id": doc_ref.id,
+            "image_url": image_url,
+            "lesson": lesson,
+            "solved": False,
+            "duplicate": existing is not None or similar is not None,
+            "image_reused": existing is not None,
+        }, None
     except Exception as e:
         logger.exception("Soru ekleme hatasi")
         return None, str(e)
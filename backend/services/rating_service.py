@@ -0,0 +1,154 @@
+"""Düello ELO puanları ve sıralama (Firestore).
+
+duel_ratings/{uid}_{scope}: user_id, scope ("global" veya konu anahtarı),
+rating, games, wins, losses, draws. Puanlar düello sonucu transaction'ı
+içinde güncellenir. "İlk 100" (scope, rating desc) indeksli tek sorgu,
+"sıram" ise daha yüksek puanlıların count() toplamıdır.
+"""
+import logging
+from firebase_admin import firestore
+from firebase_db import get_firestore
+from utils.text_search import words
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_RATINGS = "duel_ratings"
+COLLECTION_USERS = "users"
+
+GLOBAL_SCOPE = "global"
+DEFAULT_RATING = 1200.0
+K_FACTOR = 32
+PROVISIONAL_K_FACTOR = 48  # İlk PROVISIONAL_GAMES maçta puan daha hızlı oturur
+PROVISIONAL_GAMES = 10
+LEADERBOARD_SIZE = 100
+
+
+def subject_scope(subject: str | None) -> str:
+    """Konu adından sıralama kapsamı anahtarı üretir ("Türk Dili" -> "turk-dili")."""
+    return "-".join(words(subject or "")) or GLOBAL_SCOPE
+
+
+def _rating_ref(db, user_id: str, scope: str):
+    return db.collection(COLLECTION_RATINGS).document(f"{user_id}_{scope}")
+
+
+def expected_score(rating: float, opponent: float) -> float:
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+
+def _k_factor(games: int) -> int:
+    return PROVISIONAL_K_FACTOR if games < PROVISIONAL_GAMES else K_FACTOR
+
+
+def update_ratings_in_transaction(transaction, db, player_a: str, player_b: str, winner_id: str, subject: str | None) -> dict:
+    """İki oyuncunun global ve (varsa) konu puanlarını transaction içinde günceller.
+
+    Tüm okumalar yazmalardan önce yapılır; çağıran taraf bu fonksiyondan sonra
+    yalnızca yazma yapmalıdır. Returns: {uid: global puan değişimi}
+    """
+    scopes = [GLOBAL_SCOPE]
+    if subject and subject_scope(subject) != GLOBAL_SCOPE:
+        scopes.append(subject_scope(subject))
+
+    refs = {(uid, scope): _rating_ref(db, uid, scope) for scope in scopes for uid in (player_a, player_b)}
+    snaps = {key: ref.get(transaction=transaction) for key, ref in refs.items()}
+    state = {
+        key: snap.to_dict() if snap.exists else {"rating": DEFAULT_RATING, "games": 0, "wins": 0, "losses": 0, "draws": 0}
+        for key, snap in snaps.items()
+    }
+
+    deltas = {}
+    for scope in scopes:
+        a, b = state[(player_a, scope)], state[(player_b, scope)]
+        score_a = 0.5 if winner_id == "draw" else float(winner_id == player_a)
+        exp_a = expected_score(a["rating"], b["rating"])
+        changes = {
+            player_a: _k_factor(a["games"]) * (score_a - exp_a),
+            player_b: _k_factor(b["games"]) * ((1 - score_a) - (1 - exp_a)),
+        }
+        for uid, current in ((player_a, a), (player_b, b)):
+            outcome = "draws" if winner_id == "draw" else ("wins" if winner_id == uid else "losses")
+            transaction.set(refs[(uid, scope)], {
+                "user_id": uid,
+                "scope": scope,
+                "rating": round(current["rating"] + changes[uid], 1),
+                "games": current.get("games", 0) + 1,
+                "wins": current.get("wins", 0) + (outcome == "wins"),
+                "losses": current.get("losses", 0) + (outcome == "losses"),
+                "draws": current.get("draws", 0) + (outcome == "draws"),
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            })
+        if scope == GLOBAL_SCOPE:
+            deltas = {uid: round(change, 1) for uid, change in changes.items()}
+    return deltas
+
+
+class RatingService:
+    @staticmethod
+    def get_rating(user_id: str, subject: str | None = None) -> float:
+        """Kullanıcının kapsamdaki puanı (kaydı yoksa başlangıç puanı)."""
+        snap = _rating_ref(get_firestore(), user_id, subject_scope(subject)).get()
+        return snap.get("rating") if snap.exists else DEFAULT_RATING
+
+    @staticmethod
+    def get_leaderboard(subject: str | None = None, limit: int = LEADERBOARD_SIZE):
+        """Kapsamdaki en yüksek puanlı oyuncular (isimler tek get_all ile eklenir)."""
+        try:
+            db = get_firestore()
+            scope = subject_scope(subject)
+            docs = (
+                db.collection(COLLECTION_RATINGS)
+                .where("scope", "==", scope)
+                .order_by("rating", direction=firestore.Query.DESCENDING)
+                .limit(limit)
+                .get()
+            )
+            rows = [d.to_dict() for d in docs]
+            users = db.collection(COLLECTION_USERS)
+            names = {
+                snap.id: (snap.to_dict() or {}).get("name", "")
+                for snap in db.get_all([users.document(r["user_id"]) for r in rows])
+                if snap.exists
+            } if rows else {}
+            leaderboard = [{
+                "rank": i + 1,
+                "user_id": r["user_id"],
+                "name": names.get(r["user_id"], ""),
+                "rating": r["rating"],
+                "games": r.get("games", 0),
+                "wins": r.get("wins", 0),
+            } for i, r in enumerate(rows)]
+            return {"scope": scope, "leaderboard": leaderboard}, None
+        except Exception as e:
+            logger.exception("Get leaderboard error")
+            return None, str(e)
+
+    @staticmethod
+    def get_user_rank(user_id: str, subject: str | None = None):
+        """Kullanıcının puanı ve sırası (kendisinden yüksek puanlıların sayısı + 1)."""
+        try:
+            db = get_firestore()
+            scope = subject_scope(subject)
+            snap = _rating_ref(db, user_id, scope).get()
+            if not snap.exists:
+                return {"scope": scope, "rating": DEFAULT_RATING, "games": 0, "rank": None}, None
+            data = snap.to_dict()
+            higher = (
+                db.collection(COLLECTION_RATINGS)
+                .where("scope", "==", scope)
+                .where("rating", ">", data["rating"])
+                .count()
+                .get()
+            )
+            return {
+                "scope": scope,
+                "rating": data["rating"],
+                "games": data.get("games", 0),
+                "rank": int(higher[0][0].value) + 1,
+            }, None
+        except Exception as e:
+            logger.exception("Get user rank error")
+            return None, str(e)
+
+
+rating_service = RatingService()
@@ -0,0 +1,190 @@
+"""Gerçek zamanlı olaylar için süreç içi pub/sub merkezi.
+
+WebSocket / SSE bağlantıları bir kanala abone olur ve kendi asyncio kuyruklarından
+mesaj okur. Yayınlar bir backend üzerinden geçer: `LocalBackend` sadece bu süreç
+içinde dağıtır; `SQLiteBackend` aynı makinedeki birden çok uvicorn worker'ının
+olaylarını paylaşılan bir SQLite dosyası üzerinden birbirine iletir. Başka bir
+backend (ör. Redis) aynı arayüzü uygulayıp `PUBSUB_BACKEND` ile seçilebilir.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "local")
+PUBSUB_DB_PATH = os.getenv(
+    "PUBSUB_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pubsub.sqlite3"),
+)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+Deliver = Callable[[str, dict], None]
+
+
+class PubSubBackend:
+    """Yayınları (gerekirse diğer worker'lara) taşıyan backend arayüzü."""
+
+    async def start(self, deliver: Deliver) -> None:
+        """`deliver(channel, message)` gelen her mesaj için çağrılır."""
+        self.deliver = deliver
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, channel: str, message: dict) -> None:
+        raise NotImplementedError
+
+
+class LocalBackend(PubSubBackend):
+    """Sadece bu süreç içindeki abonelere dağıtır."""
+
+    async def publish(self, channel: str, message: dict) -> None:
+        self.deliver(channel, message)
+
+
+class SQLiteBackend(PubSubBackend):
+    """Aynı makinedeki worker'lar arasında paylaşılan SQLite tablosu üzerinden dağıtım.
+
+    Yayın yerel abonelere hemen iletilir ve tabloya yazılır; diğer worker'lar
+    tabloyu kısa aralıklarla okuyup kendi abonelerine dağıtır.
+    """
+
+    def __init__(self, path: str = PUBSUB_DB_PATH, poll_interval: float = 0.2, retention: float = 60.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self._conn: sqlite3.Connection | None = None
+        self._task: asyncio.Task | None = None
+        self._last_id = 0
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS pubsub_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        row = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM pubsub_messages").fetchone()
+        self._last_id = row[0]
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    async def publish(self, channel: str, message: dict) -> None:
+        self.deliver(channel, message)
+        self._conn.execute(
+            "INSERT INTO pubsub_messages (origin, channel, payload, created_at) VALUES (?, ?, ?, ?)",
+            (self.origin, channel, json.dumps(message, default=str), time.time()),
+        )
+
+    async def _poll(self) -> None:
+        last_cleanup = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, origin, channel, payload FROM pubsub_messages WHERE id > ? ORDER BY id",
+                    (self._last_id,),
+                ).fetchall()
+                for msg_id, origin, channel, payload in rows:
+                    self._last_id = msg_id
+                    if origin != self.origin:
+                        self.deliver(channel, json.loads(payload))
+                if time.monotonic() - last_cleanup > self.retention:
+                    self._conn.execute(
+                        "DELETE FROM pubsub_messages WHERE created_at < ?", (time.time() - self.retention,)
+                    )
+                    last_cleanup = time.monotonic()
+            except Exception:
+                logger.exception("PubSub SQLite okuma hatasi")
+
+
+class PubSubHub:
+    """Kanal -> abone kuyrukları eşlemesi; yayınları backend üzerinden dağıtır."""
+
+    def __init__(self, backend: PubSubBackend | None = None):
+        self.backend = backend or LocalBackend()
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        await self.backend.start(self._deliver)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+        self._loop = None
+
+    def subscribe(self, channel: str, queue: asyncio.Queue | None = None) -> asyncio.Queue:
+        """Kanala abone olur; birden çok kanal aynı kuyruğa bağlanabilir."""
+        if queue is None:
+            queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[channel].add(queue)
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(channel)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[channel]
+
+    def subscriber_count(self, channel: str) -> int:
+        return len(self._subscribers.get(channel, ()))
+
+    async def publish(self, channel: str, message: dict) -> None:
+        await self.backend.publish(channel, message)
+
+    def publish_threadsafe(self, channel: str, message: dict) -> None:
+        """Event loop dışındaki thread'lerden (ör. Firestore listener) yayın yapar."""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.publish(channel, message), self._loop)
+
+    def deliver_local_threadsafe(self, channel: str, message: dict) -> None:
+        """Event loop dışındaki thread'lerden sadece bu sürecin abonelerine dağıtır.
+
+        Her worker'ın kendi Firestore dinleyicisi olduğu olaylar için kullanılır;
+        backend'den geçselerdi diğer worker'lara da iletilip kopyalanırlardı.
+        """
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._deliver, channel, message)
+
+    def _deliver(self, channel: str, message: dict) -> None:
+        for queue in list(self._subscribers.get(channel, ())):
+            if queue.full():
+                # Yavaş istemci: en eski mesajı düşür, bağlantıyı bloklama
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+
+def _make_backend() -> PubSubBackend:
+    if PUBSUB_BACKEND == "sqlite":
+        return SQLiteBackend()
+    return LocalBackend()
+
+
+hub = PubSubHub(_make_backend())
@@ -0,0 +1,183 @@
+"""Flashcard tekrar planlayıcısı (SM-2) servisi (Firestore).
+
+Her kullanıcının takip ettiği kartların durumu `users/{uid}/card_states`
+altında tutulur: ease, interval (gün), repetitions ve `due_at`. "Bugün
+tekrar edilecekler" `due_at <= now` üzerinde tek indeksli sorgudur; oturum,
+bu adaylar arasından en çok geciken kartları min-heap ile seçer.
+"""
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+from firebase_db import get_firestore
+from services.catalog_service import catalog_service
+from services.flashcard_service import COLLECTION_DECKS, _deck_cards
+from utils.batch import WriteOp, commit_in_batches
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_USERS = "users"
+SUBCOLLECTION_CARD_STATES = "card_states"
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+DEFAULT_SESSION_SIZE = 20
+# Oturum için okunacak aday sayısı = boyut x çarpan (tek sorgu)
+SESSION_CANDIDATE_FACTOR = 3
+
+
+def _card_state_id(deck_id: str, index: int) -> str:
+    return f"{deck_id}_{index}"
+
+
+def _states_ref(db, user_id: str):
+    return db.collection(COLLECTION_USERS).document(user_id).collection(SUBCOLLECTION_CARD_STATES)
+
+
+def _state_to_dict(doc) -> dict:
+    data = doc.to_dict()
+    data["id"] = doc.id
+    for key, val in data.items():
+        if hasattr(val, "isoformat"):
+            data[key] = val.isoformat()
+    return data
+
+
+def sm2(ease: float, interval: int, repetitions: int, quality: int) -> tuple[float, int, int]:
+    """SM-2 adımı. quality 0-5; 3'ün altı kartı başa döndürür.
+    Returns: (ease, interval_gün, repetitions)
+    """
+    if quality < 3:
+        repetitions, interval = 0, 1
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = 1
+        elif repetitions == 2:
+            interval = 6
+        else:
+            interval = max(1, round(interval * ease))
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return round(ease, 4), interval, repetitions
+
+
+def _overdue_priority(state: dict, now: datetime) -> float:
+    """Heap anahtarı: aralığına göre en çok geciken kart en önce (küçük = öncelikli)."""
+    due = state.get("due_at") or now
+    overdue_days = (now - due).total_seconds() / 86400
+    return -overdue_days / max(state.get("interval") or 1, 1)
+
+
+class ReviewService:
+    @staticmethod
+    def enroll_deck(user_id: str, deck_id: str):
+        """Destedeki kartları kullanıcının tekrar listesine ekler (mevcut ilerleme korunur)."""
+        try:
+            db = get_firestore()
+            deck_ref = db.collection(COLLECTION_DECKS).document(deck_id)
+            deck = deck_ref.get()
+            if not deck.exists:
+                return None, "Deste bulunamadı."
+            deck_data = deck.to_dict()
+            cards = _deck_cards(db, deck_ref, deck_data)
+
+            states = _states_ref(db, user_id)
+            existing = {
+                d.id for d in states.where("deck_id", "==", deck_id).select(["__name__"]).get()
+            }
+            now = datetime.now(timezone.utc)
+            ops = []
+            for index, card in enumerate(cards):
+                state_id = _card_state_id(deck_id, index)
+                if state_id in existing:
+                    continue
+                ops.append(WriteOp("set", states.document(state_id), {
+                    "deck_id": deck_id,
+                    "card_index": index,
+                    "front": card.get("front", ""),
+                    "back": card.get("back", ""),
+                    "subject": card.get("subject") or deck_data.get("subject", ""),
+                    "ease": DEFAULT_EASE,
+                    "interval": 0,
+                    "repetitions": 0,
+                    "due_at": now,
+                    "created_at": firestore.SERVER_TIMESTAMP,
+                }))
+            errors = commit_in_batches(db, ops)
+            failed = sum(1 for e in errors if e)
+            if failed:
+                return None, f"{failed} kart eklenemedi."
+            if ops:
+                catalog_service.record_usage(deck_id, "uses")
+            return {"added": len(ops), "total": len(cards)}, None
+        except Exception as e:
+            logger.exception("Enroll deck error")
+            return None, str(e)
+
+    @staticmethod
+    def build_session(user_id: str, size: int = DEFAULT_SESSION_SIZE):
+        """Zamanı gelmiş kartlardan `size` kartlık bir tekrar oturumu oluşturur.
+        Aday sorgusu sınıra ulaşırsa `due_count` ayrıca count() ile hesaplanır."""
+        try:
+            db = get_firestore()
+            now = datetime.now(timezone.utc)
+            due = _states_ref(db, user_id).where("due_at", "<=", now)
+            limit = size * SESSION_CANDIDATE_FACTOR
+            candidates = due.order_by("due_at").limit(limit).get()
+            heap = []
+            for seq, doc in enumerate(candidates):
+                heapq.heappush(heap, (_overdue_priority(doc.to_dict(), now), seq, doc))
+            session = [_state_to_dict(heapq.heappop(heap)[2]) for _ in range(min(size, len(heap)))]
+            due_count = len(candidates)
+            if due_count >= limit:
+                # Aday listesi sınıra dayandı: toplam, count() aggregation ile okunur
+                due_count = int(due.count().get()[0][0].value)
+            return {"cards": session, "due_count": due_count}, None
+        except Exception as e:
+            logger.exception("Build review session error")
+            return None, str(e)
+
+    @staticmethod
+    def grade_card(user_id: str, card_id: str, quality: int):
+        """Kartı SM-2'ye göre derecelendirir ve bir sonraki tekrar tarihini belirler."""
+        try:
+            db = get_firestore()
+            state_ref = _states_ref(db, user_id).document(card_id)
+
+            @firestore.transactional
+            def grade(transaction):
+                snap = state_ref.get(transaction=transaction)
+                if not snap.exists:
+                    return None, "Kart bulunamadı."
+                state = snap.to_dict()
+                ease, interval, repetitions = sm2(
+                    state.get("ease", DEFAULT_EASE),
+                    state.get("interval", 0),
+                    state.get("repetitions", 0),
+                    quality,
+                )
+                now = datetime.now(timezone.utc)
+                update = {
+                    "ease": ease,
+                    "interval": interval,
+                    "repetitions": repetitions,
+                    "due_at": now + timedelta(days=interval),
+                    "last_reviewed_at": now,
+                    "last_quality": quality,
+                }
+                transaction.update(state_ref, update)
+                return {
+                    "id": card_id,
+                    "ease": ease,
+                    "interval": interval,
+                    "repetitions": repetitions,
+                    "due_at": update["due_at"].isoformat(),
+                }, None
+
+            return grade(db.transaction())
+        except Exception as e:
+            logger.exception("Grade card error")
+            return None, str(e)
+
+
+review_service = ReviewService()
@@ -0,0 +1,114 @@
+"""Süreç içi periyodik görev zamanlayıcısı.
+
+Görevler `scheduler.every(...)` ile kaydedilir ve arka plan thread'inde
+çalıştırılır. Birden çok worker / makine aynı görevi aynı anda çalıştırmasın
+diye her çalıştırma öncesi `_scheduler/{name}` dokümanında transaction ile
+süreli bir kilit (lease) alınır; kilidi alamayan worker o turu atlar.
+"""
+from __future__ import annotations
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from firebase_admin import firestore
+from firebase_db import get_firestore
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_SCHEDULER = "_scheduler"
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+TICK_SECONDS = 5
+
+
+class ScheduledTask:
+    def __init__(self, name: str, interval: float, func: Callable[[], object], jitter: float):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.jitter = jitter
+        # İlk çalıştırma da yayılsın diye rastgele gecikmeyle başlar
+        self.next_run = time.monotonic() + random.uniform(0, jitter)
+
+
+class Scheduler:
+    """Periyodik görevleri tek bir daemon thread'de çalıştırır."""
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._tasks: dict[str, ScheduledTask] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def every(self, name: str, interval: float, func: Callable[[], object], jitter: float | None = None) -> None:
+        """`func`'ı yaklaşık her `interval` saniyede bir çalıştırır."""
+        jitter = min(interval * 0.1, 60) if jitter is None else jitter
+        self._tasks[name] = ScheduledTask(name, interval, func, jitter)
+
+    def _acquire_lease(self, name: str, ttl: float) -> bool:
+        """Görev için süreli kilidi alır; başka sahipte ve süresi dolmamışsa False."""
+        db = get_firestore()
+        ref = db.collection(COLLECTION_SCHEDULER).document(name)
+
+        @firestore.transactional
+        def acquire(transaction):
+            now = datetime.now(timezone.utc)
+            snap = ref.get(transaction=transaction)
+            data = snap.to_dict() if snap.exists else {}
+            if data.get("owner") not in (None, self.owner) and data.get("lease_until") and data["lease_until"] > now:
+                return False
+            transaction.set(ref, {
+                "owner": self.owner,
+                "lease_until": now + timedelta(seconds=ttl),
+                "last_started_at": now,
+            }, merge=True)
+            return True
+
+        return acquire(db.transaction())
+
+    def run_now(self, name: str) -> bool:
+        """Görevi kilit alarak hemen çalıştırır. Returns: çalıştırıldı mı."""
+        task = self._tasks[name]
+        try:
+            if not self._acquire_lease(name, task.interval * 0.9):
+                logger.info("Zamanlanmis gorev baska worker'da: %s", name)
+                return False
+            started = time.monotonic()
+            task.func()
+            logger.info("Zamanlanmis gorev tamamlandi: %s (%.1f sn)", name, time.monotonic() - started)
+            return True
+        except Exception:
+            logger.exception("Zamanlanmis gorev hatasi: %s", name)
+            return False
+
+    def _loop(self) -> None:
+        while not self._stop.wait(TICK_SECONDS):
+            now = time.monotonic()
+            for task in list(self._tasks.values()):
+                if now < task.next_run:
+                    continue
+                task.next_run = now + task.interval + random.uniform(0, task.jitter)
+                self.run_now(task.name)
+
+    def start(self) -> None:
+        if not SCHEDULER_ENABLED or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+        logger.info("Zamanlayici baslatildi: %s", ", ".join(self._tasks) or "-")
+
+    def shutdown(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+
+
+scheduler = Scheduler()
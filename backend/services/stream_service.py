@@ -0,0 +1,132 @@
+"""Duyuru, takvim ve mesaj olaylarını SSE bağlantılarına dağıtan paylaşılan Firestore dinleyicileri.
+
+Her kurum için tek bir dinleyici (duyurular + takvim) ve süreç başına tüm
+konuşmaların mesajları için tek bir collection group dinleyicisi açılır; mesajlar
+`receiver_id` alanına göre alıcının kanalına yönlendirilir. Bağlantı sayısı kaç
+olursa olsun Firestore'a açılan dinleyici sayısı değişmez. Dinleyiciler
+referans sayımıyla, son bağlantı kapandığında durdurulur. Olaylar
+`realtime.hub` üzerinden kanallara yayınlanır: `inst:{institution_id}` ve
+`user:{user_id}`.
+
+Her worker kendi bağlantıları için kendi dinleyicisini açtığından olaylar
+backend'e değil sadece yerel abonelere iletilir (`deliver_local_threadsafe`);
+aksi halde `SQLiteBackend` ile her olay worker sayısı kadar kopyalanırdı.
+"""
+from __future__ import annotations
+import logging
+import threading
+from datetime import datetime, timezone
+
+from firebase_db import get_firestore
+from services.realtime import hub
+from services.teacher_service import COLLECTION_ANNOUNCEMENTS, COLLECTION_CALENDAR
+from services.message_service import SUBCOLLECTION_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+
+def institution_channel(institution_id: str) -> str:
+    return f"inst:{institution_id}"
+
+
+def user_channel(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def _serialize(doc) -> dict:
+    data = doc.to_dict() or {}
+    data["id"] = doc.id
+    for key, val in data.items():
+        if hasattr(val, "isoformat"):
+            data[key] = val.isoformat()
+    return data
+
+
+def _watch_added(query, on_added):
+    """Sorguya dinleyici açar; ilk (mevcut durum) snapshot'ı atlayıp sadece yeni eklenenleri iletir."""
+    first = True
+
+    def callback(snapshot, changes, read_time):
+        nonlocal first
+        if first:
+            first = False
+            return
+        for change in changes:
+            if change.type.name == "ADDED":
+                try:
+                    on_added(change.document)
+                except Exception:
+                    logger.exception("Dinleyici olay isleme hatasi")
+
+    return query.on_snapshot(callback)
+
+
+class _SharedWatch:
+    """Referans sayımlı, anahtar başına tek Firestore dinleyicisi."""
+
+    def __init__(self, start):
+        self._start = start  # key -> list[watch]
+        self._lock = threading.Lock()
+        self._watches: dict[str, list] = {}
+        self._refs: dict[str, int] = {}
+
+    def acquire(self, key: str) -> None:
+        with self._lock:
+            self._refs[key] = self._refs.get(key, 0) + 1
+            if key not in self._watches:
+                self._watches[key] = self._start(key)
+                logger.info("Paylasilan dinleyici acildi: %s", key)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._refs[key] = self._refs.get(key, 1) - 1
+            if self._refs[key] > 0:
+                return
+            self._refs.pop(key, None)
+            for watch in self._watches.pop(key, []):
+                watch.unsubscribe()
+            logger.info("Paylasilan dinleyici kapatildi: %s", key)
+
+
+def _start_institution_watch(institution_id: str) -> list:
+    db = get_firestore()
+    since = datetime.now(timezone.utc)
+    channel = institution_channel(institution_id)
+
+    def publisher(event_type):
+        return lambda doc: hub.deliver_local_threadsafe(channel, {"type": event_type, "data": _serialize(doc)})
+
+    return [
+        _watch_added(
+            db.collection(COLLECTION_ANNOUNCEMENTS)
+            .where("institution_id", "==", institution_id)
+            .where("created_at", ">=", since),
+            publisher("announcement"),
+        ),
+        _watch_added(
+            db.collection(COLLECTION_CALENDAR)
+            .where("institution_id", "==", institution_id)
+            .where("created_at", ">=", since),
+            publisher("event"),
+        ),
+    ]
+
+
+def _start_message_watch(_key: str) -> list:
+    db = get_firestore()
+    since = datetime.now(timezone.utc)
+
+    def on_message(doc):
+        data = _serialize(doc)
+        channel = user_channel(data.get("receiver_id") or "")
+        # Alıcı bu süreçte bağlı değilse olay atlanır (diğer worker'lar kendi dinleyicisinden alır)
+        if hub.subscriber_count(channel):
+            hub.deliver_local_threadsafe(channel, {"type": "message", "data": data})
+
+    # Tüm konuşmaların mesaj alt koleksiyonları tek bir collection group dinleyicisiyle izlenir
+    return [_watch_added(db.collection_group(SUBCOLLECTION_MESSAGES).where("created_at", ">=", since), on_message)]
+
+
+institution_watches = _SharedWatch(_start_institution_watch)
+message_watch = _SharedWatch(_start_message_watch)
+MESSAGE_WATCH_KEY = "messages"
@@ -4,6 +4,10 @@ import logging
 import bcrypt
 from firebase_admin import firestore
 from firebase_db import get_firestore
+from utils.text_search import build_search_tokens
+from services.message_service import message_service
+from utils.batch import WriteOp, commit_in_batches, update_documents
+from utils.ids import new_item_id
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +16,6 @@ COLLECTION_USERS = "users"
 COLLECTION_PROGRAMS = "programs"
 COLLECTION_TEMPLATES = "assignment_templates"
 COLLECTION_ANNOUNCEMENTS = "announcements"
-COLLECTION_MESSAGES = "messages"
 COLLECTION_MATERIALS = "materials"
 COLLECTION_CALENDAR = "calendar"
 
@@ -54,9 +57,11 @@ def join_institution(
                 ref.update({"institution_id": inst_id, "status": "pending", "class_id": None})
             else:
                 # sync-user henüz çağrılmamış olabilir, dokümanı oluştur
+                name = email.split("@")[0] if email else "Öğrenci"
                 ref.set({
                     "email": email or "",
-                    "name": email.split("@")[0] if email else "Öğrenci",
+                    "name": name,
+                    "search_tokens": build_search_tokens(name, email),
                     "avatar": None,
                     "institution_id": inst_id,
                     "created_at": firestore.SERVER_TIMESTAMP,
@@ -140,6 +145,28 @@ def teacher_login(email: str, password: str) -> tuple[dict | None, str | None]:
         return None, str(e)
 
 
+def get_teacher_scope(teacher_id: str) -> dict | None:
+    """Token sahibi öğretmenin kayıtlı türü, bağlı olduğu admin ve erişebildiği kurum ID'leri.
+    Öğretmen bulunamazsa veya hata olursa None döner.
+    """
+    try:
+        snap = get_firestore().collection(COLLECTION_INSTITUTIONS).document(teacher_id).get()
+        if not snap.exists:
+            return None
+        data = snap.to_dict() or {}
+        admin_id = data.get("admin_id")
+        return {
+            "teacher_id": teacher_id,
+            "teacher_type": data.get("teacher_type") or "teacher",
+            "admin_id": admin_id,
+            # Panel öğrencileri admin_id (yoksa öğretmenin kendi ID'si) üzerinden listeler
+            "institution_ids": [i for i in (teacher_id, admin_id) if i],
+        }
+    except Exception as e:
+        logger.exception("Ogretmen kapsami okunamadi")
+        return None
+
+
 def get_students(institution_id: str, teacher_type: str = "teacher", admin_id: str | None = None) -> list[dict]:
     """Kuruma bağlı öğrencileri getirir.
     Rehber öğretmen ise admin_id üzerinden tüm kuruma bağlı öğrencileri döndürür.
@@ -203,6 +230,78 @@ def approve_student(student_id: str) -> tuple[bool, str | None]:
     except Exception as e:
         return False, str(e)
 
+def _per_student_results(student_ids: list[str], errors: list[str | None]) -> list[dict]:
+    """Batch hata listesini öğrenci bazlı sonuç listesine çevirir."""
+    return [
+        {"student_id": sid, "status": "error" if err else "ok", **({"message": err} if err else {})}
+        for sid, err in zip(student_ids, errors)
+    ]
+
+def _roster_ids(db, institution_id: str, teacher_type: str = "teacher", admin_id: str | None = None) -> set[str]:
+    """Öğretmenin yetkili olduğu öğrenci ID'lerini tek sorguda okur.
+    Rehber öğretmen için admin'e bağlı tüm kurumlar `in` sorgusuyla kapsanır.
+    """
+    inst_ids = [institution_id]
+    if teacher_type == "rehber" and admin_id:
+        teacher_snap = (
+            db.collection(COLLECTION_INSTITUTIONS)
+            .where("admin_id", "==", admin_id)
+            .select(["__name__"])
+            .get()
+        )
+        inst_ids = list(dict.fromkeys([admin_id, institution_id] + [d.id for d in teacher_snap]))
+
+    ids: set[str] = set()
+    # Firestore `in` filtresi en fazla 30 değer kabul eder
+    for i in range(0, len(inst_ids), 30):
+        snap = (
+            db.collection(COLLECTION_USERS)
+            .where("institution_id", "in", inst_ids[i:i + 30])
+            .select(["__name__"])
+            .get()
+        )
+        ids.update(d.id for d in snap)
+    return ids
+
+def _bulk_update_students(
+    student_ids: list[str],
+    data: dict,
+    institution_id: str | None = None,
+    teacher_type: str = "teacher",
+    admin_id: str | None = None,
+) -> list[dict]:
+    """Öğrenci dokümanlarına aynı güncellemeyi batch'ler halinde uygular.
+    institution_id verilirse kuruma ait olmayan öğrenciler güncellenmeden raporlanır.
+    """
+    db = get_firestore()
+    student_ids = list(dict.fromkeys(student_ids))
+    allowed = student_ids
+    if institution_id:
+        roster = _roster_ids(db, institution_id, teacher_type, admin_id)
+        allowed = [sid for sid in student_ids if sid in roster]
+
+    refs = [db.collection(COLLECTION_USERS).document(sid) for sid in allowed]
+    results = {r["student_id"]: r for r in _per_student_results(allowed, update_documents(db, refs, data))}
+    return [
+        results.get(sid) or {"student_id": sid, "status": "error", "message": "Öğrenci bu kuruma ait değil."}
+        for sid in student_ids
+    ]
+
+def approve_students(
+    student_ids: list[str],
+    institution_id: str | None = None,
+    teacher_type: str = "teacher",
+    admin_id: str | None = None,
+) -> tuple[list[dict] | None, str | None]:
+    """Birden çok öğrenciyi batch'ler halinde onaylar."""
+    try:
+        return _bulk_update_students(
+            student_ids, {"status": "approved"}, institution_id, teacher_type, admin_id
+        ), None
+    except Exception as e:
+        logger.exception("Toplu onay hatasi")
+        return None, str(e)
+
 def create_class(institution_id: str, name: str) -> tuple[dict | None, str | None]:
     """Yeni sınıf oluşturur."""
     try:
@@ -245,36 +344,122 @@ def update_student_class(student_id: str, class_id: str | None) -> tuple[bool, s
     except Exception as e:
         return False, str(e)
 
+def update_students_class(
+    student_ids: list[str],
+    class_id: str | None,
+    institution_id: str | None = None,
+    teacher_type: str = "teacher",
+    admin_id: str | None = None,
+) -> tuple[list[dict] | None, str | None]:
+    """Birden çok öğrenciyi batch'ler halinde sınıfa atar (class_id=None sınıftan çıkarır)."""
+    try:
+        return _bulk_update_students(
+            student_ids, {"class_id": class_id}, institution_id, teacher_type, admin_id
+        ), None
+    except Exception as e:
+        logger.exception("Toplu sinif atama hatasi")
+        return None, str(e)
+
+def _normalize_assigned_items(program: list[dict]) -> list[dict]:
+    """Öğretmenin atadığı program maddelerini kayıt formatına çevirir."""
+    items = []
+    for p in program:
+        items.append({
+            "id": new_item_id(),
+            "gun": p.get("gun", "Pazartesi"),
+            "task": p.get("task") or f"{p.get('subject', '')} - {p.get('topic', '')}".strip() or "Ders",
+            "duration": p.get("duration", "45 dk"),
+            "completed": False,
+            "questions": int(p.get("questions") or p.get("questionCount") or 0),
+        })
+    return items
+
+
 def assign_program(student_id: str, program: list[dict]) -> tuple[bool, str | None]:
     """Öğrenciye haftalık program atar."""
     try:
         db = get_firestore()
-        items = []
-        for p in program:
-            items.append({
-                "gun": p.get("gun", "Pazartesi"),
-                "task": p.get("task") or f"{p.get('subject', '')} - {p.get('topic', '')}".strip() or "Ders",
-                "duration": p.get("duration", "45 dk"),
-                "completed": False,
-                "questions": int(p.get("questions") or p.get("questionCount") or 0),
-            })
-        db.collection(COLLECTION_PROGRAMS).document(student_id).set({"items": items})
+        items = _normalize_assigned_items(program)
+        db.collection(COLLECTION_PROGRAMS).document(student_id).set({
+            "items": items,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        })
         return True, None
     except Exception as e:
         logger.exception("Program atama hatasi")
         return False, str(e)
 
 
+def assign_program_bulk(
+    teacher_id: str,
+    program: list[dict] | None = None,
+    template_id: str | None = None,
+    class_id: str | None = None,
+    student_ids: list[str] | None = None,
+) -> tuple[list[dict] | None, str | None]:
+    """Bir programı veya şablonu sınıfa / öğrenci listesine toplu atar.
+
+    Sınıf listesi tek sorguyla çözülür, maddeler bir kez normalize edilir ve
+    yazmalar paralel batch'ler halinde yapılır. Öğretmenin kurumuna (rehber için
+    admin'e bağlı kurumlara) ait olmayan öğrenciler atanmadan raporlanır.
+    Returns: (öğrenci bazlı sonuç listesi, error_message)
+    """
+    try:
+        db = get_firestore()
+        scope = get_teacher_scope(teacher_id)
+        if scope is None:
+            return None, "Öğretmen bulunamadı."
+        if template_id:
+            snap = db.collection(COLLECTION_TEMPLATES).document(template_id).get()
+            if not snap.exists or snap.to_dict().get("teacher_id") != teacher_id:
+                return None, "Şablon bulunamadı veya yetkiniz yok."
+            program = snap.to_dict().get("items") or []
+        if not program:
+            return None, "Atanacak program boş."
+
+        requested = list(dict.fromkeys(student_ids or []))
+        if class_id:
+            class_snap = db.collection(COLLECTION_USERS).where("class_id", "==", class_id).get()
+            requested.extend(d.id for d in class_snap if d.id not in requested)
+        if not requested:
+            return None, "Atanacak öğrenci bulunamadı."
+
+        if scope["teacher_type"] == "rehber":
+            roster = _roster_ids(db, teacher_id, "rehber", scope["admin_id"])
+        else:
+            roster = set().union(*(_roster_ids(db, inst) for inst in scope["institution_ids"]))
+        targets = [sid for sid in requested if sid in roster]
+
+        items = _normalize_assigned_items(program)
+        ops = [
+            WriteOp("set", db.collection(COLLECTION_PROGRAMS).document(sid), {
+                "items": items,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            })
+            for sid in targets
+        ]
+        results = {r["student_id"]: r for r in _per_student_results(targets, commit_in_batches(db, ops))}
+        return [
+            results.get(sid) or {"student_id": sid, "status": "error", "message": "Öğrenci bu kuruma ait değil."}
+            for sid in requested
+        ], None
+    except Exception as e:
+        logger.exception("Toplu program atama hatasi")
+        return None, str(e)
+
+
 def delete_class(institution_id: str, class_id: str) -> tuple[bool, str | None]:
     """Sınıfı siler ve öğrencilerin class_id'sini temizler."""
     try:
         db = get_firestore()
-        # Sınıfı sil
-        db.collection(COLLECTION_INSTITUTIONS).document(institution_id).collection("classes").document(class_id).delete()
-        # Bu sınıftaki öğrencilerin class_id'sini temizle
+        class_ref = db.collection(COLLECTION_INSTITUTIONS).document(institution_id).collection("classes").document(class_id)
+        # Bu sınıftaki öğrencilerin class_id'sini temizle, sınıfı en son sil
         students = db.collection(COLLECTION_USERS).where("class_id", "==", class_id).get()
-        for s in students:
-            db.collection(COLLECTION_USERS).document(s.id).update({"class_id": None})
+        errors = update_documents(db, [s.reference for s in students], {"class_id": None})
+        failed = sum(1 for err in errors if err)
+        if failed:
+            return False, f"{failed} öğrencinin sınıfı temizlenemedi, sınıf silinmedi."
+        class_ref.delete()
         return True, None
     except Exception as e:
         logger.exception("Sinif silme hatasi")
@@ -359,20 +544,9 @@ def get_announcements(institution_id: str, class_id: str | None = None) -> list[
 
 
 def send_message(sender_id: str, receiver_id: str, content: str) -> tuple[bool, str | None]:
-    """Hızlı mesaj gönderir."""
-    try:
-        db = get_firestore()
-        db.collection(COLLECTION_MESSAGES).add({
-            "sender_id": sender_id,
-            "receiver_id": receiver_id,
-            "content": content,
-            "created_at": firestore.SERVER_TIMESTAMP,
-            "read": False
-        })
-        return True, None
-    except Exception as e:
-        logger.exception("Mesaj gonderme hatasi")
-        return False, str(e)
+    """Hızlı mesaj gönderir (öğrenciyle olan konuşmaya eklenir)."""
+    conversation_id, err = message_service.send(sender_id, receiver_id, content)
+    return conversation_id is not None, err
 
 
 def create_material(institution_id: str, teacher_id: str, title: str, file_url: str, m_type: str, class_id: str | None = None) -> tuple[dict | None, str | None]:
@@ -483,11 +657,15 @@ class TeacherService:
     leave_institution = staticmethod(leave_institution)
     login = staticmethod(teacher_login)
     get_students = staticmethod(get_students)
+    get_scope = staticmethod(get_teacher_scope)
     assign_program = staticmethod(assign_program)
+    assign_program_bulk = staticmethod(assign_program_bulk)
     approve_student = staticmethod(approve_student)
+    approve_students = staticmethod(approve_students)
     create_class = staticmethod(create_class)
     get_classes = staticmethod(get_classes)
     update_student_class = staticmethod(update_student_class)
+    update_students_class = staticmethod(update_students_class)
     delete_class = staticmethod(delete_class)
     get_institution = staticmethod(get_institution)
     create_template = staticmethod(create_template)
@@ -3,6 +3,8 @@ from __future__ import annotations
 import logging
 from firebase_admin import firestore
 from firebase_db import get_firestore
+from utils.text_search import build_search_tokens
+from services.friends_service import friends_service
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +29,7 @@ def register_user(uid: str, email: str, name: str) -> tuple[dict | None, str | N
             "name": name,
             "avatar": None,
             "institution_id": None,
+            "search_tokens": build_search_tokens(name, email),
             "created_at": firestore.SERVER_TIMESTAMP,
         })
         return {"id": uid}, None
@@ -54,7 +57,7 @@ def sync_user(uid: str, email: str, name: str) -> tuple[bool, str | None]:
         db = get_firestore()
         ref = db.collection(COLLECTION_USERS).document(uid)
         snap = ref.get()
-        data = {"email": email, "name": name}
+        data = {"email": email, "name": name, "search_tokens": build_search_tokens(name, email)}
         if snap.exists:
             existing = snap.to_dict()
             data["avatar"] = existing.get("avatar")
@@ -75,7 +78,14 @@ def update_profile(user_id: str, name: str) -> tuple[bool, str | None]:
     """Profil adını günceller."""
     try:
         db = get_firestore()
-        db.collection(COLLECTION_USERS).document(user_id).update({"name": name})
+        ref = db.collection(COLLECTION_USERS).document(user_id)
+        snap = ref.get()
+        email = (snap.to_dict() or {}).get("email") if snap.exists else None
+        ref.update({"name": name, "search_tokens": build_search_tokens(name, email)})
+        # Arkadaş listelerindeki önbelleğe alınmış adı güncelle (hata profil güncellemesini bozmaz)
+        ok, err = friends_service.refresh_friend_name(user_id, name)
+        if not ok:
+            logger.warning("Arkadas listesi isim guncelleme hatasi: %s", err)
         return True, None
     except Exception as e:
         logger.exception("Profil guncelleme hatasi")
@@ -0,0 +1,34 @@
+"""Program tamamlanma istatistiklerinin (user_stats) delta hesabı."""
+from services.program_service import _completion_delta, _stats_update
+
+
+def _item(duration: str, completed: bool) -> dict:
+    return {"id": "a", "gun": "Pazartesi", "task": "Matematik", "duration": duration, "completed": completed}
+
+
+def test_duration_edit_while_completed_then_untick_balances_out():
+    steps = [
+        _item("1 Saat", False),
+        _item("1 Saat", True),   # tamamlandı: +60
+        _item("3 saat", True),   # tamamlanmışken süre değişti: +120
+        _item("3 saat", False),  # işaret kaldırıldı: -180
+    ]
+    deltas = [_completion_delta([old], [new]) for old, new in zip(steps, steps[1:])]
+    assert deltas == [(60, 1), (120, 0), (-180, -1)]
+    assert sum(m for m, _ in deltas) == 0
+    assert sum(t for _, t in deltas) == 0
+
+    stats: dict = {}
+    for minutes, tasks in deltas:
+        stats.update(_stats_update(stats, minutes, tasks, "2026-10-19"))
+    assert stats["total_minutes"] == 0
+    assert stats["tasks_completed"] == 0
+
+
+def test_untick_subtracts_previously_counted_duration():
+    assert _completion_delta([_item("1 Saat", True)], [_item("3 saat", False)]) == (-60, -1)
+
+
+def test_unmatched_items_are_not_credited():
+    new = {**_item("45 dk", True), "id": "b"}
+    assert _completion_delta([_item("45 dk", False)], [new]) == (0, 0)
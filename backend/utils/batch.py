@@ -0,0 +1,108 @@
+"""Firestore toplu yazma (WriteBatch) yardımcıları."""
+from __future__ import annotations
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Iterator, NamedTuple
+
+from google.api_core import exceptions as gexc
+
+logger = logging.getLogger(__name__)
+
+BATCH_LIMIT = 500  # Firestore tek batch'te en fazla 500 yazma kabul eder
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 3
+RETRY_BASE_DELAY = 0.5  # saniye; her denemede ikiye katlanır
+# Tekrar denemenin sonucu değiştirmeyeceği gRPC durum kodları (ön koşul / veri hatası);
+# BulkWriter gibi kodla hata bildiren yazıcılar için (ör. scripts/migration_runner)
+PERMANENT_ERROR_CODES = {3, 5, 6, 9}  # INVALID_ARGUMENT, NOT_FOUND, ALREADY_EXISTS, FAILED_PRECONDITION
+# Sadece bu geçici hatalar yeniden denenir
+TRANSIENT_ERRORS = (
+    gexc.Aborted,
+    gexc.ServiceUnavailable,
+    gexc.DeadlineExceeded,
+    gexc.ResourceExhausted,
+    gexc.InternalServerError,
+)
+
+
+class WriteOp(NamedTuple):
+    """Tek bir batch yazma işlemi."""
+    action: str  # "set" | "update" | "delete"
+    ref: Any
+    data: dict | None = None
+    merge: bool = False
+
+
+def chunked(items: list, size: int) -> Iterator[list]:
+    """Listeyi `size` uzunluğunda parçalara böler."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _commit_chunk(db, ops: list[WriteOp]) -> None:
+    batch = db.batch()
+    for op in ops:
+        if op.action == "set":
+            batch.set(op.ref, op.data, merge=op.merge)
+        elif op.action == "update":
+            batch.update(op.ref, op.data)
+        elif op.action == "delete":
+            batch.delete(op.ref)
+        else:
+            raise ValueError(f"Bilinmeyen batch islemi: {op.action}")
+    batch.commit()
+
+
+def commit_in_batches(
+    db,
+    ops: Iterable[WriteOp],
+    chunk_size: int = BATCH_LIMIT,
+    max_workers: int = DEFAULT_WORKERS,
+    retries: int = DEFAULT_RETRIES,
+) -> list[str | None]:
+    """İşlemleri parçalara bölüp batch'ler halinde paralel commit eder.
+
+    Her parça kendi içinde atomiktir; geçici hatayla (TRANSIENT_ERRORS) başarısız
+    olan parçalar artan beklemeyle `retries` kez yeniden denenir, başarılı olanlar
+    tekrar yazılmaz. Kalıcı hatalar (ör. NotFound) beklemeden raporlanır.
+    Dönen liste `ops` ile aynı sırada, her işlem için hata mesajını
+    (başarılıysa None) içerir.
+    """
+    ops = list(ops)
+    if not ops:
+        return []
+    chunks = list(chunked(ops, min(chunk_size, BATCH_LIMIT)))
+
+    def run(chunk: list[WriteOp]) -> str | None:
+        for attempt in range(retries + 1):
+            try:
+                _commit_chunk(db, chunk)
+                return None
+            except Exception as e:
+                if not isinstance(e, TRANSIENT_ERRORS):
+                    logger.warning("Batch commit kalici hata: %s", e)
+                    return str(e)
+                if attempt == retries:
+                    logger.exception("Batch commit hatasi (%d deneme)", attempt + 1)
+                    return str(e)
+                logger.warning("Batch commit hatasi, yeniden deneniyor (%d): %s", attempt + 1, e)
+                time.sleep(RETRY_BASE_DELAY * (2 ** attempt))
+
+    if len(chunks) == 1:
+        chunk_errors = [run(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            chunk_errors = list(pool.map(run, chunks))
+
+    errors: list[str | None] = []
+    for chunk, err in zip(chunks, chunk_errors):
+        errors.extend([err] * len(chunk))
+    return errors
+
+
+def update_documents(
+    db, refs: Iterable[Any], data: dict, **kwargs
+) -> list[str | None]:
+    """Aynı alan güncellemesini birçok dokümana batch'ler halinde uygular."""
+    return commit_in_batches(db, (WriteOp("update", ref, data) for ref in refs), **kwargs)
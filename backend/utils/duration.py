@@ -0,0 +1,26 @@
+"""Program maddelerindeki serbest metin süreleri ("45 dk", "1 Saat", "1,5 saat") dakikaya çevirir."""
+from __future__ import annotations
+import re
+from utils.text_search import fold
+
+DEFAULT_MINUTES = 60  # Tanınmayan süre "1 Saat" varsayılır
+_PART = re.compile(r"(\d+(?:[.,]\d+)?)\s*(saat|sa|s|h|hour|hours|dakika|dk|d|min|minute|minutes|m)?\b")
+_HOUR_UNITS = {"saat", "sa", "s", "h", "hour", "hours"}
+
+
+def parse_duration_minutes(text: str | int | float | None) -> int:
+    """Süre metnini dakikaya çevirir: "45 dk" -> 45, "1 Saat" -> 60, "2 saat 30 dk" -> 150.
+    Birimsiz sayı 10'dan küçükse saat, değilse dakika kabul edilir.
+    """
+    if isinstance(text, (int, float)):
+        return max(int(text), 0)
+    total = 0.0
+    matched = False
+    for value, unit in _PART.findall(fold(str(text or ""))):
+        number = float(value.replace(",", "."))
+        if unit in _HOUR_UNITS or (not unit and number < 10):
+            total += number * 60
+        else:
+            total += number
+        matched = True
+    return round(total) if matched else DEFAULT_MINUTES
@@ -0,0 +1,49 @@
+"""CSV / NDJSON akış (streaming) yanıt yardımcıları."""
+from __future__ import annotations
+import csv
+import io
+import json
+from typing import Iterable, Iterator
+
+from fastapi.responses import StreamingResponse
+
+from errors import ValidationError
+
+EXPORT_FORMATS = ("csv", "ndjson")
+
+
+def iter_csv(rows: Iterable[dict], fields: list[str]) -> Iterator[str]:
+    """Satırları başlıkla birlikte CSV metin parçaları olarak üretir."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    # Excel'in Türkçe karakterleri doğru açması için UTF-8 BOM
+    buffer.write("\ufeff")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(rows: Iterable[dict]) -> Iterator[str]:
+    """Her satırı ayrı bir JSON satırı olarak üretir."""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+
+def export_response(rows: Iterable[dict], fields: list[str], fmt: str, filename: str) -> StreamingResponse:
+    """Satır üretecini istenen formatta akış yanıtına çevirir."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValidationError(f"Geçersiz format. Desteklenenler: {', '.join(EXPORT_FORMATS)}")
+    if fmt == "csv":
+        body, media_type = iter_csv(rows, fields), "text/csv; charset=utf-8"
+    else:
+        body, media_type = iter_ndjson(rows), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,13 @@
+"""Doküman ve kayıt ID yardımcıları."""
+import uuid
+
+
+def pair_key(uid_a: str, uid_b: str) -> str:
+    """İki kullanıcı için sıradan bağımsız, kanonik ID: min(uid)_max(uid)."""
+    first, second = sorted((uid_a, uid_b))
+    return f"{first}_{second}"
+
+
+def new_item_id() -> str:
+    """Dizi içindeki kayıtlar (ör. program maddeleri) için kısa, kararlı ID."""
+    return uuid.uuid4().hex[:12]
@@ -0,0 +1,38 @@
+"""Görsel benzerlik (perceptual hash) yardımcıları."""
+from __future__ import annotations
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # 8x8 = 64 bit dHash
+
+
+def compute_dhash(data: bytes, hash_size: int = HASH_SIZE) -> str | None:
+    """Görselin difference hash (dHash) değerini hex string olarak döndürür.
+
+    Görsel gri tonlamaya çevrilip (hash_size+1) x hash_size boyutuna küçültülür,
+    her satırda komşu piksellerin parlaklık karşılaştırması bir bit üretir.
+    Görsel okunamazsa None döner (yükleme bu yüzden engellenmemeli).
+    """
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as img:
+            img = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+            pixels = list(img.getdata())
+    except Exception as e:
+        logger.warning("Gorsel hash hesaplanamadi: %s", e)
+        return None
+
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    """İki hex hash arasındaki farklı bit sayısını döndürür."""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
@@ -0,0 +1,55 @@
+"""CSV / XLSX dosyalarını satır sözlüklerine çeviren yardımcılar."""
+from __future__ import annotations
+import csv
+import io
+
+from errors import ValidationError
+
+
+def _normalize_header(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def read_rows(filename: str, data: bytes) -> list[tuple[int, dict]]:
+    """Yüklenen tablo dosyasını başlık satırına göre sözlük listesine çevirir.
+
+    .xlsx için openpyxl, diğer tüm dosyalar için CSV (UTF-8, ; veya , ayraçlı) okunur.
+    Boş satırlar atlanır; her satır dosyadaki satır numarasıyla (başlık 1. satır)
+    döner, böylece raporlar kullanıcının tablosundaki satırı gösterir.
+    """
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValidationError("XLSX desteği için openpyxl kurulu olmalı; CSV yükleyin.")
+        try:
+            wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        except Exception:
+            raise ValidationError("XLSX dosyası okunamadı.")
+        rows = wb.active.iter_rows(values_only=True)
+        header = [_normalize_header(h) for h in next(rows, [])]
+        out = [
+            (number, {header[i]: cell for i, cell in enumerate(row) if i < len(header) and header[i]})
+            for number, row in enumerate(rows, start=2)
+            if any(cell not in (None, "") for cell in row)
+        ]
+        wb.close()
+        return out
+
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValidationError("CSV dosyası UTF-8 olmalı.")
+    try:
+        dialect = csv.Sniffer().sniff(text[:2048], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(io.StringIO(text), dialect=dialect)
+    header = [_normalize_header(h) for h in next(reader, [])]
+    # csv.reader boş satırları da ([] olarak) verir; numaralar tablodaki satırlarla örtüşür
+    return [
+        (number, {header[i]: cell for i, cell in enumerate(row) if i < len(header) and header[i]})
+        for number, row in enumerate(reader, start=2)
+        if any(cell.strip() for cell in row)
+    ]
@@ -0,0 +1,75 @@
+"""Türkçe uyumlu arama normalizasyonu ve edge n-gram token üretimi.
+
+Kullanıcı dokümanlarında `search_tokens` dizisi tutulur; arama tek bir
+`array_contains` sorgusuyla yapılır. Hem indekslenen metin hem sorgu aynı
+şekilde katlanır: Türkçe büyük/küçük harf dönüşümü (I -> ı, İ -> i) ve ardından
+ASCII'ye indirgeme (ı -> i, ş -> s ...). Böylece "ilknur", "İLKNUR" ve
+"Ilknur" aynı kaydı; "sukru" da "Şükrü"yü bulur.
+"""
+from __future__ import annotations
+import re
+import unicodedata
+
+MAX_GRAM = 15  # Daha uzun sorgular ilk 15 karakterle aranır
+_TURKISH_UPPER = str.maketrans({"I": "ı", "İ": "i"})
+_ASCII_FOLD = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+_WORD_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def turkish_lower(text: str) -> str:
+    """Türkçe kurallarıyla küçük harfe çevirir ("İ".lower() gibi noktalı i üretmez)."""
+    return unicodedata.normalize("NFC", text or "").translate(_TURKISH_UPPER).lower()
+
+
+def fold(text: str) -> str:
+    """Arama karşılaştırması için Türkçe küçük harf + ASCII katlama."""
+    return turkish_lower(text).translate(_ASCII_FOLD)
+
+
+def words(text: str) -> list[str]:
+    """Katlanmış metni kelimelere böler."""
+    return [w for w in _WORD_SPLIT.split(fold(text)) if w]
+
+
+def _edge_ngrams(word: str) -> list[str]:
+    return [word[:i] for i in range(1, min(len(word), MAX_GRAM) + 1)]
+
+
+def build_search_tokens(name: str | None, email: str | None) -> list[str]:
+    """Ad ve e-posta için sıralı, tekrarsız edge n-gram listesi üretir."""
+    tokens: list[str] = []
+    local_part = (email or "").split("@")[0]
+    sources = words(name or "") + words(local_part)
+    # E-postanın ayraçsız hali ("ahmet.yilmaz" -> "ahmetyilmaz") de aranabilsin
+    compact = "".join(words(local_part))
+    if compact:
+        sources.append(compact)
+    for word in sources:
+        tokens.extend(_edge_ngrams(word))
+    return list(dict.fromkeys(tokens))
+
+
+def query_words(query: str) -> list[str]:
+    """Sorguyu indeksle aynı biçimde katlanmış kelimelere çevirir."""
+    return [w[:MAX_GRAM] for w in words(query)]
+
+
+def match_score(terms: list[str], name: str | None, email: str | None) -> int | None:
+    """Aday kaydın sorguyla eşleşme puanı (yüksek daha iyi); eşleşmiyorsa None."""
+    name_words = words(name or "")
+    email_local = (email or "").split("@")[0]
+    email_words = words(email_local) + ["".join(words(email_local))]
+    score = 0
+    for term in terms:
+        if term in name_words:
+            score += 4
+        elif any(w.startswith(term) for w in name_words):
+            score += 3 if name_words and name_words[0].startswith(term) else 2
+        elif any(w.startswith(term) for w in email_words):
+            score += 1
+        else:
+            return None
+    # Sorgu tam ada karşılık geliyorsa en üste
+    if " ".join(terms) == " ".join(name_words):
+        score += 10
+    return score
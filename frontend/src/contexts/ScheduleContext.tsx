@@ -32,6 +32,7 @@ export function ScheduleProvider({ children }: { children: React.ReactNode }) {
       if (cloudProg && Array.isArray(cloudProg)) {
         setSchedule(
           cloudProg.map((item: any) => ({
+            id: item.id,
             gun: item.gun || "Pazartesi",
             task: item.task || "Ders",
             duration: item.duration || "1 Saat",
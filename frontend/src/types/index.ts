@@ -21,6 +21,7 @@ export interface RegisterData {
 }
 
 export interface ScheduleItem {
+    id?: string;
     gun: string;
     task: string;
     duration: string;